@@ -0,0 +1,231 @@
+import argparse
+import json
+import os
+import time
+from collections import Counter
+from datetime import datetime
+
+from alert_rules import ALERT_QUERY, DEFAULT_THRESHOLDS, generate_alerts, to_arrays
+from database import LOOKUP_CHUNK, bulk_insert, get_backend, get_pool
+
+# Órbitas avaliadas por bloco (um commit e um checkpoint por bloco)
+BACKFILL_CHUNK = 20000
+
+DEFAULT_CHECKPOINT = 'alert_backfill.json'
+
+ALERT_COLUMNS = ['asteroid_id', 'alert_date', 'priority_level', 'description', 'is_active']
+
+
+def load_checkpoint(path):
+    """Retorna o checkpoint gravado em `path`, ou None se não existir"""
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_checkpoint(path, checkpoint):
+    """Grava o checkpoint de forma atómica (um ficheiro temporário e replace)"""
+    temp_path = path + '.tmp'
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(checkpoint, f, ensure_ascii=False, indent=2)
+    os.replace(temp_path, path)
+
+
+def _existing_alerts(cursor, asteroid_ids):
+    """Retorna um Counter de (asteroid_id, priority_level, description) já existentes em Alert"""
+    existing = Counter()
+    asteroid_ids = list(asteroid_ids)
+
+    for start in range(0, len(asteroid_ids), LOOKUP_CHUNK):
+        chunk = asteroid_ids[start:start + LOOKUP_CHUNK]
+        placeholders = ", ".join("?" for _ in chunk)
+        cursor.execute(
+            f"SELECT asteroid_id, priority_level, description, COUNT(*) FROM Alert "
+            f"WHERE asteroid_id IN ({placeholders}) "
+            f"GROUP BY asteroid_id, priority_level, description",
+            chunk
+        )
+        for asteroid_id, priority, description, count in cursor.fetchall():
+            existing[(asteroid_id, priority, description)] += count
+
+    return existing
+
+
+def _expected_alerts(cursor, asteroid_ids, last_id, thresholds):
+    """
+    Retorna um Counter dos alertas que o trigger teria criado para as órbitas
+    dos asteroides indicados até `last_id` (um por órbita que cumpre as regras)
+    """
+    expected = Counter()
+    asteroid_ids = list(asteroid_ids)
+
+    for start in range(0, len(asteroid_ids), LOOKUP_CHUNK):
+        chunk = asteroid_ids[start:start + LOOKUP_CHUNK]
+        placeholders = ", ".join("?" for _ in chunk)
+        cursor.execute(
+            ALERT_QUERY + f" WHERE op.asteroid_id IN ({placeholders}) AND op.orbit_param_id <= ?",
+            chunk + [last_id]
+        )
+        records = cursor.fetchall()
+        if records:
+            expected.update(generate_alerts(to_arrays(records), thresholds))
+
+    return expected
+
+
+def _next_chunk(cursor, last_id, chunk_size):
+    sql = get_backend().limit(
+        ALERT_QUERY + " WHERE op.orbit_param_id > ? ORDER BY op.orbit_param_id",
+        chunk_size
+    )
+    cursor.execute(sql, [last_id])
+    return cursor.fetchall()
+
+
+def backfill_alerts(checkpoint_path=DEFAULT_CHECKPOINT, chunk_size=None, thresholds=None,
+                    restart=False, on_progress=None, max_chunks=None):
+    """
+    Reavalia as regras de trg_GerarAlertas_Orbita sobre o histórico de
+    Orbital_Parameters e insere os alertas em falta.
+
+    Percorre as órbitas por blocos de orbit_param_id e grava o checkpoint em
+    `checkpoint_path` após cada bloco. Tal como o trigger, conta um alerta por
+    órbita que cumpre as regras. Alert não guarda a órbita, por isso os alertas
+    são contados por (asteroid_id, prioridade, descrição). Para os asteroides
+    do bloco, compara os alertas esperados para as órbitas até ao fim do bloco
+    com os que já existem em Alert (ativos ou não) e insere a diferença. Uma
+    nova chamada continua a partir do último bloco gravado; como só insere o
+    que falta, repetir um bloco (ex: interrupção entre o commit e o
+    checkpoint) não cria duplicados. Com `restart` recomeça do início.
+
+    Os alertas usam os dados atuais do asteroide (o trigger usa os do momento
+    da inserção). Retorna (True, resumo) ou (False, mensagem).
+    """
+    pool = get_pool()
+    if not pool:
+        return False, "Não conectado à BD"
+
+    chunk_size = chunk_size or BACKFILL_CHUNK
+    thresholds = dict(DEFAULT_THRESHOLDS, **(thresholds or {}))
+
+    checkpoint = None if restart else load_checkpoint(checkpoint_path)
+    if checkpoint and checkpoint.get('limiares') != thresholds:
+        return False, ("O checkpoint foi gravado com outros limiares; "
+                       "use restart para recomeçar com os novos")
+
+    summary = checkpoint or {
+        'ultimo_id': 0,
+        'orbitas_avaliadas': 0,
+        'alertas_candidatos': 0,
+        'alertas_existentes': 0,
+        'alertas_inseridos': 0,
+        'concluido': False,
+        'limiares': thresholds,
+    }
+    start = time.perf_counter()
+    chunks = 0
+
+    try:
+        while max_chunks is None or chunks < max_chunks:
+            with pool.connection() as connection:
+                cursor = connection.cursor()
+                records = _next_chunk(cursor, summary['ultimo_id'], chunk_size)
+                if not records:
+                    summary['concluido'] = True
+                    break
+                summary['concluido'] = False
+
+                # Um alerta por órbita do bloco que cumpre as regras
+                candidates = generate_alerts(to_arrays(records), thresholds)
+                asteroid_ids = {alert[0] for alert in candidates}
+                expected = _expected_alerts(cursor, asteroid_ids, records[-1][0], thresholds)
+                existing = _existing_alerts(cursor, asteroid_ids)
+
+            # Em falta: o que as órbitas até aqui geram menos o que já existe,
+            # atribuído às órbitas do bloco pela sua ordem
+            needed = expected - existing
+            missing = []
+            for alert in candidates:
+                if needed[alert] > 0:
+                    needed[alert] -= 1
+                    missing.append(alert)
+            if missing:
+                alert_date = datetime.now().replace(microsecond=0)
+                success, result = bulk_insert(
+                    'Alert', ALERT_COLUMNS,
+                    [(asteroid_id, alert_date, priority, description, 1)
+                     for asteroid_id, priority, description in missing]
+                )
+                if not success:
+                    return False, f"Erro após a órbita {summary['ultimo_id']}: {result}"
+
+            summary['ultimo_id'] = records[-1][0]
+            summary['orbitas_avaliadas'] += len(records)
+            summary['alertas_candidatos'] += len(candidates)
+            summary['alertas_existentes'] += len(candidates) - len(missing)
+            summary['alertas_inseridos'] += len(missing)
+            save_checkpoint(checkpoint_path, summary)
+            chunks += 1
+
+            if on_progress:
+                on_progress(summary)
+
+        save_checkpoint(checkpoint_path, summary)
+        return True, dict(summary, segundos=time.perf_counter() - start)
+
+    except Exception as e:
+        return False, f"Erro após a órbita {summary['ultimo_id']}: {str(e)}"
+
+
+def _parse_threshold(text):
+    name, _, value = text.partition('=')
+    if name not in DEFAULT_THRESHOLDS:
+        raise argparse.ArgumentTypeError(
+            f"Limiar desconhecido: {name} (disponíveis: {', '.join(DEFAULT_THRESHOLDS)})"
+        )
+    return name, float(value)
+
+
+def _print_progress(summary):
+    print(f"Órbita {summary['ultimo_id']}: {summary['orbitas_avaliadas']} avaliadas, "
+          f"{summary['alertas_inseridos']} alertas inseridos")
+
+
+if __name__ == '__main__':
+    from database import connect_to_db, connect_to_sqlite
+
+    parser = argparse.ArgumentParser(
+        description="Reavalia as regras de alerta sobre as órbitas existentes e insere os alertas em falta"
+    )
+    parser.add_argument('--sqlite', help="Base de dados SQLite local")
+    parser.add_argument('--servidor', help="Servidor SQL Server")
+    parser.add_argument('--database', help="Base de dados SQL Server")
+    parser.add_argument('--utilizador')
+    parser.add_argument('--password')
+    parser.add_argument('--checkpoint', default=DEFAULT_CHECKPOINT, help="Ficheiro de checkpoint")
+    parser.add_argument('--bloco', type=int, default=BACKFILL_CHUNK, help="Órbitas por bloco")
+    parser.add_argument('--limiar', type=_parse_threshold, action='append', default=[],
+                        help="Altera um limiar, ex: --limiar distancia_1ld_ua=0.003")
+    parser.add_argument('--reiniciar', action='store_true', help="Ignora o checkpoint e recomeça")
+    args = parser.parse_args()
+
+    if args.sqlite:
+        success, message, info = connect_to_sqlite(args.sqlite)
+    else:
+        success, message, info = connect_to_db(args.servidor, args.database,
+                                               args.utilizador, args.password)
+    if not success:
+        raise SystemExit(message)
+
+    try:
+        success, result = backfill_alerts(args.checkpoint, args.bloco, dict(args.limiar),
+                                          restart=args.reiniciar, on_progress=_print_progress)
+    except KeyboardInterrupt:
+        raise SystemExit("Interrompido; volte a executar para continuar a partir do checkpoint")
+    if not success:
+        raise SystemExit(result)
+
+    print(f"Concluído: {result['orbitas_avaliadas']} órbitas avaliadas, "
+          f"{result['alertas_inseridos']} alertas inseridos, "
+          f"{result['alertas_existentes']} já existentes")
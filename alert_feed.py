@@ -0,0 +1,267 @@
+import threading
+import time
+
+from database import fetch_alerts_after, get_last_alert_id
+
+# Intervalo entre consultas (segundos): volta ao mínimo quando chegam alertas
+# e cresce por `backoff` a cada consulta sem novidades, até ao máximo
+FEED_MIN_INTERVAL = 1
+FEED_MAX_INTERVAL = 30
+FEED_BACKOFF = 2
+
+# Alertas lidos por consulta
+FEED_BATCH_SIZE = 500
+
+# ids em falta (transações ainda por confirmar) são procurados durante
+# `FEED_GAP_TIMEOUT` segundos; saltos maiores que FEED_MAX_GAP (ex: a cache de
+# IDENTITY do SQL Server após um reinício) não são seguidos
+FEED_GAP_TIMEOUT = 60
+FEED_MAX_GAP = 100
+
+# Alertas guardados por subscritor enquanto o seu callback falha; acima disto
+# os mais antigos são descartados (com aviso)
+FEED_MAX_PENDING = 10000
+
+
+class Subscription:
+    """
+    Consumidor do feed, com a sua própria marca (último alert_id recebido) e
+    os alertas ainda por entregar ao callback
+    """
+
+    def __init__(self, callback, priorities, last_id, name):
+        self.callback = callback
+        self.priorities = set(priorities) if priorities else None
+        self.last_id = last_id
+        self.name = name or getattr(callback, '__name__', 'subscritor')
+        # alert_id -> registo, até o callback os aceitar
+        self.pending = {}
+        # Falhas seguidas do callback e instante (monotonic) da próxima tentativa
+        self.failures = 0
+        self.retry_at = 0
+
+
+class AlertFeed:
+    """
+    Feed de alertas novos, pela ordem de alert_id.
+
+    Em vez de contar os alertas dos últimos minutos, o feed guarda o último
+    alert_id lido e em cada consulta pede só os alertas seguintes. Cada
+    subscritor (interface, email, serviço) recebe os alertas com
+    `callback(colunas, registos)`. Se o callback falhar, os alertas ficam
+    pendentes nesse subscritor (no máximo FEED_MAX_PENDING) e são entregues
+    de novo, com os seguintes, após um intervalo que cresce a cada falha; a
+    consulta continua a partir da marca do feed, sem afetar os outros.
+
+    Um alert_id pode ficar visível depois de ids maiores (transações
+    concorrentes); os ids em falta são procurados de novo durante algum tempo
+    e, quando aparecem, ficam pendentes em cada subscritor até serem entregues.
+
+    `poll()` faz uma consulta; `start()` consulta numa thread em fundo com
+    intervalo adaptativo e `wake()` antecipa a próxima consulta. Os callbacks
+    são chamados na thread do feed.
+    """
+
+    def __init__(self, fetch=None, latest=None, min_interval=FEED_MIN_INTERVAL,
+                 max_interval=FEED_MAX_INTERVAL, backoff=FEED_BACKOFF,
+                 batch_size=FEED_BATCH_SIZE, gap_timeout=FEED_GAP_TIMEOUT,
+                 max_pending=FEED_MAX_PENDING):
+        self.fetch = fetch or fetch_alerts_after
+        self.latest = latest or get_last_alert_id
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.batch_size = batch_size
+        self.gap_timeout = gap_timeout
+        self.max_pending = max_pending
+
+        self.last_id = 0
+        self.interval = min_interval
+        # A última consulta atingiu batch_size (há mais alertas por ler)
+        self.backlog = False
+
+        self._lock = threading.Lock()
+        self._poll_lock = threading.Lock()
+        self._subscriptions = []
+        # ids em falta -> instante em que foram detetados
+        self._gaps = {}
+
+        self._thread = None
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+
+    def subscribe(self, callback, priorities=None, name=None):
+        """
+        Regista um subscritor, a partir dos alertas seguintes à marca atual.
+        `priorities` limita os priority_level entregues (todos por omissão).
+        """
+        with self._lock:
+            subscription = Subscription(callback, priorities, self.last_id, name)
+            self._subscriptions.append(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            if subscription in self._subscriptions:
+                self._subscriptions.remove(subscription)
+
+    def reset(self, last_id=None):
+        """
+        Coloca a marca (do feed e dos subscritores) em `last_id`, ou no último
+        alerta existente. Usado ao (re)conectar, para não entregar o histórico.
+        """
+        if last_id is None:
+            success, last_id = self.latest()
+            if not success:
+                return False, last_id
+
+        with self._poll_lock, self._lock:
+            self.last_id = last_id
+            self._gaps.clear()
+            for subscription in self._subscriptions:
+                subscription.last_id = last_id
+                subscription.pending.clear()
+                subscription.failures = 0
+                subscription.retry_at = 0
+
+        return True, last_id
+
+    def poll(self):
+        """
+        Lê os alertas novos e entrega-os aos subscritores.
+        Retorna (success, número de alertas novos) ou (False, mensagem).
+        """
+        with self._poll_lock:
+            with self._lock:
+                subscriptions = list(self._subscriptions)
+
+            now = time.monotonic()
+            for alert_id, detected in list(self._gaps.items()):
+                if now - detected > self.gap_timeout:
+                    del self._gaps[alert_id]
+
+            success, result = self.fetch(self.last_id, self.batch_size, sorted(self._gaps))
+            if not success:
+                return False, result
+
+            columns, records = result
+            filled = []
+            new = []
+            for record in records:
+                alert_id = record[0]
+                if alert_id in self._gaps:
+                    del self._gaps[alert_id]
+                    filled.append(record)
+                elif alert_id > self.last_id:
+                    new.append(record)
+            new.sort(key=lambda record: record[0])
+
+            self.backlog = len(new) >= self.batch_size
+            self._register_gaps(new, now)
+            if new:
+                self.last_id = new[-1][0]
+
+            for subscription in subscriptions:
+                self._queue(subscription, filled + [record for record in new
+                                                    if record[0] > subscription.last_id])
+                if new:
+                    subscription.last_id = max(subscription.last_id, new[-1][0])
+                self._deliver(subscription, columns, now)
+
+            return True, len(filled) + len(new)
+
+    def _register_gaps(self, new, now):
+        previous = self.last_id
+        for record in new:
+            alert_id = record[0]
+            if 1 < alert_id - previous <= FEED_MAX_GAP + 1:
+                for missing in range(previous + 1, alert_id):
+                    self._gaps[missing] = now
+            previous = alert_id
+
+    def _queue(self, subscription, records):
+        pending = subscription.pending
+        for record in records:
+            if subscription.priorities is None or record[3] in subscription.priorities:
+                pending[record[0]] = record
+
+        excess = len(pending) - self.max_pending
+        if excess > 0:
+            for alert_id in sorted(pending)[:excess]:
+                del pending[alert_id]
+            print(f"Subscritor de alertas '{subscription.name}': {excess} alertas "
+                  f"pendentes descartados (máximo {self.max_pending})")
+
+    def _deliver(self, subscription, columns, now):
+        if not subscription.pending or now < subscription.retry_at:
+            return
+
+        records = [subscription.pending[alert_id] for alert_id in sorted(subscription.pending)]
+        try:
+            subscription.callback(columns, records)
+        except Exception as e:
+            # Os alertas ficam pendentes; nova tentativa após um intervalo crescente
+            subscription.failures += 1
+            subscription.retry_at = now + min(
+                self.min_interval * self.backoff ** subscription.failures, self.max_interval
+            )
+            print(f"Erro no subscritor de alertas '{subscription.name}': {e}")
+            return
+
+        for record in records:
+            del subscription.pending[record[0]]
+        subscription.failures = 0
+        subscription.retry_at = 0
+
+    def start(self, last_id=None):
+        """
+        Inicia (ou reinicia) as consultas em fundo. A marca é reposta na
+        thread do feed (ver reset), sem bloquear quem chama.
+        """
+        self.stop()
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, args=(last_id, self._stop, self._wake),
+            name="alert-feed", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self, timeout=5):
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._wake.set()
+        self._thread.join(timeout)
+        self._thread = None
+
+    def wake(self):
+        """Pede uma consulta imediata (ex: após inserir órbitas)"""
+        self._wake.set()
+
+    def _run(self, last_id, stop, wake):
+        # Sem marca não se consulta, para não entregar o histórico inteiro
+        while not stop.is_set():
+            success, message = self.reset(last_id)
+            if success:
+                break
+            print(f"Erro ao iniciar o feed de alertas: {message}")
+            stop.wait(self.max_interval)
+
+        self.interval = self.min_interval
+        while not stop.is_set():
+            success, result = self.poll()
+            if not success:
+                print(f"Erro ao consultar alertas: {result}")
+                self.interval = self.max_interval
+            elif self.backlog:
+                self.interval = 0
+            elif result:
+                self.interval = self.min_interval
+            else:
+                self.interval = min(max(self.interval, self.min_interval) * self.backoff,
+                                    self.max_interval)
+
+            if wake.wait(self.interval):
+                wake.clear()
+                self.interval = self.min_interval
@@ -0,0 +1,183 @@
+import threading
+from bisect import bisect_left, insort
+
+# database importa este módulo: a constante vem de backends
+from backends import LOOKUP_CHUNK
+
+# Colunas de get_active_alerts
+ACTIVE_ALERTS_SQL = """
+    SELECT
+        a.alert_id,
+        ast.full_name AS asteroid_name,
+        a.alert_date,
+        a.priority_level,
+        a.description,
+        a.is_active
+    FROM Alert a
+    LEFT JOIN Asteroid ast ON a.asteroid_id = ast.asteroid_id
+    WHERE a.is_active = 1
+"""
+
+# Contagem e soma dos ids dos alertas ativos: deteta desativações e
+# eliminações quando não há change tracking
+SIGNATURE_SQL = """
+    SELECT COUNT(*), SUM(CAST(a.alert_id AS BIGINT))
+    FROM Alert a
+    WHERE a.is_active = 1
+"""
+
+VERSION_SQL = """
+    SELECT
+        CHANGE_TRACKING_CURRENT_VERSION(),
+        CHANGE_TRACKING_MIN_VALID_VERSION(OBJECT_ID('Alert'))
+"""
+
+CHANGED_IDS_SQL = "SELECT ct.alert_id FROM CHANGETABLE(CHANGES Alert, ?) AS ct"
+
+
+def _sort_key(record):
+    # ORDER BY alert_date DESC, com NULL no fim (a lista é lida do fim para o início)
+    return (record[2] is not None, record[2], record[0])
+
+
+class ActiveAlerts:
+    """
+    Lista dos alertas ativos mantida em memória, por ordem de alert_date
+    decrescente, que serve de fonte a um VirtualTreeview.
+
+    A primeira leitura (ou quando o filtro muda) é completa; as seguintes só
+    leem o que mudou. Com change tracking do SQL Server, são relidos os alertas
+    alterados desde a última versão (novos, editados, desativados ou
+    eliminados). Sem change tracking, são lidos os alertas com alert_id acima
+    do último visto, e a contagem/soma dos ids ativos confirma que nada foi
+    desativado ou eliminado; se não bater certo, a lista é relida. Nesse modo,
+    edições de um alerta que continua ativo só aparecem numa leitura completa.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self.columns = []
+        self._clear()
+
+    def reset(self):
+        """Esquece a lista; a próxima atualização faz uma leitura completa"""
+        with self._refresh_lock, self._lock:
+            self._clear()
+
+    def _clear(self):
+        self.filter = None
+        self.version = None
+        self.last_id = None
+        self._rows = {}
+        self._keys = []
+        self._id_sum = 0
+
+    def __len__(self):
+        return len(self._keys)
+
+    def get_rows(self, start, count):
+        with self._lock:
+            total = len(self._keys)
+            end = min(start + count, total)
+            return [self._rows[self._keys[total - 1 - index][2]] for index in range(start, end)]
+
+    def close(self):
+        pass
+
+    def refresh(self, pool, filter_sql="", filter_params=(), change_tracking=False, full=False):
+        """
+        Atualiza a lista com os alertas ativos que passam `filter_sql` (condições
+        sobre "a", começadas por AND). Retorna True se a leitura foi completa.
+        """
+        current_filter = (filter_sql, tuple(filter_params))
+
+        with self._refresh_lock:
+            with pool.connection() as connection:
+                cursor = connection.cursor()
+                try:
+                    version = None
+                    if change_tracking:
+                        cursor.execute(VERSION_SQL)
+                        version, min_valid = cursor.fetchone()
+                        if min_valid is None:
+                            version = None
+
+                    full = (full or self.last_id is None or self.filter != current_filter
+                            or (version is not None
+                                and (self.version is None or min_valid > self.version)))
+
+                    if full:
+                        records = self._query(cursor, "", [], current_filter)
+                        self._replace(records, current_filter)
+                    elif version is not None:
+                        self._apply_changes(cursor, current_filter)
+                    else:
+                        records = self._query(cursor, " AND a.alert_id > ?", [self.last_id],
+                                              current_filter)
+                        self._apply(records, ())
+
+                        cursor.execute(SIGNATURE_SQL + filter_sql, list(filter_params))
+                        count, id_sum = cursor.fetchone()
+                        if (count, id_sum or 0) != (len(self._keys), self._id_sum):
+                            records = self._query(cursor, "", [], current_filter)
+                            self._replace(records, current_filter)
+                            full = True
+
+                    self.version = version
+                    return full
+                finally:
+                    cursor.close()
+
+    def _query(self, cursor, condition, params, current_filter):
+        filter_sql, filter_params = current_filter
+        cursor.execute(ACTIVE_ALERTS_SQL + filter_sql + condition,
+                       list(filter_params) + list(params))
+        self.columns = [description[0] for description in cursor.description]
+        return cursor.fetchall()
+
+    def _apply_changes(self, cursor, current_filter):
+        cursor.execute(CHANGED_IDS_SQL, [self.version])
+        changed = [row[0] for row in cursor.fetchall()]
+
+        records = []
+        for start in range(0, len(changed), LOOKUP_CHUNK):
+            chunk = changed[start:start + LOOKUP_CHUNK]
+            placeholders = ", ".join("?" for _ in chunk)
+            records.extend(self._query(cursor, f" AND a.alert_id IN ({placeholders})",
+                                       chunk, current_filter))
+
+        # Alterados que já não aparecem: desativados, eliminados ou fora do filtro
+        still_active = {record[0] for record in records}
+        self._apply(records, [alert_id for alert_id in changed if alert_id not in still_active])
+
+    def _replace(self, records, current_filter):
+        rows = {record[0]: tuple(record) for record in records}
+        keys = sorted(_sort_key(record) for record in rows.values())
+
+        with self._lock:
+            self.filter = current_filter
+            self._rows = rows
+            self._keys = keys
+            self._id_sum = sum(rows)
+            self.last_id = max(rows, default=0)
+
+    def _apply(self, records, removed_ids):
+        with self._lock:
+            for alert_id in removed_ids:
+                self._remove(alert_id)
+
+            for record in records:
+                alert_id = record[0]
+                self._remove(alert_id)
+                self._rows[alert_id] = tuple(record)
+                insort(self._keys, _sort_key(record))
+                self._id_sum += alert_id
+                self.last_id = max(self.last_id, alert_id)
+
+    def _remove(self, alert_id):
+        record = self._rows.pop(alert_id, None)
+        if record is None:
+            return
+        del self._keys[bisect_left(self._keys, _sort_key(record))]
+        self._id_sum -= alert_id
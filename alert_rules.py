@@ -0,0 +1,136 @@
+import numpy as np
+
+# Limiares de trg_GerarAlertas_Orbita (triggers.txt). Podem ser alterados por
+# chamada (parâmetro `thresholds`) para simulações.
+DEFAULT_THRESHOLDS = {
+    'diametro_30m': 0.03,
+    'diametro_50m': 0.05,
+    'diametro_100m': 0.1,
+    'diametro_200m': 0.2,
+    'diametro_500m': 0.5,
+    'distancia_1ld_ua': 0.00257,
+    'moid_ld_perigo': 5,
+    'moid_ld_incerteza': 20,
+    'moid_ld_monitorizacao': 50,
+    'rms_preciso': 0.3,
+    'rms_incerto': 0.8,
+    'albedo_anomalo': 0.3,
+    'e_anomala': 0.8,
+    'i_anomala': 70,
+}
+
+# Descrições do trigger, pela ordem do CASE
+DESCRIPTIONS = (
+    'CRÍTICO: Aproximação < 1 Distância Lunar',
+    'PERIGO: Objeto próximo com órbita precisa',
+    'INCERTEZA: PHA com trajetória instável',
+    'MONITORIZAÇÃO: Novo objeto de grande porte',
+    'ANOMALIA: Parâmetros orbitais atípicos',
+)
+
+# Colunas usadas pelas regras: do asteroide e da órbita
+ASTEROID_FIELDS = ('diameter', 'pha', 'albedo')
+ORBIT_FIELDS = ('moid', 'moid_ld', 'rms', 'e', 'i')
+
+# Órbitas com os dados do asteroide, pela ordem de ALERT_FIELDS
+ALERT_QUERY = """
+    SELECT op.orbit_param_id, op.asteroid_id,
+           a.diameter, a.pha, a.albedo,
+           op.moid, op.moid_ld, op.rms, op.e, op.i
+    FROM Orbital_Parameters op
+    INNER JOIN Asteroid a ON op.asteroid_id = a.asteroid_id
+"""
+ALERT_FIELDS = ('orbit_param_id', 'asteroid_id') + ASTEROID_FIELDS + ORBIT_FIELDS
+
+
+def to_arrays(records, columns=ALERT_FIELDS):
+    """
+    Converte registos da base de dados em arrays por coluna.
+    Valores NULL passam a NaN (ver evaluate); pha passa a booleano.
+    """
+    count = len(records)
+    arrays = {}
+    for index, column in enumerate(columns):
+        values = (record[index] for record in records)
+        if column == 'pha':
+            # Como no SQL Server (collation por omissão): sem distinguir
+            # maiúsculas e ignorando espaços finais
+            arrays[column] = np.fromiter(
+                (value is not None and str(value).rstrip().upper() == 'Y' for value in values),
+                dtype=bool, count=count
+            )
+        elif column in ('orbit_param_id', 'asteroid_id'):
+            arrays[column] = np.fromiter(values, dtype=np.int64, count=count)
+        else:
+            arrays[column] = np.fromiter(
+                (np.nan if value is None else float(value) for value in values),
+                dtype=np.float64, count=count
+            )
+    return arrays
+
+
+def evaluate(arrays, thresholds=None):
+    """
+    Avalia as regras de trg_GerarAlertas_Orbita sobre arrays inteiros.
+
+    `arrays` tem as colunas de ASTEROID_FIELDS e ORBIT_FIELDS (ver to_arrays),
+    com NaN nos valores NULL: qualquer comparação com NaN é falsa, tal como
+    uma comparação com NULL não é verdadeira em SQL, e as regras não usam NOT.
+    Retorna (gera_alerta, prioridade, índice em DESCRIPTIONS); prioridade e
+    descrição só têm significado onde gera_alerta é verdadeiro.
+    """
+    t = dict(DEFAULT_THRESHOLDS, **(thresholds or {}))
+
+    diameter = arrays['diameter']
+    pha = arrays['pha']
+    albedo = arrays['albedo']
+    moid = arrays['moid']
+    moid_ld = arrays['moid_ld']
+    rms = arrays['rms']
+    e = arrays['e']
+    i = arrays['i']
+
+    # Suprimir os avisos de comparações com NaN
+    with np.errstate(invalid='ignore'):
+        critico = (diameter > t['diametro_30m']) & (moid < t['distancia_1ld_ua'])
+        perigo_proximo = (diameter > t['diametro_50m']) & (moid_ld < t['moid_ld_perigo'])
+        perigo = perigo_proximo & (rms < t['rms_preciso'])
+        pha_incerto = pha & (rms > t['rms_incerto'])
+        incerteza = (pha_incerto & (diameter > t['diametro_100m'])
+                     & (moid_ld < t['moid_ld_incerteza']))
+        grande_porte = diameter > t['diametro_500m']
+        monitorizacao = grande_porte & (moid_ld < t['moid_ld_monitorizacao'])
+        anomalia = ((albedo > t['albedo_anomalo']) & (e > t['e_anomala'])
+                    & (i > t['i_anomala']) & (diameter > t['diametro_200m']))
+
+    fires = critico | perigo | incerteza | monitorizacao | anomalia
+
+    # CASE da prioridade: a primeira condição verdadeira ganha
+    priority = np.select(
+        [critico, perigo, incerteza, monitorizacao, anomalia],
+        [4, 3, 3, 2, 1],
+        default=1
+    ).astype(np.int8)
+
+    # O CASE da descrição tem condições próprias (mais largas que as da prioridade)
+    description = np.select(
+        [critico, perigo_proximo, pha_incerto, grande_porte],
+        [0, 1, 2, 3],
+        default=4
+    ).astype(np.int8)
+
+    return fires, priority, description
+
+
+def generate_alerts(arrays, thresholds=None):
+    """
+    Alertas que o trigger criaria para as órbitas em `arrays` (que deve ter
+    asteroid_id). Retorna uma lista de (asteroid_id, priority_level, description).
+    """
+    fires, priority, description = evaluate(arrays, thresholds)
+    indices = np.flatnonzero(fires)
+    return list(zip(
+        arrays['asteroid_id'][indices].tolist(),
+        priority[indices].tolist(),
+        [DESCRIPTIONS[index] for index in description[indices].tolist()]
+    ))
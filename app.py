@@ -1,17 +1,23 @@
 import customtkinter
 from tkinter import messagebox, ttk
 import tkinter as tk
+import queue
 from database import (
-    connect_to_db, get_all_tables, get_table_structure, get_primary_key,
+    connect_to_db, connect_to_sqlite, get_all_tables, get_table_structure, get_primary_key,
     create_table_in_db, insert_record_into_table, update_record_in_table,
-    delete_record_from_table, query_table_with_filters, load_record_for_update_from_db,
-    get_connection, setup_triggers, setup_views, check_triggers_exist,
+    delete_record_from_table, query_table_page, count_table_with_filters,
+    fetch_page_after, fetch_page_before,
+    load_record_for_update_from_db,
+    invalidate_schema_cache, setup_triggers, setup_views, check_triggers_exist,
     get_all_triggers, enable_disable_trigger, drop_trigger,
     execute_view,
-    get_active_alerts, get_notification_settings, update_notification_settings,
-    get_statistics, check_new_high_priority_alerts, load_notification_settings_for_email,
-    create_notification_table
+    refresh_active_alerts, get_notification_settings, update_notification_settings,
+    get_statistics, load_notification_settings_for_email,
+    create_notification_table, enable_change_tracking
 )
+from alert_feed import AlertFeed
+from executor import BackgroundExecutor
+from virtual_tree import VirtualTreeview, ListSource, PagedSource
 
 customtkinter.set_appearance_mode("system")
 customtkinter.set_default_color_theme("dark-blue")
@@ -25,6 +31,65 @@ current_table = None
 insert_fields_cache = []
 update_fields_cache = []
 
+# Registos pedidos ao servidor por página na aba "Consultar Dados"
+QUERY_PAGE_SIZE = 500
+
+# Barra de estado (operações de BD em curso)
+status_bar = customtkinter.CTkFrame(app, height=30)
+status_bar.pack(side="bottom", fill="x", padx=20, pady=(0, 10))
+
+busy_label = customtkinter.CTkLabel(
+    status_bar,
+    text="",
+    font=("Arial", 11)
+)
+busy_label.pack(side="left", padx=10)
+
+busy_progress = customtkinter.CTkProgressBar(status_bar, mode="indeterminate", width=200)
+
+# Descrição das operações de fundo, por chave do executor (ou pelo prefixo
+# antes de "-", nas chaves com um pedido por item, ex: "pagina-<fonte>-<n>")
+busy_descriptions = {
+    "pagina": "a carregar linhas",
+    "conexao": "a conectar",
+    "consulta": "a consultar dados",
+    "alertas": "a carregar alertas",
+    "estatisticas": "a carregar estatísticas",
+    "grafico": "a preparar gráfico",
+    "notificacoes": "a verificar notificações"
+}
+busy_keys = set()
+
+def atualizar_indicador_ocupado(key, busy):
+    if busy:
+        busy_keys.add(key)
+    else:
+        busy_keys.discard(key)
+
+    if busy_keys:
+        descricoes = list(dict.fromkeys(
+            busy_descriptions.get(k.split("-")[0], k) for k in sorted(busy_keys)
+        ))
+        busy_label.configure(text="Em curso: " + ", ".join(descricoes) + "...")
+        if not busy_progress.winfo_ismapped():
+            busy_progress.pack(side="right", padx=10)
+            busy_progress.start()
+    else:
+        busy_label.configure(text="")
+        busy_progress.stop()
+        busy_progress.pack_forget()
+
+# Executor para trabalho de BD fora da thread do Tk
+executor = BackgroundExecutor(app, on_busy_change=atualizar_indicador_ocupado)
+
+# Feed de alertas novos, consultado em fundo. A interface é um dos subscritores:
+# recebe os alertas numa fila, lida na thread do Tk
+alert_feed = AlertFeed()
+alertas_recebidos = queue.Queue()
+alert_feed.subscribe(lambda columns, records: alertas_recebidos.put(records), name="interface")
+# Alertas de alta prioridade ainda por mostrar na notificação
+alertas_por_notificar = 0
+
 # Criar sistema de abas
 tabview = customtkinter.CTkTabview(app)
 tabview.pack(padx=20, pady=20, fill="both", expand=True)
@@ -145,6 +210,23 @@ entry_database = customtkinter.CTkEntry(
 )
 entry_database.grid(row=4, column=1, padx=5, pady=5)
 
+# Motor: SQL Server ou ficheiro SQLite local (a base de dados é o caminho do ficheiro)
+label_motor = customtkinter.CTkLabel(
+    frame_campos,
+    text="Motor:",
+    font=("Arial", 12)
+)
+label_motor.grid(row=5, column=0, padx=5, pady=5, sticky="w")
+
+motor_combo = customtkinter.CTkComboBox(
+    frame_campos,
+    values=["SQL Server", "SQLite (ficheiro local)"],
+    width=250,
+    state="readonly"
+)
+motor_combo.grid(row=5, column=1, padx=5, pady=5)
+motor_combo.set("SQL Server")
+
 # Botão Ligar à BD
 btn_ligar = customtkinter.CTkButton(
     frame_principal,
@@ -521,7 +603,7 @@ tree_scroll_y.pack(side=tk.RIGHT, fill=tk.Y)
 tree_scroll_x = tk.Scrollbar(tree_frame, orient=tk.HORIZONTAL)
 tree_scroll_x.pack(side=tk.BOTTOM, fill=tk.X)
 
-results_tree = ttk.Treeview(
+results_tree = VirtualTreeview(
     tree_frame,
     yscrollcommand=tree_scroll_y.set,
     xscrollcommand=tree_scroll_x.set,
@@ -686,8 +768,9 @@ alerts_tree_scroll_y.pack(side=tk.RIGHT, fill=tk.Y)
 alerts_tree_scroll_x = tk.Scrollbar(alerts_list_frame, orient=tk.HORIZONTAL)
 alerts_tree_scroll_x.pack(side=tk.BOTTOM, fill=tk.X)
 
-alerts_tree = ttk.Treeview(
+alerts_tree = VirtualTreeview(
     alerts_list_frame,
+    format_row=lambda record: formatar_alerta(record),
     yscrollcommand=alerts_tree_scroll_y.set,
     xscrollcommand=alerts_tree_scroll_x.set,
     selectmode="extended",
@@ -753,7 +836,7 @@ load_stats_btn = customtkinter.CTkButton(
     stats_button_frame,
     text="Atualizar Estatísticas",
     width=200,
-    command=lambda: load_statistics()
+    command=lambda: load_statistics(refresh=True)
 )
 load_stats_btn.pack(pady=10)
 
@@ -807,7 +890,7 @@ atualizar_dados_btn = customtkinter.CTkButton(
     graficos_controls_frame,
     text="Atualizar Dados",
     width=150,
-    command=lambda: criar_grafico_selecionado()
+    command=lambda: criar_grafico_selecionado(refresh=True)
 )
 atualizar_dados_btn.pack(side="left", padx=10)
 
@@ -885,7 +968,7 @@ view_tree_scroll_y.pack(side=tk.RIGHT, fill=tk.Y)
 view_tree_scroll_x = tk.Scrollbar(view_results_frame, orient=tk.HORIZONTAL)
 view_tree_scroll_x.pack(side=tk.BOTTOM, fill=tk.X)
 
-view_tree = ttk.Treeview(
+view_tree = VirtualTreeview(
     view_results_frame,
     yscrollcommand=view_tree_scroll_y.set,
     xscrollcommand=view_tree_scroll_x.set,
@@ -1056,8 +1139,9 @@ triggers_status.pack(pady=5)
 def ligar_bd():
     servidor = entry_server.get().strip()
     database = entry_database.get().strip()
+    sqlite = motor_combo.get().startswith("SQLite")
 
-    if not servidor:
+    if not servidor and not sqlite:
         messagebox.showerror("Erro", "Por favor, insira o nome do servidor")
         return
 
@@ -1069,7 +1153,38 @@ def ligar_bd():
     usuario = entry_user.get().strip()
     password = entry_password.get()
 
-    success, message, connection_info = connect_to_db(servidor, database, usuario, password, porta)
+    btn_ligar.configure(state="disabled")
+    executor.submit(
+        "conexao", conectar_e_preparar, servidor, database, usuario, password, porta, sqlite,
+        on_success=concluir_ligacao,
+        on_error=lambda e: concluir_ligacao((False, str(e), None, None))
+    )
+
+def conectar_e_preparar(servidor, database, usuario, password, porta, sqlite=False):
+    """
+    Executado em fundo: conecta e garante a tabela de notificações
+    """
+    if sqlite:
+        success, message, connection_info = connect_to_sqlite(database)
+    else:
+        success, message, connection_info = connect_to_db(servidor, database, usuario, password, porta)
+
+    message_notif = None
+    if success:
+        # Criar tabela de notificações se não existir
+        success_notif, message_notif = create_notification_table()
+
+        # Estatísticas incrementais; sem permissões usa-se a leitura completa
+        if not sqlite:
+            success_ct, message_ct = enable_change_tracking()
+            if not success_ct:
+                print(message_ct)
+
+    return success, message, connection_info, message_notif
+
+def concluir_ligacao(resultado):
+    success, message, connection_info, message_notif = resultado
+    btn_ligar.configure(state="normal")
 
     if success:
         connection_status.configure(
@@ -1081,33 +1196,35 @@ def ligar_bd():
             "Conexão Estabelecida",
             f"Conectado com sucesso!\n\n"
             f"Base de Dados: {connection_info['database_name']}\n"
-            f"SQL Server: {connection_info['sql_version']}"
+            f"{connection_info['backend']}: {connection_info['sql_version']}"
         )
+        for aviso in connection_info.get('avisos', []):
+            messagebox.showwarning("Aviso", aviso)
 
         # Atualizar lista de tabelas após conectar
         atualizar_lista_tabelas()
         add_column_field()
 
-        # Criar tabela de notificações se não existir
-        success_notif, message_notif = create_notification_table()
-        if success_notif:
-            print(f"{message_notif}")
-        else:
+        if message_notif:
             print(f"{message_notif}")
 
         # Carregar configurações de notificação se existir email
         if email_entry.get().strip():
             carregar_configuracoes_notificacao()
 
-        # Iniciar verificação periódica de alertas (após 5 segundos)
-        app.after(5000, check_new_alerts_periodic)
+        # Acompanhar os alertas criados a partir de agora
+        alert_feed.start()
 
     else:
         connection_status.configure(text="Não conectado", text_color="red")
         messagebox.showerror("Erro de Conexão", message)
 
-def atualizar_lista_tabelas():
+def atualizar_lista_tabelas(forcar=False):
     try:
+        if forcar:
+            # Botão "Atualizar": reler os metadados do servidor
+            invalidate_schema_cache()
+
         tabelas = get_all_tables()
 
         # Atualizar comboboxes
@@ -1297,6 +1414,8 @@ def insert_record(fields, primary_key):
     success, message = insert_record_into_table(current_table, record_data)
 
     if success:
+        # Os triggers podem ter criado alertas
+        alert_feed.wake()
         messagebox.showinfo("Sucesso", message)
         for field in fields:
             field['entry'].delete(0, 'end')
@@ -1351,6 +1470,7 @@ def update_record(fields, primary_key):
     success, message = update_record_in_table(current_table, update_data)
 
     if success:
+        alert_feed.wake()
         messagebox.showinfo("Sucesso", message)
         update_id_entry.delete(0, 'end')
         for field in fields:
@@ -1399,27 +1519,89 @@ def query_table():
             'value': filter_value
         }
 
-    success, result = query_table_with_filters(table_name, filters)
+    # A contagem e a primeira página chegam juntas; as restantes páginas
+    # são pedidas pela Treeview à medida que se faz scroll
+    executor.submit(
+        "consulta", obter_primeira_pagina, table_name, filters,
+        on_success=lambda resposta: mostrar_resultados_consulta(resposta, table_name, filters)
+    )
 
-    if success:
-        columns, records = result
+def obter_primeira_pagina(table_name, filters):
+    """
+    Executado em fundo: total de registos e primeira página da consulta
+    """
+    success, total = count_table_with_filters(table_name, filters)
+    if not success:
+        return False, total
 
-        # Limpar resultados anteriores
-        results_tree.delete(*results_tree.get_children())
-        results_tree["columns"] = columns
+    # Chaves da primeira/última linha de cada página já lida, para que as
+    # páginas vizinhas sejam pedidas por chave (seek) em vez de OFFSET
+    paginacao = {'primary_key': get_primary_key(table_name), 'index': None, 'keys': {}}
+
+    if paginacao['primary_key']:
+        success, result = fetch_page_after(table_name, None, QUERY_PAGE_SIZE, filters)
+    else:
+        success, result = query_table_page(table_name, filters, 0, QUERY_PAGE_SIZE)
+    if not success:
+        return False, result
+
+    columns, records, has_more = result
+    if paginacao['primary_key'] in columns:
+        paginacao['index'] = columns.index(paginacao['primary_key'])
+        guardar_chaves_pagina(paginacao, 0, records)
+
+    return True, (columns, records, total, paginacao)
+
+def guardar_chaves_pagina(paginacao, page, records):
+    if paginacao['index'] is not None and records:
+        index = paginacao['index']
+        paginacao['keys'][page] = (records[0][index], records[-1][index])
+
+def carregar_pagina_consulta(table_name, filters, page, paginacao):
+    """
+    Executado em fundo: registos de uma página da consulta.
+    Usa a página anterior (ou seguinte) já conhecida para pedir esta por chave;
+    saltos para páginas distantes recorrem a OFFSET.
+    """
+    keys = paginacao['keys']
+    if paginacao['index'] is not None and page - 1 in keys:
+        success, result = fetch_page_after(table_name, keys[page - 1][1], QUERY_PAGE_SIZE, filters)
+    elif paginacao['index'] is not None and page + 1 in keys:
+        success, result = fetch_page_before(table_name, keys[page + 1][0], QUERY_PAGE_SIZE, filters)
+    else:
+        success, result = query_table_page(table_name, filters, page, QUERY_PAGE_SIZE)
+
+    if not success:
+        raise RuntimeError(result)
+
+    records = result[1]
+    guardar_chaves_pagina(paginacao, page, records)
+    return records
+
+def mostrar_resultados_consulta(resposta, table_name, filters):
+    success, result = resposta
+
+    if success:
+        columns, records, total, paginacao = result
 
         # Configurar colunas
+        results_tree["columns"] = columns
         for col in columns:
             results_tree.heading(col, text=col)
             results_tree.column(col, width=120, minwidth=50, stretch=True)
 
-        # Adicionar registos
-        for record in records:
-            str_record = [str(val) if val is not None else "" for val in record]
-            results_tree.insert('', 'end', values=str_record)
+        source = PagedSource(
+            lambda page: carregar_pagina_consulta(table_name, filters, page, paginacao),
+            total,
+            page_size=QUERY_PAGE_SIZE,
+            executor=executor,
+            on_loaded=results_tree.refresh
+        )
+        source.seed(0, records)
+        results_tree.set_source(source)
 
         # Atualizar estatísticas
-        stats_label.configure(text=f"Total de registos: {len(records)}")
+        stats_label.configure(text=f"Total de registos: {total}")
 
         # Atualizar combo de filtros
         filter_column_combo.configure(values=columns)
@@ -1480,9 +1662,10 @@ def save_notification_settings():
     else:
         messagebox.showerror("Erro", message)
 
-def load_active_alerts():
+def load_active_alerts(full=False):
     """
-    Carrega alertas ativos com filtros
+    Carrega alertas ativos com filtros. A lista fica em memória e cada nova
+    chamada só lê os alertas criados ou alterados entretanto.
     """
     filters = {}
 
@@ -1490,111 +1673,142 @@ def load_active_alerts():
     if priority != "Todas":
         filters['priority'] = priority
 
-    success, result = get_active_alerts(filters)
-
-    if success:
-        # Limpar treeview
-        for item in alerts_tree.get_children():
-            alerts_tree.delete(item)
-
-        columns, records = result
-
-        # Adicionar registos
-        for record in records:
-            # Mapear priority_level de int para texto
-            priority_level = record[3]  # priority_level é int
-            priority_text = {
-                1: 'Alta',
-                2: 'Média',
-                3: 'Baixa'
-            }.get(priority_level, f'Nível {priority_level}')
-
-            # Formatar data
-            alert_date = record[2]
-            if alert_date:
-                try:
-                    date_str = alert_date.strftime("%Y-%m-%d %H:%M")
-                except:
-                    date_str = str(alert_date)
-            else:
-                date_str = ""
-
-            # Formatar ativo
-            is_active = "Sim" if record[5] else "Não"
+    executor.submit(
+        "alertas", refresh_active_alerts, filters, full,
+        on_success=mostrar_alertas_ativos
+    )
 
-            # Formatar nome do asteroide (pode ser None)
-            asteroid_name = record[1] if record[1] else "Desconhecido"
+def mostrar_alertas_ativos(resposta):
+    success, result = resposta
 
-            alerts_tree.insert('', 'end', values=(
-                record[0],  # alert_id
-                asteroid_name,
-                date_str,
-                priority_text,
-                record[4] or "",  # description
-                is_active  # is_active
-            ))
+    if success:
+        # `result` é a lista em memória: basta redesenhar as linhas visíveis
+        if alerts_tree.source is not result:
+            alerts_tree.set_source(result)
+        else:
+            alerts_tree.refresh()
 
         # Atualizar estatísticas
-        alerts_stats_label.configure(text=f"Total de alertas ativos: {len(records)}")
-
-        # Verificar se há novos alertas de alta prioridade
-        if priority == "Todas" or priority == "Alta":
-            check_high_priority_notifications()
+        alerts_stats_label.configure(text=f"Total de alertas ativos: {len(result)}")
 
     else:
         messagebox.showerror("Erro", result)
         print(f"Erro ao carregar alertas: {result}")
 
+def formatar_alerta(record):
+    """
+    Valores de uma linha de alerta como aparecem na lista
+    """
+    # Mapear priority_level de int para texto
+    priority_level = record[3]  # priority_level é int
+    priority_text = {
+        1: 'Alta',
+        2: 'Média',
+        3: 'Baixa'
+    }.get(priority_level, f'Nível {priority_level}')
+
+    # Formatar data
+    alert_date = record[2]
+    if alert_date:
+        try:
+            date_str = alert_date.strftime("%Y-%m-%d %H:%M")
+        except:
+            date_str = str(alert_date)
+    else:
+        date_str = ""
+
+    # Formatar ativo
+    is_active = "Sim" if record[5] else "Não"
+
+    # Formatar nome do asteroide (pode ser None)
+    asteroid_name = record[1] if record[1] else "Desconhecido"
+
+    return (
+        record[0],  # alert_id
+        asteroid_name,
+        date_str,
+        priority_text,
+        record[4] or "",  # description
+        is_active  # is_active
+    )
+
 def clear_alert_filters():
     """
     Limpa os filtros de alertas
     """
     priority_combo.set("Todas")
-    load_active_alerts()
+    load_active_alerts(full=True)
+
+def processar_alertas_recebidos():
+    """
+    Trata os alertas novos entregues pelo feed (verifica a fila a cada segundo)
+    """
+    global alertas_por_notificar
+
+    records = []
+    while True:
+        try:
+            records.extend(alertas_recebidos.get_nowait())
+        except queue.Empty:
+            break
+
+    if records:
+        # Alta prioridade = 1
+        novos_alta = sum(1 for record in records if record[3] == 1)
+        if novos_alta:
+            alertas_por_notificar += novos_alta
+            verificar_notificacao_alta_prioridade()
+
+        if tabview.get() == "Alertas e Monitorização":
+            load_active_alerts()
+
+    app.after(1000, processar_alertas_recebidos)
 
-def check_high_priority_notifications():
+def verificar_notificacao_alta_prioridade():
     """
-    Verifica se há novos alertas de alta prioridade (priority_level = 1)
+    Notifica os novos alertas de alta prioridade, se o email atual os quiser receber
     """
     email = email_entry.get().strip()
 
     if not email:
         return
 
-    # Verificar se o usuário quer notificações de alta prioridade
-    success_settings, settings = load_notification_settings_for_email(email)
+    executor.submit(
+        "notificacoes", load_notification_settings_for_email, email,
+        on_success=mostrar_notificacao_alta_prioridade
+    )
 
-    if success_settings and settings['high_priority']:
-        # Verificar novos alertas de alta prioridade (priority_level = 1)
-        success_alerts, new_alerts = check_new_high_priority_alerts()
+def mostrar_notificacao_alta_prioridade(resposta):
+    global alertas_por_notificar
 
-        if success_alerts and new_alerts > 0:
-            # Mostrar notificação
-            messagebox.showwarning(
-                "NOVO ALERTA DE ALTA PRIORIDADE",
-                f"Existem {new_alerts} novo(s) alerta(s) de alta prioridade (nível 1)!\n\n"
-                f"Verifique a aba 'Alertas e Monitorização' para mais detalhes."
-            )
+    success_settings, settings = resposta
+    novos = alertas_por_notificar
+    alertas_por_notificar = 0
+
+    if success_settings and settings['high_priority'] and novos:
+        messagebox.showwarning(
+            "NOVO ALERTA DE ALTA PRIORIDADE",
+            f"Existem {novos} novo(s) alerta(s) de alta prioridade (nível 1)!\n\n"
+            f"Verifique a aba 'Alertas e Monitorização' para mais detalhes."
+        )
 
-def check_new_alerts_periodic():
+def load_statistics(refresh=False):
     """
-    Verificação periódica de novos alertas (a cada 60 segundos)
+    Carrega estatísticas em fundo e exibe-as quando chegarem
+    (da cache partilhada, exceto se `refresh` for pedido)
     """
-    # Só verificar se estiver na aba de alertas
-    current_tab = tabview.get()
-    if current_tab == "Alertas e Monitorização":
-        # Verificar notificações para o email atual
-        check_high_priority_notifications()
-
-    # Agendar próxima verificação em 60 segundos
-    app.after(60000, check_new_alerts_periodic)
+    executor.submit(
+        "estatisticas", get_statistics, refresh=refresh,
+        on_success=mostrar_estatisticas,
+        on_error=lambda e: messagebox.showerror("Erro", f"Falha crítica ao carregar estatísticas: {str(e)}")
+    )
 
-def load_statistics():
+def mostrar_estatisticas(resposta):
     """
-    Carrega e exibe estatísticas completas - VERSÃO ROBUSTA
+    Exibe estatísticas completas - VERSÃO ROBUSTA
     """
     try:
-        success, stats = get_statistics()
+        success, stats = resposta
 
         if success:
             # Limpar frame de estatísticas
@@ -1819,18 +2033,26 @@ def load_statistics():
     except Exception as e:
         messagebox.showerror("Erro", f"Falha crítica ao carregar estatísticas: {str(e)}")
 
-def criar_grafico_selecionado():
+def criar_grafico_selecionado(refresh=False):
     """
     Cria o gráfico selecionado pelo usuário
     """
     tipo_grafico = grafico_combo.get()
 
+    executor.submit(
+        "grafico", get_statistics, refresh=refresh,
+        on_success=lambda resposta: desenhar_grafico(tipo_grafico, resposta)
+    )
+
+def desenhar_grafico(tipo_grafico, resposta):
+    """
+    Desenha o gráfico com as estatísticas obtidas em fundo
+    """
     # Limpar frame do gráfico
     for widget in grafico_frame.winfo_children():
         widget.destroy()
 
-    # Obter estatísticas
-    success, stats = get_statistics()
+    success, stats = resposta
 
     if not success:
         error_label = customtkinter.CTkLabel(
@@ -2092,10 +2314,13 @@ def verificar_triggers():
         triggers_status.configure(text=message, text_color="orange")
         messagebox.showwarning("Aviso", message)
 
-def atualizar_lista_triggers():
+def atualizar_lista_triggers(forcar=False):
     """
     Atualiza a lista de triggers na interface
     """
+    if forcar:
+        invalidate_schema_cache()
+
     triggers = get_all_triggers()
 
     # Limpar treeview
@@ -2194,8 +2419,6 @@ def executar_view_selecionada(view_name):
     if success:
         columns, records = result
 
-        # Limpar resultados anteriores
-        view_tree.delete(*view_tree.get_children())
         view_tree["columns"] = columns
 
         # Configurar colunas
@@ -2203,10 +2426,8 @@ def executar_view_selecionada(view_name):
             view_tree.heading(col, text=col)
             view_tree.column(col, width=120, minwidth=50, stretch=True)
 
-        # Adicionar registos
-        for record in records:
-            str_record = [str(val) if val is not None else "" for val in record]
-            view_tree.insert('', 'end', values=str_record)
+        # Apenas as linhas visíveis passam a itens da Treeview
+        view_tree.set_source(ListSource(records))
 
         # Atualizar estatísticas
         view_stats_label.configure(text=f"Total de registos: {len(records)}")
@@ -2216,11 +2437,11 @@ def executar_view_selecionada(view_name):
 # Configurar comandos dos botões
 btn_ligar.configure(command=ligar_bd)
 create_table_btn.configure(command=create_table)
-refresh_tables_btn.configure(command=atualizar_lista_tabelas)
+refresh_tables_btn.configure(command=lambda: atualizar_lista_tabelas(forcar=True))
 
 # Configurar eventos
 table_combo.configure(command=lambda value: load_table_for_crud())
-query_refresh_btn.configure(command=atualizar_lista_tabelas)
+query_refresh_btn.configure(command=lambda: atualizar_lista_tabelas(forcar=True))
 query_all_btn.configure(command=query_table)
 apply_filter_btn.configure(command=query_table)
 clear_filter_btn.configure(command=clear_filters)
@@ -2230,11 +2451,12 @@ query_table_combo.configure(command=lambda value: query_table())
 setup_triggers_btn.configure(command=configurar_triggers)
 setup_views_btn.configure(command=configurar_views)
 check_triggers_btn.configure(command=verificar_triggers)
-refresh_triggers_btn.configure(command=atualizar_lista_triggers)
+refresh_triggers_btn.configure(command=lambda: atualizar_lista_triggers(forcar=True))
 enable_trigger_btn.configure(command=ativar_trigger_selecionado)
 disable_trigger_btn.configure(command=desativar_trigger_selecionado)
 delete_trigger_btn.configure(command=eliminar_trigger_selecionado)
 
 # Inicializar aplicações
 add_column_field()
+app.after(1000, processar_alertas_recebidos)
 app.mainloop()
\ No newline at end of file
@@ -0,0 +1,544 @@
+from decimal import Decimal
+import os
+import sqlite3
+
+from schema_cache import load_catalog as load_sqlserver_catalog
+
+try:
+    import pyodbc
+except ImportError:
+    # Só é necessário para o SQL Server; o SQLite funciona sem ele
+    pyodbc = None
+
+# Máximo de parâmetros por IN (...): 2100 no SQL Server, 999 em SQLite antigo
+LOOKUP_CHUNK = 900
+
+# O sqlite3 não sabe guardar Decimal (colunas decimal/numeric do ingest)
+sqlite3.register_adapter(Decimal, str)
+
+
+class Backend:
+    """
+    Interface comum dos motores de base de dados usados por database.py.
+
+    Cada motor sabe abrir conexões e ler o catálogo, e fornece os pedaços de
+    SQL que mudam entre dialetos (data atual, limites, paginação...). O resto
+    do SQL de database.py é comum: ambos os drivers usam parâmetros "?".
+    """
+
+    name = None
+
+    # Lotes com vários SELECT lidos com cursor.nextset()
+    supports_batches = False
+    # Change tracking (estatísticas incrementais)
+    supports_change_tracking = False
+
+    # Ficheiros com as views e os triggers do sistema
+    views_file = None
+    triggers_file = None
+
+    # Expressões SQL
+    now = None
+    today = None
+    current_year = None
+
+    def connect(self):
+        """Abre uma nova conexão (usada como fábrica do ConnectionPool)"""
+        raise NotImplementedError
+
+    def describe(self, connection):
+        """Retorna (versão do motor, nome da base de dados)"""
+        raise NotImplementedError
+
+    def connection_error(self, error):
+        """Mensagem a mostrar quando a conexão falha"""
+        return f"Não foi possível conectar: {error}"
+
+    def load_catalog(self, connection):
+        """Lê os metadados no formato de SchemaCache"""
+        raise NotImplementedError
+
+    def initialize(self, connection):
+        """Preparação feita uma vez após conectar"""
+
+    def try_date(self, expression):
+        """Converte `expression` para data, ou NULL se não for válida"""
+        raise NotImplementedError
+
+    def limit(self, sql, count):
+        """Limita um SELECT (já com ORDER BY) a `count` registos"""
+        raise NotImplementedError
+
+    def paginate(self, sql, params, offset, count):
+        """Acrescenta OFFSET/LIMIT a um SELECT com ORDER BY; retorna (sql, params)"""
+        raise NotImplementedError
+
+    def execute_script(self, cursor, sql):
+        """Executa um lote com várias instruções"""
+        cursor.execute(sql)
+
+    def begin_transaction(self, connection):
+        """Inicia uma transação explícita (as conexões estão em autocommit)"""
+
+    def end_transaction(self, connection):
+        """Volta ao modo autocommit depois de begin_transaction"""
+
+    def prepare_bulk(self, cursor, columns):
+        """Prepara `cursor` para executemany com colunas de get_table_structure"""
+
+    # Tabela temporária usada por upsert_records (existe só na conexão)
+    stage_table = None
+
+    def create_stage_sql(self, table_name, columns):
+        """Cria a tabela temporária vazia com os tipos das `columns` de `table_name`"""
+        raise NotImplementedError
+
+    def drop_stage_sql(self):
+        return f"DROP TABLE IF EXISTS {self.stage_table}"
+
+    def merge_from_stage(self, cursor, table_name, key_column, columns):
+        """
+        Aplica a tabela temporária a `table_name` pela coluna `key_column`:
+        atualiza os registos que mudaram e insere os novos.
+        Retorna (inseridos, atualizados)
+        """
+        raise NotImplementedError
+
+    def trigger_toggle_sql(self, trigger_name, enable, table_name=None):
+        """
+        SQL para ativar/desativar um trigger (da tabela `table_name`, ou da base
+        de dados), ou None se não for suportado
+        """
+        return None
+
+    def notification_table_sql(self):
+        """Script que cria a tabela NotificationSettings se não existir"""
+        raise NotImplementedError
+
+    def close_approach_table_sql(self):
+        """Script que cria a tabela Close_Approach (aproximações à Terra) se não existir"""
+        raise NotImplementedError
+
+
+class SqlServerBackend(Backend):
+    """SQL Server via pyodbc (ODBC Driver 17)"""
+
+    name = "SQL Server"
+    supports_batches = True
+    supports_change_tracking = True
+    views_file = 'queries.txt'
+    triggers_file = 'triggers.txt'
+
+    now = "GETDATE()"
+    today = "CAST(GETDATE() AS DATE)"
+    current_year = "YEAR(GETDATE())"
+
+    def __init__(self, server, database, username=None, password=None, port=None):
+        if port:
+            server_completo = f"{server},{port}"
+        else:
+            server_completo = server
+
+        if username and password:
+            # Autenticação SQL Server
+            self.conn_str = (
+                f'DRIVER={{ODBC Driver 17 for SQL Server}};'
+                f'SERVER={server_completo};'
+                f'DATABASE={database};'
+                f'UID={username};'
+                f'PWD={password};'
+            )
+        else:
+            # Autenticação Windows
+            self.conn_str = (
+                f'DRIVER={{ODBC Driver 17 for SQL Server}};'
+                f'SERVER={server_completo};'
+                f'DATABASE={database};'
+                f'Trusted_Connection=yes;'
+            )
+        self.database = database
+
+    def connect(self):
+        if pyodbc is None:
+            raise RuntimeError("O módulo pyodbc não está instalado")
+
+        conn = pyodbc.connect(self.conn_str, timeout=10)
+        conn.autocommit = True
+        return conn
+
+    def describe(self, connection):
+        cursor = connection.cursor()
+        cursor.execute("SELECT @@VERSION, DB_NAME()")
+        resultado = cursor.fetchone()
+        cursor.close()
+        return resultado[0].split('\n')[0], resultado[1]
+
+    def connection_error(self, error):
+        error_msg = str(error)
+        if "Login failed" in error_msg:
+            return "Falha no login. Verifique utilizador e password."
+        elif "Cannot open database" in error_msg:
+            return f"A base de dados '{self.database}' não existe."
+        return super().connection_error(error_msg)
+
+    def load_catalog(self, connection):
+        return load_sqlserver_catalog(connection)
+
+    def try_date(self, expression):
+        return f"TRY_CAST({expression} AS DATE)"
+
+    def limit(self, sql, count):
+        return sql.replace("SELECT", f"SELECT TOP ({int(count)})", 1)
+
+    def paginate(self, sql, params, offset, count):
+        return sql + " OFFSET ? ROWS FETCH NEXT ? ROWS ONLY", list(params) + [offset, count]
+
+    def begin_transaction(self, connection):
+        connection.autocommit = False
+
+    def end_transaction(self, connection):
+        connection.autocommit = True
+
+    def prepare_bulk(self, cursor, columns):
+        # Envia os parâmetros em blocos em vez de uma ida ao servidor por linha;
+        # com os tipos declarados o driver não tem de os adivinhar linha a linha
+        cursor.fast_executemany = True
+        cursor.setinputsizes([_input_size(col['type']) for col in columns])
+
+    stage_table = "#upsert_stage"
+
+    def create_stage_sql(self, table_name, columns):
+        # SELECT INTO copia os tipos exatos (incluindo precisão e tamanho)
+        return f"SELECT TOP 0 {', '.join(columns)} INTO {self.stage_table} FROM {table_name}"
+
+    def merge_from_stage(self, cursor, table_name, key_column, columns):
+        others = [column for column in columns if column != key_column]
+        matched = ""
+        if others:
+            # EXCEPT compara NULL com NULL como iguais, ao contrário de <>
+            matched = f"""
+                WHEN MATCHED AND EXISTS (
+                    SELECT {', '.join(f's.{column}' for column in others)}
+                    EXCEPT
+                    SELECT {', '.join(f't.{column}' for column in others)}
+                ) THEN
+                    UPDATE SET {', '.join(f't.{column} = s.{column}' for column in others)}"""
+
+        cursor.execute(f"""
+            SET NOCOUNT ON;
+            DECLARE @acoes TABLE (acao NVARCHAR(10));
+
+            MERGE {table_name} AS t
+            USING {self.stage_table} AS s
+                ON t.{key_column} = s.{key_column}
+            {matched}
+            WHEN NOT MATCHED BY TARGET THEN
+                INSERT ({', '.join(columns)})
+                VALUES ({', '.join(f's.{column}' for column in columns)})
+            OUTPUT $action INTO @acoes;
+
+            SELECT
+                COALESCE(SUM(CASE WHEN acao = 'INSERT' THEN 1 ELSE 0 END), 0),
+                COALESCE(SUM(CASE WHEN acao = 'UPDATE' THEN 1 ELSE 0 END), 0)
+            FROM @acoes;
+        """)
+        inserted, updated = cursor.fetchone()
+        return inserted, updated
+
+    def trigger_toggle_sql(self, trigger_name, enable, table_name=None):
+        return f"{'ENABLE' if enable else 'DISABLE'} TRIGGER {trigger_name} ON {table_name or 'DATABASE'}"
+
+    def notification_table_sql(self):
+        return """
+            IF NOT EXISTS (SELECT * FROM sys.tables WHERE name = 'NotificationSettings')
+            BEGIN
+                CREATE TABLE NotificationSettings (
+                    setting_id INT PRIMARY KEY IDENTITY(1,1),
+                    user_email VARCHAR(255) UNIQUE NOT NULL,
+                    high_priority_alerts BIT DEFAULT 1,
+                    medium_priority_alerts BIT DEFAULT 0,
+                    low_priority_alerts BIT DEFAULT 0,
+                    created_date DATETIME DEFAULT GETDATE(),
+                    updated_date DATETIME DEFAULT GETDATE()
+                );
+
+                INSERT INTO NotificationSettings (user_email, high_priority_alerts)
+                VALUES ('admin@observatorio.pt', 1);
+
+                PRINT 'Tabela NotificationSettings criada com sucesso.';
+            END
+            ELSE
+                PRINT 'A tabela NotificationSettings já existe.';
+            """
+
+    def close_approach_table_sql(self):
+        return """
+            IF NOT EXISTS (SELECT * FROM sys.tables WHERE name = 'Close_Approach')
+            BEGIN
+                CREATE TABLE Close_Approach (
+                    approach_id INT PRIMARY KEY IDENTITY(1,1),
+                    asteroid_id INT NOT NULL REFERENCES Asteroid(asteroid_id),
+                    orbit_param_id INT REFERENCES Orbital_Parameters(orbit_param_id),
+                    approach_date DATETIME NOT NULL,
+                    distance_au FLOAT,
+                    distance_ld FLOAT,
+                    computed_date DATETIME DEFAULT GETDATE()
+                );
+
+                CREATE INDEX ix_Close_Approach_date ON Close_Approach (approach_date, distance_ld);
+                CREATE INDEX ix_Close_Approach_asteroid ON Close_Approach (asteroid_id);
+            END
+            """
+
+
+class SqliteBackend(Backend):
+    """
+    Base de dados SQLite num ficheiro local, com o mesmo esquema, views e
+    triggers do SQL Server (sqlite_schema.txt, sqlite_queries.txt e
+    sqlite_triggers.txt). Um ficheiro novo é criado e preparado ao conectar.
+    """
+
+    name = "SQLite"
+    views_file = 'sqlite_queries.txt'
+    triggers_file = 'sqlite_triggers.txt'
+    schema_file = 'sqlite_schema.txt'
+
+    now = "datetime('now', 'localtime')"
+    today = "date('now', 'localtime')"
+    current_year = "CAST(strftime('%Y', 'now') AS INTEGER)"
+
+    def __init__(self, path):
+        self.path = path
+
+    def connect(self):
+        # As conexões circulam entre as threads de fundo através do pool
+        conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False,
+                               isolation_level=None)
+        conn.execute("PRAGMA foreign_keys = ON")
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute("PRAGMA synchronous = NORMAL")
+        return conn
+
+    def describe(self, connection):
+        version = connection.execute("SELECT sqlite_version()").fetchone()[0]
+        return f"SQLite {version}", os.path.basename(self.path)
+
+    def load_catalog(self, connection):
+        cursor = connection.cursor()
+        cursor.execute("""
+            SELECT type, name, tbl_name
+            FROM sqlite_master
+            WHERE name NOT LIKE 'sqlite_%'
+            ORDER BY name
+        """)
+        objects = cursor.fetchall()
+
+        tables = [name for kind, name, _ in objects if kind == 'table']
+        views = [name for kind, name, _ in objects if kind == 'view']
+        triggers = [{
+            'name': name,
+            'table': table_name,
+            'disabled': False,
+            'created': None
+        } for kind, name, table_name in objects if kind == 'trigger']
+
+        columns = {}
+        primary_keys = {}
+        foreign_keys = {}
+        for table_name in tables:
+            cursor.execute(f"PRAGMA table_info('{table_name}')")
+            table_columns = cursor.fetchall()
+            pk_columns = sorted((col[5], col[1]) for col in table_columns if col[5])
+
+            for cid, col_name, data_type, notnull, default, pk in table_columns:
+                columns.setdefault(table_name, []).append({
+                    'name': col_name,
+                    'type': data_type.lower(),
+                    'nullable': not notnull and not pk,
+                    # INTEGER PRIMARY KEY é o rowid: valor gerado automaticamente
+                    'identity': bool(pk) and len(pk_columns) == 1 and data_type.upper() == 'INTEGER'
+                })
+
+            if pk_columns:
+                primary_keys[table_name] = pk_columns[0][1]
+
+            cursor.execute(f"PRAGMA foreign_key_list('{table_name}')")
+            for row in cursor.fetchall():
+                foreign_keys.setdefault(table_name, []).append({
+                    'name': f"fk_{table_name}_{row[0]}",
+                    'column': row[3],
+                    'referenced_table': row[2],
+                    'referenced_column': row[4]
+                })
+
+        cursor.close()
+
+        return {
+            'tables': tables,
+            'columns': columns,
+            'primary_keys': primary_keys,
+            'foreign_keys': foreign_keys,
+            'triggers': triggers,
+            'views': views
+        }
+
+    def initialize(self, connection):
+        cursor = connection.cursor()
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'Asteroid'")
+        new_database = cursor.fetchone() is None
+
+        # O esquema é idempotente; views e triggers só num ficheiro novo, para
+        # não repor triggers eliminados pelo utilizador
+        scripts = [self.schema_file]
+        if new_database:
+            scripts += [self.views_file, self.triggers_file]
+
+        for file_name in scripts:
+            with open(_script_path(file_name), 'r', encoding='utf-8') as f:
+                cursor.executescript(f.read())
+        cursor.close()
+
+    def try_date(self, expression):
+        return f"date({expression})"
+
+    def limit(self, sql, count):
+        return f"{sql} LIMIT {int(count)}"
+
+    def paginate(self, sql, params, offset, count):
+        return sql + " LIMIT ? OFFSET ?", list(params) + [count, offset]
+
+    def execute_script(self, cursor, sql):
+        cursor.executescript(sql)
+
+    def begin_transaction(self, connection):
+        # Sem isolation_level, cada commit volta ao autocommit
+        # IMMEDIATE: com vários escritores (importação paralela) a espera pelo
+        # lock de escrita acontece aqui, sujeita ao timeout da conexão
+        if not connection.in_transaction:
+            connection.execute("BEGIN IMMEDIATE")
+
+    stage_table = "upsert_stage"
+
+    def create_stage_sql(self, table_name, columns):
+        return f"CREATE TEMP TABLE {self.stage_table} AS SELECT {', '.join(columns)} FROM {table_name} WHERE 0"
+
+    def drop_stage_sql(self):
+        return f"DROP TABLE IF EXISTS temp.{self.stage_table}"
+
+    def merge_from_stage(self, cursor, table_name, key_column, columns):
+        # Sem MERGE: UPDATE dos que mudaram e INSERT dos novos, na mesma transação
+        others = [column for column in columns if column != key_column]
+        stage = self.stage_table
+        connection = cursor.connection
+
+        cursor.execute(f"CREATE INDEX temp.ix_{stage} ON {stage} ({key_column})")
+        self.begin_transaction(connection)
+        try:
+            updated = 0
+            if others:
+                changed = " OR ".join(f"s.{column} IS NOT {table_name}.{column}" for column in others)
+                cursor.execute(f"""
+                    UPDATE {table_name}
+                    SET ({', '.join(others)}) = (
+                        SELECT {', '.join(f's.{column}' for column in others)}
+                        FROM {stage} s
+                        WHERE s.{key_column} = {table_name}.{key_column}
+                    )
+                    WHERE EXISTS (
+                        SELECT 1 FROM {stage} s
+                        WHERE s.{key_column} = {table_name}.{key_column} AND ({changed})
+                    )
+                """)
+                updated = cursor.rowcount
+
+            cursor.execute(f"""
+                INSERT INTO {table_name} ({', '.join(columns)})
+                SELECT {', '.join(f's.{column}' for column in columns)}
+                FROM {stage} s
+                WHERE NOT EXISTS (
+                    SELECT 1 FROM {table_name} t WHERE t.{key_column} = s.{key_column}
+                )
+            """)
+            inserted = cursor.rowcount
+
+            connection.commit()
+            return inserted, updated
+
+        except Exception:
+            connection.rollback()
+            raise
+
+    def notification_table_sql(self):
+        return """
+            CREATE TABLE IF NOT EXISTS NotificationSettings (
+                setting_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_email VARCHAR(255) UNIQUE NOT NULL,
+                high_priority_alerts BIT DEFAULT 1,
+                medium_priority_alerts BIT DEFAULT 0,
+                low_priority_alerts BIT DEFAULT 0,
+                created_date DATETIME DEFAULT (datetime('now', 'localtime')),
+                updated_date DATETIME DEFAULT (datetime('now', 'localtime'))
+            );
+
+            INSERT OR IGNORE INTO NotificationSettings (user_email, high_priority_alerts)
+            SELECT 'admin@observatorio.pt', 1
+            WHERE NOT EXISTS (SELECT 1 FROM NotificationSettings);
+            """
+
+    def close_approach_table_sql(self):
+        return """
+            CREATE TABLE IF NOT EXISTS Close_Approach (
+                approach_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                asteroid_id INT NOT NULL REFERENCES Asteroid(asteroid_id),
+                orbit_param_id INT REFERENCES Orbital_Parameters(orbit_param_id),
+                approach_date DATETIME NOT NULL,
+                distance_au FLOAT,
+                distance_ld FLOAT,
+                computed_date DATETIME DEFAULT (datetime('now', 'localtime'))
+            );
+
+            CREATE INDEX IF NOT EXISTS ix_Close_Approach_date
+                ON Close_Approach (approach_date, distance_ld);
+            CREATE INDEX IF NOT EXISTS ix_Close_Approach_asteroid
+                ON Close_Approach (asteroid_id);
+            """
+
+
+def _input_size(data_type):
+    """
+    Tipo ODBC para setinputsizes a partir do tipo de get_table_structure
+    (ex: "varchar(50)", "int", "decimal(10,2)"). None deixa o driver decidir.
+    """
+    name, _, size = data_type.partition('(')
+    size = size.rstrip(')')
+
+    if name in ('varchar', 'char', 'nvarchar', 'nchar'):
+        if not size.isdigit():
+            # varchar(max) e afins
+            return None
+        sql_type = pyodbc.SQL_WVARCHAR if name.startswith('n') else pyodbc.SQL_VARCHAR
+        return (sql_type, int(size), 0)
+
+    if name in ('decimal', 'numeric'):
+        # Sem precisão indicada, a do SQL Server por omissão: (18, 0)
+        precision, _, scale = size.partition(',')
+        sql_type = pyodbc.SQL_DECIMAL if name == 'decimal' else pyodbc.SQL_NUMERIC
+        return (sql_type, int(precision or 18), int(scale or 0))
+
+    return {
+        'int': (pyodbc.SQL_INTEGER, 0, 0),
+        'bigint': (pyodbc.SQL_BIGINT, 0, 0),
+        'smallint': (pyodbc.SQL_SMALLINT, 0, 0),
+        'tinyint': (pyodbc.SQL_TINYINT, 0, 0),
+        'bit': (pyodbc.SQL_BIT, 0, 0),
+        'float': (pyodbc.SQL_DOUBLE, 0, 0),
+        'real': (pyodbc.SQL_REAL, 0, 0),
+        'date': (pyodbc.SQL_TYPE_DATE, 0, 0),
+        'datetime': (pyodbc.SQL_TYPE_TIMESTAMP, 23, 3),
+        'datetime2': (pyodbc.SQL_TYPE_TIMESTAMP, 27, 7),
+    }.get(name)
+
+
+def _script_path(file_name):
+    """Os scripts SQL ficam junto ao código"""
+    return os.path.join(os.path.dirname(os.path.abspath(__file__)), file_name)
@@ -0,0 +1,141 @@
+import argparse
+import time
+
+import numpy as np
+
+
+def random_orbits(count, seed=0):
+    """Arrays aleatórios com as colunas usadas pelas regras de alerta (~5% NULL)."""
+    rng = np.random.default_rng(seed)
+
+    def with_nulls(values):
+        values[rng.random(count) < 0.05] = np.nan
+        return values
+
+    return {
+        'asteroid_id': np.arange(1, count + 1, dtype=np.int64),
+        'diameter': with_nulls(rng.lognormal(-1.5, 1.2, count)),
+        'pha': rng.random(count) < 0.1,
+        'albedo': with_nulls(rng.random(count) * 0.6),
+        'moid': with_nulls(rng.random(count) * 0.2),
+        'moid_ld': with_nulls(rng.random(count) * 80),
+        'rms': with_nulls(rng.random(count) * 1.2),
+        'e': with_nulls(rng.random(count)),
+        'i': with_nulls(rng.random(count) * 180),
+    }
+
+
+def _timed(function, *args):
+    start = time.perf_counter()
+    function(*args)
+    return time.perf_counter() - start
+
+
+def _report(name, count, elapsed):
+    print(f"{name}: {count:,} linhas em {elapsed:.3f} s ({count / elapsed:,.0f} linhas/s)")
+
+
+def random_elements(count, seed=0):
+    """Elementos orbitais aleatórios (a em UA, ângulos em graus), ~1% NULL."""
+    rng = np.random.default_rng(seed)
+    elements = {
+        'a': rng.uniform(0.6, 4.0, count),
+        'e': rng.uniform(0.0, 0.95, count),
+        'i': rng.uniform(0.0, 60.0, count),
+        'om': rng.uniform(0.0, 360.0, count),
+        'w': rng.uniform(0.0, 360.0, count),
+    }
+    elements['a'][rng.random(count) < 0.01] = np.nan
+    return elements
+
+
+def bench_alert_rules(count, repeat):
+    from alert_rules import evaluate
+
+    arrays = random_orbits(count)
+    evaluate(arrays)  # aquecimento
+    best = min(_timed(evaluate, arrays) for _ in range(repeat))
+    _report("Regras de alerta (evaluate)", count, best)
+
+
+def bench_moid(count, repeat):
+    from moid import earth_moid
+
+    elements = random_elements(count)
+    earth_moid(**random_elements(1000, seed=1))  # aquecimento
+    best = min(_timed(lambda: earth_moid(**elements)) for _ in range(repeat))
+    print(f"MOID com a Terra (earth_moid): {count:,} órbitas em {best:.3f} s "
+          f"({count / best:,.0f} órbitas/s)")
+
+
+def bench_propagation(count, repeat):
+    import os
+    from close_approach import (J2000_JD, find_close_approaches_parallel, prepare_elements,
+                                propagation_pool)
+
+    rng = np.random.default_rng(0)
+    elements = random_elements(count)
+    elements, valid = prepare_elements(elements['a'], elements['e'], elements['i'], elements['om'],
+                                       elements['w'], rng.uniform(0, 360, count),
+                                       np.full(count, J2000_JD))
+    start_jd, end_jd = J2000_JD + 9000, J2000_JD + 9000 + 365
+
+    cores = os.cpu_count() or 1
+    counts = sorted({1, cores} | {2 ** k for k in range(1, cores.bit_length()) if 2 ** k <= cores})
+    baseline = None
+    for workers in counts:
+        with propagation_pool(workers) as executor:
+            def run():
+                find_close_approaches_parallel(elements, start_jd, end_jd, workers=workers,
+                                               executor=executor)
+            run()  # aquecimento (arranque dos processos)
+            best = min(_timed(run) for _ in range(repeat))
+        baseline = baseline or best
+        print(f"Propagação (1 ano, {workers} processos): {count:,} órbitas em {best:.3f} s "
+              f"({count / best:,.0f} órbitas/s, {baseline / best:.2f}x)")
+
+
+def bench_similarity(count, repeat):
+    from orbit_index import KDTree, orbit_vectors
+
+    elements = random_elements(count)
+    vectors, complete = orbit_vectors(elements['a'], elements['e'], np.full(count, np.nan),
+                                      elements['i'], elements['om'], elements['w'])
+    vectors = vectors[complete]
+
+    start = time.perf_counter()
+    tree = KDTree(vectors)
+    print(f"Índice de semelhança: {len(vectors):,} órbitas indexadas em {time.perf_counter() - start:.2f} s")
+
+    queries = vectors[np.random.default_rng(1).integers(0, len(vectors), 200)]
+    for name, search in (("k=10", lambda point: tree.query(point, 10)),
+                         ("raio D<0.05", lambda point: tree.query_radius(point, 0.05))):
+        best = min(_timed(lambda: [search(point) for point in queries]) for _ in range(repeat))
+        print(f"  consulta {name}: {1000 * best / len(queries):.2f} ms por consulta")
+
+
+# nome -> (função, número de linhas por omissão)
+BENCHMARKS = {
+    'alertas': (bench_alert_rules, 1_000_000),
+    'moid': (bench_moid, 20_000),
+    'propagacao': (bench_propagation, 20_000),
+    'semelhanca': (bench_similarity, 1_000_000),
+}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Medições de desempenho dos motores vetorizados")
+    parser.add_argument('nome', nargs='*',
+                        help="Medições a executar: " + ", ".join(BENCHMARKS) + " (por omissão, todas)")
+    parser.add_argument('--linhas', type=int,
+                        help="Número de linhas (por omissão, o de cada medição)")
+    parser.add_argument('--repeticoes', type=int, default=5, help="Repetições (conta a melhor)")
+    args = parser.parse_args()
+
+    for name in args.nome:
+        if name not in BENCHMARKS:
+            parser.error(f"Medição desconhecida: {name}")
+
+    for name in args.nome or list(BENCHMARKS):
+        function, default_count = BENCHMARKS[name]
+        function(args.linhas or default_count, args.repeticoes)
@@ -0,0 +1,498 @@
+import argparse
+import math
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from database import (
+    bulk_insert, create_close_approach_table, get_backend, get_pool, get_table_structure
+)
+from moid import EARTH_ELEMENTS, LD_PER_AU, orbit_frame
+
+# Constante gravitacional de Gauss (rad/dia) e datas julianas de referência
+GAUSS_K = 0.01720209895
+J2000_JD = 2451545.0
+MJD_OFFSET = 2400000.5
+
+# Anomalia média da Terra em J2000 (graus) e movimento médio (graus/dia);
+# os restantes elementos estão em moid.EARTH_ELEMENTS
+EARTH_MEAN_ANOMALY = 357.51716
+EARTH_MEAN_MOTION = 0.98560028
+
+# Janela (dias a partir de hoje), passo da pesquisa inicial (dias) e distância
+# máxima (UA, ~19.5 LD) das aproximações guardadas
+APPROACH_WINDOW_DAYS = 3650
+APPROACH_STEP_DAYS = 1.0
+APPROACH_MAX_DISTANCE = 0.05
+
+# Velocidade relativa máxima (UA/dia, ~70 km/s): entre duas amostras, a
+# distância mínima pode estar até meio passo disto abaixo da amostrada
+APPROACH_MAX_SPEED = 0.04
+
+# Posições calculadas de cada vez (órbitas x instantes)
+APPROACH_POINTS = 2_000_000
+
+# Processos na propagação em paralelo e órbitas por tarefa (no máximo; com
+# poucas órbitas as tarefas encolhem para haver pelo menos 4 por processo)
+APPROACH_WORKERS = os.cpu_count() or 1
+APPROACH_BATCH = 2000
+
+# Iterações da secção de ouro em volta de cada mínimo (40: ~1e-8 dias)
+REFINE_ITERATIONS = 40
+
+_GOLDEN = (math.sqrt(5) - 1) / 2
+
+APPROACH_COLUMNS = ['asteroid_id', 'orbit_param_id', 'approach_date', 'distance_au', 'distance_ld']
+
+# Colunas de Orbital_Parameters usadas; as opcionais podem não existir
+REQUIRED_COLUMNS = ['a', 'e', 'i', 'om', 'w']
+OPTIONAL_COLUMNS = ['epoch', 'epoch_mjd', 'epoch_cal', 'ma', 'tp', 'n']
+
+
+def julian_date(moment):
+    """Data juliana de um datetime (sem distinguir UTC de TDB)"""
+    return J2000_JD + (moment - datetime(2000, 1, 1, 12)).total_seconds() / 86400
+
+
+def from_julian_date(jd):
+    """datetime (arredondado ao minuto) de uma data juliana"""
+    moment = datetime(2000, 1, 1, 12) + timedelta(days=float(jd) - J2000_JD)
+    return (moment + timedelta(seconds=30)).replace(second=0, microsecond=0)
+
+
+def calendar_epoch(text):
+    """Data juliana de um epoch_cal ("2025-01-01", "20250101.5"), ou NaN"""
+    if not text:
+        return np.nan
+    text = str(text).strip()
+    try:
+        if text[:8].isdigit():
+            day = datetime.strptime(text[:8], '%Y%m%d')
+            fraction = float(text[8:]) if text[8:].startswith('.') else 0.0
+        else:
+            day = datetime.strptime(text[:10], '%Y-%m-%d')
+            fraction = 0.0
+        return julian_date(day) + fraction
+    except ValueError:
+        return np.nan
+
+
+def solve_kepler(M, e, tolerance=1e-12, iterations=50):
+    """Anomalia excêntrica para arrays de anomalias médias (rad) e excentricidades < 1"""
+    M = np.remainder(M, 2 * np.pi)
+    E = np.where(e < 0.8, M, np.pi)
+    for _ in range(iterations):
+        delta = (E - e * np.sin(E) - M) / (1 - e * np.cos(E))
+        E = E - delta
+        if np.all(np.abs(delta) < tolerance):
+            break
+    return E
+
+
+def prepare_elements(a, e, i, om, w, ma, epoch, n=None):
+    """
+    Elementos prontos a propagar (a em UA, ângulos em graus, epoch em data
+    juliana, n em graus/dia; sem n usa-se o movimento kepleriano de a).
+    Retorna um dict de arrays e a máscara das órbitas válidas (elípticas e
+    completas); as inválidas ficam com NaN e nunca dão aproximações.
+    """
+    a, e, i, om, w, ma, epoch = (np.asarray(values, dtype=np.float64)
+                                 for values in (a, e, i, om, w, ma, epoch))
+    motion = GAUSS_K / np.abs(a) ** 1.5
+    if n is not None:
+        n = np.radians(np.asarray(n, dtype=np.float64))
+        motion = np.where(np.isnan(n), motion, n)
+
+    valid = ~np.isnan(a + e + i + om + w + ma + epoch + motion) & (a > 0) & (e >= 0) & (e < 1)
+    P, Q = orbit_frame(i, om, w)
+    return {
+        'a': np.where(valid, a, np.nan),
+        'e': np.where(valid, e, 0.0),
+        'P': P,
+        'Q': Q,
+        'M0': np.radians(ma),
+        'n': motion,
+        'epoch': epoch,
+    }, valid
+
+
+def subset(elements, index):
+    """Os elementos das órbitas `index`"""
+    return {key: values[index] for key, values in elements.items()}
+
+
+def earth_elements():
+    a, e, i, om, w = EARTH_ELEMENTS
+    elements, _ = prepare_elements([a], [e], [i], [om], [w], [EARTH_MEAN_ANOMALY], [J2000_JD],
+                                   n=[EARTH_MEAN_MOTION])
+    return elements
+
+
+def heliocentric_positions(elements, jd):
+    """
+    Posições heliocêntricas (UA, eclíptica J2000) em `jd`: um array (T,) de
+    datas comuns a todas as órbitas, ou (órbitas, T). Retorna (órbitas, T, 3).
+    """
+    jd = np.asarray(jd, dtype=np.float64)
+    if jd.ndim == 1:
+        jd = jd[None, :]
+
+    e = elements['e'][:, None]
+    M = elements['M0'][:, None] + elements['n'][:, None] * (jd - elements['epoch'][:, None])
+    E = solve_kepler(M, np.broadcast_to(e, M.shape))
+    a = elements['a'][:, None]
+    x = a * (np.cos(E) - e)
+    y = a * np.sqrt(1 - e * e) * np.sin(E)
+    return x[..., None] * elements['P'][:, None, :] + y[..., None] * elements['Q'][:, None, :]
+
+
+def _earth_distance(elements, earth, jd):
+    """Distância à Terra (K,) de cada órbita de `elements` na sua data `jd` (K,)"""
+    delta = heliocentric_positions(elements, jd[:, None])[:, 0] - heliocentric_positions(earth, jd)[0]
+    return np.sqrt(np.einsum('kd,kd->k', delta, delta))
+
+
+def find_close_approaches(elements, start_jd, end_jd, step=APPROACH_STEP_DAYS,
+                          max_distance=APPROACH_MAX_DISTANCE, iterations=REFINE_ITERATIONS):
+    """
+    Aproximações à Terra entre `start_jd` e `end_jd` até `max_distance` UA.
+
+    As órbitas e a Terra são propagadas (dois corpos) em passos de `step` dias;
+    cada mínimo local da distância que possa ficar abaixo de `max_distance` é
+    refinado pela secção de ouro no intervalo [t - step, t + step].
+    Retorna arrays (índice da órbita, data juliana, distância em UA).
+    """
+    times = start_jd + np.arange(-1, math.ceil((end_jd - start_jd) / step) + 2) * step
+    earth = earth_elements()
+    earth_positions = heliocentric_positions(earth, times)[0]
+    threshold = max_distance + APPROACH_MAX_SPEED * step
+
+    found_index, found_jd, found_distance = [], [], []
+    count = len(elements['a'])
+    rows = max(1, APPROACH_POINTS // len(times))
+
+    for start in range(0, count, rows):
+        chunk = subset(elements, slice(start, start + rows))
+        delta = heliocentric_positions(chunk, times) - earth_positions[None]
+        distance = np.sqrt(np.einsum('btd,btd->bt', delta, delta))
+
+        middle = distance[:, 1:-1]
+        minimum = (middle <= distance[:, :-2]) & (middle < distance[:, 2:]) & (middle < threshold)
+        orbit, sample = np.nonzero(minimum)
+        if not len(orbit):
+            continue
+
+        candidates = subset(chunk, orbit)
+        jd, refined = _golden_section(candidates, earth, times[sample + 1] - step,
+                                      times[sample + 1] + step, iterations)
+        keep = (refined <= max_distance) & (jd >= start_jd) & (jd <= end_jd)
+        found_index.append(orbit[keep] + start)
+        found_jd.append(jd[keep])
+        found_distance.append(refined[keep])
+
+    if not found_index:
+        return np.array([], dtype=np.int64), np.array([]), np.array([])
+    return np.concatenate(found_index), np.concatenate(found_jd), np.concatenate(found_distance)
+
+
+def _golden_section(elements, earth, low, high, iterations):
+    """Mínimo da distância à Terra em [low, high], por candidato; retorna (jd, distância)"""
+    x1 = high - _GOLDEN * (high - low)
+    x2 = low + _GOLDEN * (high - low)
+    f1 = _earth_distance(elements, earth, x1)
+    f2 = _earth_distance(elements, earth, x2)
+
+    for _ in range(iterations):
+        left = f1 < f2
+        high = np.where(left, x2, high)
+        low = np.where(left, low, x1)
+        new = np.where(left, high - _GOLDEN * (high - low), low + _GOLDEN * (high - low))
+        f_new = _earth_distance(elements, earth, new)
+        x1, f1, x2, f2 = (np.where(left, new, x2), np.where(left, f_new, f2),
+                          np.where(left, x1, new), np.where(left, f1, f_new))
+
+    jd = (low + high) / 2
+    return jd, _earth_distance(elements, earth, jd)
+
+
+# Colunas de cada órbita na memória partilhada: (nome, largura)
+ELEMENT_LAYOUT = (('a', 1), ('e', 1), ('P', 3), ('Q', 3), ('M0', 1), ('n', 1), ('epoch', 1))
+ELEMENT_WIDTH = sum(width for _, width in ELEMENT_LAYOUT)
+
+# Memória partilhada aberta por cada processo do pool (nome -> SharedMemory)
+_attached = {}
+
+
+def pack_elements(elements, out=None):
+    """Elementos num único array (órbitas, ELEMENT_WIDTH), por ELEMENT_LAYOUT"""
+    count = len(elements['a'])
+    if out is None:
+        out = np.empty((count, ELEMENT_WIDTH))
+    column = 0
+    for key, width in ELEMENT_LAYOUT:
+        out[:, column:column + width] = elements[key].reshape(count, width)
+        column += width
+    return out
+
+
+def unpack_elements(packed):
+    """Inverso de pack_elements (vistas sobre `packed`)"""
+    elements = {}
+    column = 0
+    for key, width in ELEMENT_LAYOUT:
+        values = packed[:, column:column + width]
+        elements[key] = values[:, 0] if width == 1 else values
+        column += width
+    return elements
+
+
+def _shared_elements(name, count):
+    """Vista (órbitas, ELEMENT_WIDTH) sobre a memória partilhada `name`"""
+    memory = _attached.get(name)
+    if memory is None:
+        # Um pool pode servir várias propagações: fecha as anteriores
+        for previous in _attached.values():
+            previous.close()
+        _attached.clear()
+        memory = shared_memory.SharedMemory(name=name)
+        _attached[name] = memory
+    return np.ndarray((count, ELEMENT_WIDTH), dtype=np.float64, buffer=memory.buf)
+
+
+def _approach_batch(name, count, start, stop, start_jd, end_jd, step, max_distance):
+    """Tarefa de um processo do pool: aproximações das órbitas start..stop"""
+    packed = _shared_elements(name, count)[start:stop].copy()
+    index, jd, distance = find_close_approaches(unpack_elements(packed), start_jd, end_jd,
+                                                step, max_distance)
+    return index + start, jd, distance
+
+
+def propagation_pool(workers=None):
+    """
+    Pool de processos para find_close_approaches_parallel. Usa "spawn" em
+    todas as plataformas: a aplicação tem threads em fundo, que um fork copiaria
+    a meio de um lock.
+    """
+    return ProcessPoolExecutor(max_workers=workers or APPROACH_WORKERS,
+                               mp_context=multiprocessing.get_context('spawn'))
+
+
+def find_close_approaches_parallel(elements, start_jd, end_jd, step=APPROACH_STEP_DAYS,
+                                   max_distance=APPROACH_MAX_DISTANCE, workers=None,
+                                   batch_size=APPROACH_BATCH, executor=None):
+    """
+    Como find_close_approaches, repartindo as órbitas por lotes entre
+    `workers` processos. Os elementos vão para os processos numa única área
+    de memória partilhada (só os índices dos lotes são enviados) e cada lote
+    devolve apenas as aproximações encontradas.
+    Com `executor` (ver propagation_pool) o pool é reutilizado entre chamadas.
+    """
+    workers = workers or APPROACH_WORKERS
+    count = len(elements['a'])
+    if (workers <= 1 and executor is None) or count == 0:
+        return find_close_approaches(elements, start_jd, end_jd, step, max_distance)
+
+    batch_size = max(1, min(batch_size, math.ceil(count / (workers * 4))))
+    memory = shared_memory.SharedMemory(create=True, size=count * ELEMENT_WIDTH * 8)
+    own_executor = executor is None
+    try:
+        pack_elements(elements, np.ndarray((count, ELEMENT_WIDTH), dtype=np.float64, buffer=memory.buf))
+        if own_executor:
+            executor = propagation_pool(workers)
+
+        futures = [
+            executor.submit(_approach_batch, memory.name, count, start, min(start + batch_size, count),
+                            start_jd, end_jd, step, max_distance)
+            for start in range(0, count, batch_size)
+        ]
+        results = [future.result() for future in futures]
+
+    finally:
+        if own_executor and executor is not None:
+            executor.shutdown()
+        memory.close()
+        memory.unlink()
+
+    return tuple(np.concatenate([result[part] for result in results]) for part in range(3))
+
+
+def _orbits_sql(orbit_columns):
+    """Última órbita de cada asteroide com MOID até ao limite (ou desconhecido)"""
+    selected = [f"op.{column}" if column in orbit_columns else f"NULL AS {column}"
+                for column in REQUIRED_COLUMNS + OPTIONAL_COLUMNS]
+    moid_filter = "AND (op.moid IS NULL OR op.moid <= ?)" if 'moid' in orbit_columns else ""
+    return f"""
+        SELECT op.orbit_param_id, op.asteroid_id, {', '.join(selected)}
+        FROM Orbital_Parameters op
+        WHERE op.orbit_param_id = (
+            SELECT MAX(o2.orbit_param_id)
+            FROM Orbital_Parameters o2
+            WHERE o2.asteroid_id = op.asteroid_id
+        )
+        {moid_filter}
+    """, bool(moid_filter)
+
+
+def load_candidate_elements(max_distance=APPROACH_MAX_DISTANCE):
+    """
+    Lê a última órbita de cada asteroide que pode passar a menos de
+    `max_distance` UA (pelo MOID). O epoch vem de epoch, epoch_mjd ou
+    epoch_cal, e a anomalia média de ma ou, sem ela, de tp.
+    Retorna (True, (orbit_param_ids, asteroid_ids, elementos)) ou (False, mensagem)
+    """
+    pool = get_pool()
+    if not pool:
+        return False, "Não conectado à BD"
+
+    orbit_columns = {coluna['name'].lower() for coluna in get_table_structure('Orbital_Parameters')}
+    missing = [column for column in REQUIRED_COLUMNS if column not in orbit_columns]
+    if missing:
+        return False, f"Colunas em falta em Orbital_Parameters: {', '.join(missing)}"
+
+    sql, uses_moid = _orbits_sql(orbit_columns)
+    try:
+        with pool.connection() as connection:
+            cursor = connection.cursor()
+            cursor.execute(sql, [max_distance] if uses_moid else [])
+            records = cursor.fetchall()
+            cursor.close()
+    except Exception as e:
+        return False, f"Erro ao ler órbitas: {str(e)}"
+
+    if not records:
+        empty = np.array([], dtype=np.int64)
+        return True, (empty, empty, prepare_elements(*([[]] * 7))[0])
+
+    def column(position):
+        return np.array([np.nan if record[position] is None else record[position]
+                         for record in records], dtype=np.float64)
+
+    orbit_ids = np.array([record[0] for record in records], dtype=np.int64)
+    asteroid_ids = np.array([record[1] for record in records], dtype=np.int64)
+    a, e, i, om, w, epoch, epoch_mjd = (column(position) for position in range(2, 9))
+    ma, tp, n = column(10), column(11), column(12)
+
+    epoch = np.where(np.isnan(epoch), epoch_mjd + MJD_OFFSET, epoch)
+    calendar = np.array([calendar_epoch(record[9]) for record in records])
+    epoch = np.where(np.isnan(epoch), calendar, epoch)
+
+    motion = np.where(np.isnan(n), np.degrees(GAUSS_K / np.abs(a) ** 1.5), n)
+    ma = np.where(np.isnan(ma), motion * (epoch - tp), ma)
+
+    elements, valid = prepare_elements(a, e, i, om, w, ma, epoch, n)
+    return True, (orbit_ids[valid], asteroid_ids[valid], subset(elements, valid))
+
+
+def update_close_approaches(start=None, days=APPROACH_WINDOW_DAYS, step=APPROACH_STEP_DAYS,
+                            max_distance=APPROACH_MAX_DISTANCE, workers=None):
+    """
+    Calcula as aproximações à Terra dos próximos `days` dias e substitui as
+    dessa janela em Close_Approach (criada se não existir). O painel usa esta
+    tabela para o próximo evento crítico.
+
+    As aproximações são de dois corpos (sem perturbações dos planetas nem a
+    atração da própria Terra): servem de previsão, não de efeméride. A
+    propagação usa `workers` processos (APPROACH_WORKERS por omissão).
+    Retorna (True, resumo) ou (False, mensagem).
+    """
+    success, message = create_close_approach_table()
+    if not success:
+        return False, message
+
+    started = time.perf_counter()
+    success, result = load_candidate_elements(max_distance)
+    if not success:
+        return False, result
+    orbit_ids, asteroid_ids, elements = result
+
+    start = start or datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    end = start + timedelta(days=days)
+    index, jd, distance = find_close_approaches_parallel(elements, julian_date(start),
+                                                         julian_date(end), step, max_distance,
+                                                         workers)
+    propagation = time.perf_counter() - started
+
+    rows = [
+        (int(asteroid_ids[k]), int(orbit_ids[k]), from_julian_date(date),
+         float(au), float(au * LD_PER_AU))
+        for k, date, au in zip(index, jd, distance)
+    ]
+
+    # A remoção da janela e as aproximações novas numa só transação: se a
+    # inserção falhar, ficam as previsões anteriores
+    backend = get_backend()
+    try:
+        with get_pool().connection() as connection:
+            backend.begin_transaction(connection)
+            try:
+                cursor = connection.cursor()
+                try:
+                    cursor.execute("DELETE FROM Close_Approach "
+                                   "WHERE approach_date >= ? AND approach_date <= ?", [start, end])
+                finally:
+                    cursor.close()
+
+                success, inserted = bulk_insert('Close_Approach', APPROACH_COLUMNS, rows,
+                                                connection=connection, commit=False)
+                if not success:
+                    connection.rollback()
+                    return False, inserted
+                connection.commit()
+
+            except Exception:
+                connection.rollback()
+                raise
+            finally:
+                backend.end_transaction(connection)
+
+    except Exception as e:
+        return False, f"Erro ao gravar aproximações: {str(e)}"
+
+    return True, {
+        'orbitas': len(orbit_ids),
+        'aproximacoes': inserted,
+        'inicio': start,
+        'fim': end,
+        'segundos': time.perf_counter() - started,
+        'orbitas_por_segundo': len(orbit_ids) / propagation if propagation else 0,
+    }
+
+
+if __name__ == '__main__':
+    from database import connect_to_db, connect_to_sqlite
+
+    parser = argparse.ArgumentParser(description="Calcula as aproximações à Terra por propagação")
+    parser.add_argument('--sqlite', help="Base de dados SQLite local")
+    parser.add_argument('--servidor', help="Servidor SQL Server")
+    parser.add_argument('--database', help="Base de dados SQL Server")
+    parser.add_argument('--utilizador')
+    parser.add_argument('--password')
+    parser.add_argument('--dias', type=int, default=APPROACH_WINDOW_DAYS, help="Janela a partir de hoje")
+    parser.add_argument('--passo', type=float, default=APPROACH_STEP_DAYS, help="Passo (dias)")
+    parser.add_argument('--distancia', type=float, default=APPROACH_MAX_DISTANCE,
+                        help="Distância máxima (UA)")
+    parser.add_argument('--workers', type=int, default=APPROACH_WORKERS,
+                        help="Processos em paralelo na propagação")
+    args = parser.parse_args()
+
+    if args.sqlite:
+        success, message, info = connect_to_sqlite(args.sqlite)
+    else:
+        success, message, info = connect_to_db(args.servidor, args.database,
+                                               args.utilizador, args.password)
+    if not success:
+        raise SystemExit(message)
+
+    success, result = update_close_approaches(days=args.dias, step=args.passo,
+                                              max_distance=args.distancia, workers=args.workers)
+    if not success:
+        raise SystemExit(result)
+
+    print(f"{result['aproximacoes']} aproximações de {result['orbitas']} órbitas entre "
+          f"{result['inicio']:%Y-%m-%d} e {result['fim']:%Y-%m-%d} em {result['segundos']:.1f}s "
+          f"({result['orbitas_por_segundo']:.0f} órbitas/s)")
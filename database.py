@@ -1,88 +1,148 @@
-import pyodbc
 import os
+from itertools import islice
 
-# Variável global para armazenar a conexão
-connection = None
+from backends import LOOKUP_CHUNK, SqlServerBackend, SqliteBackend
+from pool import ConnectionPool
+from schema_cache import SchemaCache
+from stats_cache import StatisticsCache
+from incremental_stats import IncrementalStatistics
+from alert_list import ActiveAlerts
+from subscriber_index import SubscriberIndex
+from orbit_index import OrbitIndex
+from orbit_changes import CHANGE_TRIGGER, OrbitChangeDetector
+
+# Pool de conexões partilhado por todas as funções deste módulo
+pool = None
+# Motor da base de dados atual (SqlServerBackend ou SqliteBackend)
+backend = None
+
+# Configuração do pool (ver ConnectionPool)
+POOL_MAX_SIZE = 5
+POOL_MAX_IDLE = 300
+POOL_MAX_LIFETIME = 1800
+
+# Registos por lote (e por commit) em bulk_insert
+BULK_BATCH_SIZE = 5000
+
+# Validade (segundos) da cache de metadados; None = até ser invalidada
+SCHEMA_CACHE_TTL = None
+schema_cache = SchemaCache(ttl=SCHEMA_CACHE_TTL)
+
+# Alertas ativos mantidos em memória para a aba de alertas (ver refresh_active_alerts)
+active_alerts = ActiveAlerts()
+
+# NotificationSettings em memória, por email e por prioridade
+subscriber_index = SubscriberIndex()
+
+# Órbitas atuais num índice de semelhança (ver find_similar_orbits)
+orbit_index = OrbitIndex()
+
+# Última e/i de cada asteroide, para os alertas de mudança orbital em lote (ver ingest.py)
+orbit_changes = OrbitChangeDetector()
 
 def connect_to_db(server, database, username=None, password=None, port=None):
     """
     Estabelece conexão com SQL Server.
     Retorna (success, message, connection_info)
     """
-    global connection
+    return _open_backend(SqlServerBackend(server, database, username, password, port))
+
+
+def connect_to_sqlite(path):
+    """
+    Abre (ou cria) uma base de dados SQLite local com o esquema do sistema.
+    Retorna (success, message, connection_info)
+    """
+    return _open_backend(SqliteBackend(path))
 
-    try:
-        if port:
-            server_completo = f"{server},{port}"
-        else:
-            server_completo = server
-
-        if username and password:
-            # Autenticação SQL Server
-            conn_str = (
-                f'DRIVER={{ODBC Driver 17 for SQL Server}};'
-                f'SERVER={server_completo};'
-                f'DATABASE={database};'
-                f'UID={username};'
-                f'PWD={password};'
-            )
-        else:
-            # Autenticação Windows
-            conn_str = (
-                f'DRIVER={{ODBC Driver 17 for SQL Server}};'
-                f'SERVER={server_completo};'
-                f'DATABASE={database};'
-                f'Trusted_Connection=yes;'
-            )
 
+def _open_backend(new_backend):
+    """Conecta com `new_backend` e substitui o pool e o motor atuais"""
+    global pool, backend
+
+    try:
         # Tentar conexão
-        connection = pyodbc.connect(conn_str, timeout=10)
-        connection.autocommit = True
+        connection = new_backend.connect()
 
         # Obter informações
-        cursor = connection.cursor()
-        cursor.execute("SELECT @@VERSION, DB_NAME()")
-        resultado = cursor.fetchone()
-        cursor.close()
-
-        versao_sql = resultado[0].split('\n')[0]
-        nome_bd = resultado[1]
+        versao_sql, nome_bd = new_backend.describe(connection)
+        new_backend.initialize(connection)
+
+        # Substituir o pool anterior (se existir) por um novo, já com esta conexão
+        if pool:
+            pool.close()
+        backend = new_backend
+        # Como as definições do pool, SCHEMA_CACHE_TTL é lido a cada conexão
+        schema_cache.ttl = SCHEMA_CACHE_TTL
+        schema_cache.loader = backend.load_catalog
+        schema_cache.invalidate()
+        statistics_cache.invalidate()
+        statistics_tracker.reset()
+        active_alerts.reset()
+        subscriber_index.invalidate()
+        orbit_index.reset()
+        orbit_changes.reset()
+        pool = ConnectionPool(
+            backend.connect,
+            max_size=POOL_MAX_SIZE,
+            max_idle=POOL_MAX_IDLE,
+            max_lifetime=POOL_MAX_LIFETIME
+        )
+        pool.add(connection)
+
+        avisos = _trigger_warnings()
+        for aviso in avisos:
+            print(aviso)
 
         return True, "Conexão estabelecida com sucesso!", {
             'database_name': nome_bd,
             'sql_version': versao_sql,
-            'connection': connection
+            'backend': backend.name,
+            'pool': pool,
+            'avisos': avisos
         }
 
-    except pyodbc.Error as e:
-        error_msg = str(e)
-        if "Login failed" in error_msg:
-            return False, "Falha no login. Verifique utilizador e password.", None
-        elif "Cannot open database" in error_msg:
-            return False, f"A base de dados '{database}' não existe.", None
-        else:
-            return False, f"Não foi possível conectar: {error_msg}", None
+    except Exception as e:
+        return False, new_backend.connection_error(e), None
+
+
+def _trigger_warnings():
+    """
+    Avisos sobre triggers de alertas desativados: a importação de catálogos
+    desativa trg_VerificarMudancaOrbital e, se for interrompida à força, não
+    chega a reativá-lo
+    """
+    return [
+        f"O trigger {trigger['name']} está desativado: as órbitas inseridas não geram "
+        f"alertas de mudança orbital. Se não foi intencional (ex: importação "
+        f"interrompida), reative-o na aba de triggers."
+        for trigger in get_all_triggers()
+        if trigger['name'] == CHANGE_TRIGGER and trigger['disabled']
+    ]
+
+
+def get_schema_catalog():
+    """
+    Retorna os metadados em cache (tabelas, colunas, chaves, triggers, views).
+    Ver SchemaCache.
+    """
+    if not pool:
+        return None
+    return schema_cache.get(pool)
+
+
+def invalidate_schema_cache():
+    """Força a releitura dos metadados na próxima consulta"""
+    schema_cache.invalidate()
 
 
 def get_all_tables():
     """Retorna lista de todas as tabelas da base de dados"""
-    global connection
-
-    if not connection:
+    if not pool:
         return []
 
     try:
-        cursor = connection.cursor()
-        cursor.execute("""
-            SELECT TABLE_NAME 
-            FROM INFORMATION_SCHEMA.TABLES 
-            WHERE TABLE_TYPE = 'BASE TABLE'
-            ORDER BY TABLE_NAME
-        """)
-
-        tabelas = [row[0] for row in cursor.fetchall()]
-        cursor.close()
-        return tabelas
+        return list(schema_cache.get(pool)['tables'])
 
     except Exception as e:
         print(f"Erro ao obter tabelas: {e}")
@@ -91,46 +151,12 @@ def get_all_tables():
 
 def get_table_structure(table_name):
     """Obtém a estrutura de uma tabela"""
-    global connection
-
-    if not connection:
+    if not pool:
         return []
 
     try:
-        cursor = connection.cursor()
-        cursor.execute(f"""
-            SELECT 
-                COLUMN_NAME,
-                DATA_TYPE,
-                CHARACTER_MAXIMUM_LENGTH,
-                IS_NULLABLE,
-                COLUMNPROPERTY(object_id(TABLE_SCHEMA + '.' + TABLE_NAME), COLUMN_NAME, 'IsIdentity') as IS_IDENTITY
-            FROM INFORMATION_SCHEMA.COLUMNS
-            WHERE TABLE_NAME = '{table_name}'
-            ORDER BY ORDINAL_POSITION
-        """)
-
-        colunas = []
-        for row in cursor.fetchall():
-            col_name = row[0]
-            data_type = row[1]
-            max_length = row[2]
-            is_nullable = row[3] == 'YES'
-            is_identity = row[4] == 1
-
-            # Formatar tipo de dados
-            if max_length and data_type in ['varchar', 'char', 'nvarchar', 'nchar']:
-                data_type = f"{data_type}({max_length})"
-
-            colunas.append({
-                'name': col_name,
-                'type': data_type,
-                'nullable': is_nullable,
-                'identity': is_identity
-            })
-
-        cursor.close()
-        return colunas
+        colunas = schema_cache.get(pool)['columns'].get(table_name, [])
+        return [dict(coluna) for coluna in colunas]
 
     except Exception as e:
         print(f"Erro ao obter estrutura da tabela: {e}")
@@ -139,23 +165,11 @@ def get_table_structure(table_name):
 
 def get_primary_key(table_name):
     """Obtém a chave primária de uma tabela"""
-    global connection
-
-    if not connection:
+    if not pool:
         return None
 
     try:
-        cursor = connection.cursor()
-        cursor.execute(f"""
-            SELECT COLUMN_NAME
-            FROM INFORMATION_SCHEMA.KEY_COLUMN_USAGE
-            WHERE TABLE_NAME = '{table_name}' 
-            AND CONSTRAINT_NAME LIKE 'PK%'
-        """)
-
-        result = cursor.fetchone()
-        cursor.close()
-        return result[0] if result else None
+        return schema_cache.get(pool)['primary_keys'].get(table_name)
 
     except Exception as e:
         print(f"Erro ao obter chave primária: {e}")
@@ -164,24 +178,25 @@ def get_primary_key(table_name):
 
 def create_table_in_db(table_name, columns):
     """Cria uma nova tabela na base de dados"""
-    global connection
-
-    if not connection:
+    if not pool:
         return False, "Não conectado à BD"
 
     try:
-        cursor = connection.cursor()
-        columns_sql = []
+        with pool.connection() as connection:
+            cursor = connection.cursor()
+            columns_sql = []
 
-        for col in columns:
-            col_name = col['name_entry'].get().strip()
-            col_type = col['type_combo'].get()
-            nullable = "NULL" if col['nullable_check'].get() else "NOT NULL"
-            columns_sql.append(f"{col_name} {col_type} {nullable}")
+            for col in columns:
+                col_name = col['name_entry'].get().strip()
+                col_type = col['type_combo'].get()
+                nullable = "NULL" if col['nullable_check'].get() else "NOT NULL"
+                columns_sql.append(f"{col_name} {col_type} {nullable}")
 
-        sql = f"CREATE TABLE {table_name} (\n    " + ",\n    ".join(columns_sql) + "\n)"
-        cursor.execute(sql)
-        cursor.close()
+            sql = f"CREATE TABLE {table_name} (\n    " + ",\n    ".join(columns_sql) + "\n)"
+            cursor.execute(sql)
+            cursor.close()
+
+        schema_cache.invalidate()
 
         return True, f"Tabela '{table_name}' criada com sucesso!"
 
@@ -191,81 +206,283 @@ def create_table_in_db(table_name, columns):
 
 def insert_record_into_table(table_name, record_data):
     """Insere um registo numa tabela"""
-    global connection
+    if not pool:
+        return False, "Não conectado à BD"
+
+    try:
+        with pool.connection() as connection:
+            cursor = connection.cursor()
+
+            # Preparar valores
+            column_names = []
+            values = []
+            placeholders = []
 
-    if not connection:
+            for field in record_data['fields']:
+                value = field['entry'].get().strip()
+                column_names.append(field['name'])
+
+                if value:
+                    values.append(value)
+                else:
+                    values.append(None)
+                placeholders.append("?")
+
+            # Construir SQL
+            sql = f"INSERT INTO {table_name} ({', '.join(column_names)}) VALUES ({', '.join(placeholders)})"
+
+            cursor.execute(sql, values)
+            connection.commit()
+            cursor.close()
+
+            statistics_cache.invalidate()
+            return True, "Registo inserido com sucesso!"
+
+    except Exception as e:
+        return False, str(e)
+
+
+def bulk_insert(table_name, columns, rows, batch_size=None, connection=None, commit=True):
+    """
+    Insere muitos registos numa tabela, sem depender de widgets.
+    `rows` é um iterável (pode ser um gerador) de sequências com os valores
+    pela ordem de `columns`. Os registos são enviados em lotes de `batch_size`
+    (BULK_BATCH_SIZE por omissão) com executemany e um commit por lote; no
+    SQL Server com fast_executemany e os tipos de get_table_structure.
+    Com `connection`, usa essa conexão em vez de uma do pool; com
+    commit=False (só com `connection`) os lotes ficam na transação já aberta
+    pelo chamador, que faz o commit ou o rollback.
+    Retorna (success, número de registos inseridos) ou (False, mensagem)
+    """
+    if not pool:
         return False, "Não conectado à BD"
+    if not commit and connection is None:
+        return False, "commit=False requer uma conexão"
+
+    batch_size = batch_size or BULK_BATCH_SIZE
+    structure = {coluna['name'].lower(): coluna for coluna in get_table_structure(table_name)}
+    missing = [column for column in columns if column.lower() not in structure]
+    if not structure:
+        return False, f"Tabela '{table_name}' não encontrada"
+    if missing:
+        return False, f"Colunas inexistentes em {table_name}: {', '.join(missing)}"
+
+    placeholders = ", ".join("?" for _ in columns)
+    sql = f"INSERT INTO {table_name} ({', '.join(columns)}) VALUES ({placeholders})"
+    column_types = [structure[column.lower()] for column in columns]
+    result = {'inserted': 0}
 
     try:
-        cursor = connection.cursor()
+        if connection is not None:
+            _insert_batches(connection, sql, column_types, rows, batch_size, result, commit)
+        else:
+            with pool.connection() as connection:
+                _insert_batches(connection, sql, column_types, rows, batch_size, result)
 
-        # Preparar valores
-        column_names = []
-        values = []
-        placeholders = []
+        return True, result['inserted']
 
-        for field in record_data['fields']:
-            value = field['entry'].get().strip()
-            column_names.append(field['name'])
+    except Exception as e:
+        return False, f"Erro após {result['inserted']} registos inseridos: {str(e)}"
 
-            if value:
-                values.append(value)
-            else:
-                values.append(None)
-            placeholders.append("?")
+    finally:
+        if result['inserted']:
+            statistics_cache.invalidate()
 
-        # Construir SQL
-        sql = f"INSERT INTO {table_name} ({', '.join(column_names)}) VALUES ({', '.join(placeholders)})"
 
-        cursor.execute(sql, values)
-        connection.commit()
+def _insert_batches(connection, sql, column_types, rows, batch_size, result, commit=True):
+    """
+    executemany em lotes, um commit por lote; conta em result['inserted'].
+    Com commit=False, não abre, confirma nem desfaz transações: os lotes ficam
+    na transação do chamador.
+    """
+    cursor = connection.cursor()
+    try:
+        backend.prepare_bulk(cursor, column_types)
+        rows = iter(rows)
+
+        while True:
+            batch = list(islice(rows, batch_size))
+            if not batch:
+                break
+
+            if commit:
+                backend.begin_transaction(connection)
+            cursor.executemany(sql, batch)
+            if commit:
+                connection.commit()
+            result['inserted'] += len(batch)
+
+    except Exception:
+        # Desfazer o lote em curso antes de voltar ao autocommit
+        if commit:
+            connection.rollback()
+        raise
+    finally:
+        if commit:
+            backend.end_transaction(connection)
         cursor.close()
 
-        return True, "Registo inserido com sucesso!"
+
+def bulk_update(table_name, key_column, columns, rows, batch_size=None, connection=None):
+    """
+    Atualiza muitos registos pela chave, em lotes como bulk_insert.
+    `rows` é um iterável de sequências (chave, valores pela ordem de `columns`).
+    Retorna (success, número de registos enviados) ou (False, mensagem)
+    """
+    if not pool:
+        return False, "Não conectado à BD"
+
+    batch_size = batch_size or BULK_BATCH_SIZE
+    structure = {coluna['name'].lower(): coluna for coluna in get_table_structure(table_name)}
+    missing = [column for column in [key_column] + list(columns) if column.lower() not in structure]
+    if not structure:
+        return False, f"Tabela '{table_name}' não encontrada"
+    if missing:
+        return False, f"Colunas inexistentes em {table_name}: {', '.join(missing)}"
+
+    assignments = ", ".join(f"{column} = ?" for column in columns)
+    sql = f"UPDATE {table_name} SET {assignments} WHERE {key_column} = ?"
+    column_types = [structure[column.lower()] for column in list(columns) + [key_column]]
+    # A chave passa para o fim, como no WHERE
+    params = (tuple(row[1:]) + (row[0],) for row in rows)
+    result = {'inserted': 0}
+
+    try:
+        if connection is not None:
+            _insert_batches(connection, sql, column_types, params, batch_size, result)
+        else:
+            with pool.connection() as connection:
+                _insert_batches(connection, sql, column_types, params, batch_size, result)
+
+        return True, result['inserted']
+
+    except Exception as e:
+        return False, f"Erro após {result['inserted']} registos atualizados: {str(e)}"
+
+    finally:
+        if result['inserted']:
+            statistics_cache.invalidate()
+
+
+def upsert_records(table_name, key_column, columns, rows, batch_size=None):
+    """
+    Insere ou atualiza registos em bloco pela coluna `key_column`.
+    Os registos são carregados numa tabela temporária (com bulk insert) e
+    aplicados de uma vez: um MERGE no SQL Server, UPDATE + INSERT numa
+    transação em SQLite. Registos iguais aos existentes não são escritos.
+    `rows` é lido por completo (chamar por lotes para volumes grandes); com
+    chaves repetidas fica a última ocorrência e registos sem chave são ignorados.
+    Retorna (success, {'inseridos', 'atualizados', 'inalterados', 'ignorados'})
+    """
+    if not pool:
+        return False, "Não conectado à BD"
+
+    structure = {coluna['name'].lower(): coluna for coluna in get_table_structure(table_name)}
+    missing = [column for column in columns if column.lower() not in structure]
+    if not structure:
+        return False, f"Tabela '{table_name}' não encontrada"
+    if missing:
+        return False, f"Colunas inexistentes em {table_name}: {', '.join(missing)}"
+    if key_column not in columns:
+        return False, f"A coluna chave '{key_column}' tem de estar nas colunas"
+
+    # MERGE não aceita a mesma chave duas vezes na origem
+    key_index = columns.index(key_column)
+    unique = {}
+    ignored = 0
+    for row in rows:
+        key = row[key_index]
+        if key is None or key == '':
+            ignored += 1
+            continue
+        unique[key] = row
+
+    counts = {'inseridos': 0, 'atualizados': 0, 'inalterados': 0, 'ignorados': ignored}
+    if not unique:
+        return True, counts
+
+    column_types = [structure[column.lower()] for column in columns]
+    placeholders = ", ".join("?" for _ in columns)
+    stage_sql = f"INSERT INTO {backend.stage_table} ({', '.join(columns)}) VALUES ({placeholders})"
+
+    try:
+        with pool.connection() as connection:
+            cursor = connection.cursor()
+            try:
+                cursor.execute(backend.drop_stage_sql())
+                cursor.execute(backend.create_stage_sql(table_name, columns))
+                _insert_batches(connection, stage_sql, column_types, unique.values(),
+                                batch_size or BULK_BATCH_SIZE, {'inserted': 0})
+
+                inserted, updated = backend.merge_from_stage(cursor, table_name, key_column, columns)
+            finally:
+                cursor.execute(backend.drop_stage_sql())
+                cursor.close()
+
+        counts['inseridos'] = inserted
+        counts['atualizados'] = updated
+        counts['inalterados'] = len(unique) - inserted - updated
+        if inserted or updated:
+            statistics_cache.invalidate()
+        return True, counts
 
     except Exception as e:
         return False, str(e)
 
 
+def upsert_asteroids(columns, rows, batch_size=None):
+    """
+    Atualiza parâmetros físicos (H, diameter, albedo, pha, neo...) de asteroides
+    em bloco, pela designação: pdes se a tabela a tiver, senão full_name.
+    Ver upsert_records.
+    """
+    asteroid_columns = {coluna['name'].lower() for coluna in get_table_structure('Asteroid')}
+    key_column = 'pdes' if 'pdes' in asteroid_columns and 'pdes' in columns else 'full_name'
+    return upsert_records('Asteroid', key_column, columns, rows, batch_size)
+
+
 def update_record_in_table(table_name, update_data):
     """Atualiza um registo numa tabela"""
-    global connection
-
-    if not connection:
+    if not pool:
         return False, "Não conectado à BD"
 
     try:
-        cursor = connection.cursor()
+        with pool.connection() as connection:
+            cursor = connection.cursor()
 
-        # Preparar SET clause
-        set_clauses = []
-        values = []
+            # Preparar SET clause
+            set_clauses = []
+            values = []
 
-        for field in update_data['fields']:
-            value = field['entry'].get().strip()
-            if value:
-                set_clauses.append(f"{field['name']} = ?")
-                values.append(value)
+            for field in update_data['fields']:
+                value = field['entry'].get().strip()
+                if value:
+                    set_clauses.append(f"{field['name']} = ?")
+                    values.append(value)
 
-        if not set_clauses:
-            return False, "Nenhum campo para atualizar"
+            if not set_clauses:
+                return False, "Nenhum campo para atualizar"
 
-        # Adicionar ID para WHERE
-        values.append(update_data['record_id'])
+            # Adicionar ID para WHERE
+            values.append(update_data['record_id'])
 
-        # Construir SQL
-        sql = f"UPDATE {table_name} SET {', '.join(set_clauses)} WHERE {update_data['primary_key']} = ?"
+            # Construir SQL
+            sql = f"UPDATE {table_name} SET {', '.join(set_clauses)} WHERE {update_data['primary_key']} = ?"
 
-        cursor.execute(sql, values)
-        connection.commit()
+            cursor.execute(sql, values)
+            connection.commit()
 
-        success = cursor.rowcount > 0
-        cursor.close()
+            success = cursor.rowcount > 0
+            cursor.close()
 
-        if success:
-            return True, f"Registo atualizado com sucesso!"
-        else:
-            return False, "Nenhum registo foi atualizado"
+            if success:
+                statistics_cache.invalidate()
+                if table_name == 'Orbital_Parameters':
+                    orbit_index.reset()
+                    orbit_changes.reset()
+                return True, f"Registo atualizado com sucesso!"
+            else:
+                return False, "Nenhum registo foi atualizado"
 
     except Exception as e:
         return False, str(e)
@@ -273,183 +490,377 @@ def update_record_in_table(table_name, update_data):
 
 def delete_record_from_table(table_name, primary_key, record_id):
     """Elimina um registo de uma tabela"""
-    global connection
-
-    if not connection:
+    if not pool:
         return False, "Não conectado à BD"
 
     try:
-        cursor = connection.cursor()
-        sql = f"DELETE FROM {table_name} WHERE {primary_key} = ?"
-        cursor.execute(sql, (record_id,))
-        connection.commit()
+        with pool.connection() as connection:
+            cursor = connection.cursor()
+            sql = f"DELETE FROM {table_name} WHERE {primary_key} = ?"
+            cursor.execute(sql, (record_id,))
+            connection.commit()
 
-        success = cursor.rowcount > 0
-        cursor.close()
+            success = cursor.rowcount > 0
+            cursor.close()
 
-        if success:
-            return True, f"Registo eliminado com sucesso!"
-        else:
-            return False, "Nenhum registo foi eliminado"
+            if success:
+                statistics_cache.invalidate()
+                if table_name == 'Orbital_Parameters':
+                    orbit_index.reset()
+                    orbit_changes.reset()
+                return True, f"Registo eliminado com sucesso!"
+            else:
+                return False, "Nenhum registo foi eliminado"
 
     except Exception as e:
         return False, str(e)
 
 
+def _build_filtered_query(table_name, filters=None):
+    """Constrói o SELECT (e parâmetros) de uma tabela com filtros opcionais"""
+    sql = f"SELECT * FROM {table_name}"
+    params = []
+
+    if filters and 'column' in filters and 'value' in filters and filters['value']:
+        column = filters['column']
+        operator = filters.get('operator', '=')
+        value = filters['value']
+
+        if operator.upper() == 'LIKE':
+            sql += f" WHERE {column} LIKE ?"
+            params.append(f"%{value}%")
+        else:
+            sql += f" WHERE {column} {operator} ?"
+            params.append(value)
+
+    return sql, params
+
+
 def query_table_with_filters(table_name, filters=None):
     """Consulta uma tabela com filtros opcionais"""
-    global connection
+    if not pool:
+        return False, "Não conectado à BD"
+
+    try:
+        with pool.connection() as connection:
+            cursor = connection.cursor()
+
+            sql, params = _build_filtered_query(table_name, filters)
+
+            if params:
+                cursor.execute(sql, params)
+            else:
+                cursor.execute(sql)
+
+            records = cursor.fetchall()
+            columns = [description[0] for description in cursor.description]
 
-    if not connection:
+            cursor.close()
+            return True, (columns, records)
+
+    except Exception as e:
+        return False, str(e)
+
+
+def count_table_with_filters(table_name, filters=None):
+    """Conta os registos de uma tabela com filtros opcionais"""
+    if not pool:
         return False, "Não conectado à BD"
 
     try:
-        cursor = connection.cursor()
+        sql, params = _build_filtered_query(table_name, filters)
+        sql = sql.replace("SELECT *", "SELECT COUNT(*)", 1)
 
-        # Construir query base
-        sql = f"SELECT * FROM {table_name}"
-        params = []
+        with pool.connection() as connection:
+            cursor = connection.cursor()
+            cursor.execute(sql, params)
+            total = cursor.fetchone()[0]
+            cursor.close()
 
-        if filters and 'column' in filters and 'value' in filters and filters['value']:
-            column = filters['column']
-            operator = filters.get('operator', '=')
-            value = filters['value']
+        return True, total
+
+    except Exception as e:
+        return False, str(e)
 
-            if operator.upper() == 'LIKE':
-                sql += f" WHERE {column} LIKE ?"
-                params.append(f"%{value}%")
-            else:
-                sql += f" WHERE {column} {operator} ?"
-                params.append(value)
 
-        if params:
+def query_table_page(table_name, filters=None, page=0, page_size=500, order_by=None):
+    """
+    Consulta uma única página de uma tabela (OFFSET no servidor).
+    A ordenação usa `order_by` ou, por omissão, a chave primária da tabela.
+    Retorna (success, (columns, records, has_more))
+    """
+    if not pool:
+        return False, "Não conectado à BD"
+
+    try:
+        if not order_by:
+            order_by = get_primary_key(table_name) or "(SELECT NULL)"
+
+        sql, params = _build_filtered_query(table_name, filters)
+        # Pedir mais um registo para saber se existe página seguinte
+        sql, params = backend.paginate(f"{sql} ORDER BY {order_by}", params,
+                                       page * page_size, page_size + 1)
+
+        with pool.connection() as connection:
+            cursor = connection.cursor()
             cursor.execute(sql, params)
-        else:
-            cursor.execute(sql)
 
-        records = cursor.fetchall()
-        columns = [description[0] for description in cursor.description]
+            records = cursor.fetchall()
+            columns = [description[0] for description in cursor.description]
 
-        cursor.close()
-        return True, (columns, records)
+            cursor.close()
+
+        has_more = len(records) > page_size
+        return True, (columns, records[:page_size], has_more)
 
     except Exception as e:
         return False, str(e)
 
 
-def load_record_for_update_from_db(table_name, primary_key, record_id):
-    """Carrega um registo para atualização"""
-    global connection
-
-    if not connection:
+def _fetch_keyset_page(table_name, key, limit, filters, descending):
+    """
+    Lê até `limit` registos a seguir a `key` na ordem da chave primária
+    (WHERE pk > ? ORDER BY pk, ou o inverso se `descending`).
+    """
+    if not pool:
         return False, "Não conectado à BD"
 
     try:
-        cursor = connection.cursor()
-        sql = f"SELECT * FROM {table_name} WHERE {primary_key} = ?"
-        cursor.execute(sql, (record_id,))
-        record = cursor.fetchone()
+        primary_key = get_primary_key(table_name)
+        if not primary_key:
+            return False, f"A tabela '{table_name}' não tem chave primária"
 
-        if not record:
-            cursor.close()
-            return False, f"Registo não encontrado"
+        sql, params = _build_filtered_query(table_name, filters)
 
-        column_names = [column[0] for column in cursor.description]
-        record_dict = dict(zip(column_names, record))
+        if key is not None:
+            sql += " AND " if params else " WHERE "
+            sql += f"{primary_key} {'<' if descending else '>'} ?"
+            params.append(key)
 
-        cursor.close()
-        return True, record_dict
+        sql += f" ORDER BY {primary_key} {'DESC' if descending else 'ASC'}"
+        # Pedir mais um registo para saber se existe página seguinte
+        sql = backend.limit(sql, int(limit) + 1)
+
+        with pool.connection() as connection:
+            cursor = connection.cursor()
+            cursor.execute(sql, params)
+
+            records = cursor.fetchall()
+            columns = [description[0] for description in cursor.description]
+
+            cursor.close()
+
+        has_more = len(records) > limit
+        return True, (columns, records[:limit], has_more)
 
     except Exception as e:
         return False, str(e)
 
 
-def get_connection():
-    """Retorna a conexão atual"""
-    return connection
+def fetch_page_after(table_name, last_key=None, limit=500, filters=None, order='ASC'):
+    """
+    Paginação por chave (seek): registos a seguir a `last_key` na ordem da
+    chave primária. Com `last_key` None retorna a primeira página.
+    Ao contrário de OFFSET, o custo não depende da profundidade da página.
+    Retorna (success, (columns, records, has_more))
+    """
+    return _fetch_keyset_page(table_name, last_key, limit, filters,
+                              descending=order.upper() == 'DESC')
+
 
+def fetch_page_before(table_name, first_key, limit=500, filters=None, order='ASC'):
+    """
+    Página anterior a `first_key` (navegação para trás com paginação por chave).
+    Os registos vêm na mesma ordem que em fetch_page_after.
+    Retorna (success, (columns, records, has_more))
+    """
+    success, result = _fetch_keyset_page(table_name, first_key, limit, filters,
+                                         descending=order.upper() != 'DESC')
+    if not success:
+        return success, result
 
-def close_connection():
-    """Fecha a conexão com a base de dados"""
-    global connection
-    if connection:
-        connection.close()
-        connection = None
+    columns, records, has_more = result
+    return True, (columns, list(reversed(records)), has_more)
 
 
-def execute_sql_file(file_path):
+def iter_table_with_filters(table_name, filters=None, chunk_size=1000, page_size=None):
     """
-    Executa um ficheiro SQL completo na base de dados
+    Percorre uma tabela em blocos de `chunk_size` registos, sem carregar o
+    resultado completo em memória. Gera tuplos (columns, records).
+
+    Sem `page_size`, usa um único cursor lido com fetchmany (a conexão fica
+    emprestada até o gerador terminar ou ser fechado). Com `page_size`, cada
+    ida ao servidor pede apenas uma página (ver query_table_page).
     """
-    global connection
+    if not pool:
+        raise RuntimeError("Não conectado à BD")
+
+    if page_size:
+        page = 0
+        while True:
+            success, result = query_table_page(table_name, filters, page, page_size)
+            if not success:
+                raise RuntimeError(result)
+
+            columns, records, has_more = result
+            for start in range(0, len(records), chunk_size):
+                yield columns, records[start:start + chunk_size]
+
+            if not has_more:
+                return
+            page += 1
+
+    with pool.connection() as connection:
+        cursor = connection.cursor()
+        try:
+            sql, params = _build_filtered_query(table_name, filters)
+            cursor.execute(sql, params)
+            columns = [description[0] for description in cursor.description]
+
+            while True:
+                records = cursor.fetchmany(chunk_size)
+                if not records:
+                    break
+                yield columns, records
+        finally:
+            cursor.close()
+
 
-    if not connection:
+def load_record_for_update_from_db(table_name, primary_key, record_id):
+    """Carrega um registo para atualização"""
+    if not pool:
         return False, "Não conectado à BD"
 
     try:
-        # Verificar se o ficheiro existe
-        if not os.path.exists(file_path):
-            return False, f"Ficheiro não encontrado: {file_path}"
+        with pool.connection() as connection:
+            cursor = connection.cursor()
+            sql = f"SELECT * FROM {table_name} WHERE {primary_key} = ?"
+            cursor.execute(sql, (record_id,))
+            record = cursor.fetchone()
 
-        # Ler o conteúdo do ficheiro
-        with open(file_path, 'r', encoding='utf-8') as f:
-            sql_content = f.read()
+            if not record:
+                cursor.close()
+                return False, f"Registo não encontrado"
 
-        # IMPORTANTE: Remover a linha USE database, pois já estamos conectados
-        lines = sql_content.split('\n')
-        filtered_lines = []
-        for line in lines:
-            if line.strip().upper().startswith('USE ') and 'GO' in line.upper():
-                print(f"IGNORADO: {line.strip()} (já conectado à BD)")
-                continue
-            filtered_lines.append(line)
+            column_names = [column[0] for column in cursor.description]
+            record_dict = dict(zip(column_names, record))
 
-        sql_content = '\n'.join(filtered_lines)
+            cursor.close()
+            return True, record_dict
 
-        cursor = connection.cursor()
+    except Exception as e:
+        return False, str(e)
 
-        # Separar por GO em linhas próprias
-        batches = []
-        current_batch = []
 
-        for line in sql_content.split('\n'):
-            line_stripped = line.strip()
+def get_pool():
+    """Retorna o pool de conexões atual (None se não conectado)"""
+    return pool
 
-            if line_stripped.upper() == 'GO':
-                if current_batch:
-                    batch_sql = '\n'.join(current_batch)
-                    if batch_sql.strip():
-                        batches.append(batch_sql)
-                    current_batch = []
-            else:
-                current_batch.append(line)
 
-        # Adicionar o último batch se existir
-        if current_batch:
-            batch_sql = '\n'.join(current_batch)
-            if batch_sql.strip():
-                batches.append(batch_sql)
+def get_backend():
+    """Retorna o motor da base de dados atual (None se não conectado)"""
+    return backend
 
-        print(f"Encontrados {len(batches)} lotes (batches) SQL")
 
-        for i, batch in enumerate(batches, 1):
-            try:
-                if batch.strip():
-                    print(f"Executando lote {i}/{len(batches)}: {batch[:100].replace(chr(10), ' ').replace(chr(13), ' ')}...")
-                    cursor.execute(batch)
-                    # COMMIT após cada lote bem-sucedido
-                    connection.commit()
-            except Exception as cmd_error:
-                print(f" Erro no lote {i}: {cmd_error}")
-                print(f"SQL problemático: {batch[:200]}")
-                # Rollback apenas deste lote
-                connection.rollback()
-                # Continue com os próximos lotes
-                continue
+def test_connection():
+    """Testa uma conexão do pool com uma query trivial"""
+    if not pool:
+        return False, "Sem conexão"
 
-        cursor.close()
+    try:
+        with pool.connection() as connection:
+            if pool.is_healthy(connection):
+                return True, "Conexão ativa"
+            return False, "Conexão inativa"
 
-        return True, f"Ficheiro {file_path} executado. {len(batches)} lotes processados."
+    except Exception as e:
+        return False, f"Erro de conexão: {str(e)}"
+
+
+def close_connection():
+    """Fecha todas as conexões com a base de dados"""
+    global pool
+    if pool:
+        pool.close()
+        pool = None
+
+
+def execute_sql_file(file_path):
+    """
+    Executa um ficheiro SQL completo na base de dados
+    """
+    if not pool:
+        return False, "Não conectado à BD"
+
+    try:
+        with pool.connection() as connection:
+            # Verificar se o ficheiro existe
+            if not os.path.exists(file_path):
+                return False, f"Ficheiro não encontrado: {file_path}"
+
+            # Ler o conteúdo do ficheiro
+            with open(file_path, 'r', encoding='utf-8') as f:
+                sql_content = f.read()
+
+            # IMPORTANTE: Remover a linha USE database, pois já estamos conectados
+            lines = sql_content.split('\n')
+            filtered_lines = []
+            for line in lines:
+                if line.strip().upper().startswith('USE ') and 'GO' in line.upper():
+                    print(f"IGNORADO: {line.strip()} (já conectado à BD)")
+                    continue
+                filtered_lines.append(line)
+
+            sql_content = '\n'.join(filtered_lines)
+
+            cursor = connection.cursor()
+
+            # Separar por GO em linhas próprias
+            batches = []
+            current_batch = []
+
+            for line in sql_content.split('\n'):
+                line_stripped = line.strip()
+
+                if line_stripped.upper() == 'GO':
+                    if current_batch:
+                        batch_sql = '\n'.join(current_batch)
+                        if batch_sql.strip():
+                            batches.append(batch_sql)
+                        current_batch = []
+                else:
+                    current_batch.append(line)
+
+            # Adicionar o último batch se existir
+            if current_batch:
+                batch_sql = '\n'.join(current_batch)
+                if batch_sql.strip():
+                    batches.append(batch_sql)
+
+            print(f"Encontrados {len(batches)} lotes (batches) SQL")
+
+            for i, batch in enumerate(batches, 1):
+                try:
+                    if batch.strip():
+                        print(f"Executando lote {i}/{len(batches)}: {batch[:100].replace(chr(10), ' ').replace(chr(13), ' ')}...")
+                        backend.execute_script(cursor, batch)
+                        # COMMIT após cada lote bem-sucedido
+                        connection.commit()
+                except Exception as cmd_error:
+                    print(f" Erro no lote {i}: {cmd_error}")
+                    print(f"SQL problemático: {batch[:200]}")
+                    # Rollback apenas deste lote
+                    connection.rollback()
+                    # Continue com os próximos lotes
+                    continue
+
+            cursor.close()
+
+            # O ficheiro pode ter criado/alterado tabelas, views, triggers ou dados
+            schema_cache.invalidate()
+            statistics_cache.invalidate()
+
+            return True, f"Ficheiro {file_path} executado. {len(batches)} lotes processados."
 
     except Exception as e:
         return False, f"Erro ao executar ficheiro SQL: {str(e)}"
@@ -458,29 +869,68 @@ def execute_sql_file(file_path):
 def setup_triggers():
     """
     Configura todos os triggers do sistema a partir do ficheiro triggers.txt
+    (sqlite_triggers.txt em SQLite)
     """
-    return execute_sql_file('triggers.txt')
+    if not backend:
+        return False, "Não conectado à BD"
+    return execute_sql_file(backend.triggers_file)
 
 
 def setup_views():
     """
     Configura todas as views do sistema a partir do ficheiro queries.txt
+    (sqlite_queries.txt em SQLite)
+    """
+    if not backend:
+        return False, "Não conectado à BD"
+    return execute_sql_file(backend.views_file)
+
+
+def enable_change_tracking():
     """
-    return execute_sql_file('queries.txt')
+    Ativa o change tracking na base de dados atual e nas tabelas usadas pelas
+    estatísticas incrementais (Asteroid, Alert, Orbital_Parameters)
+    """
+    if not pool:
+        return False, "Não conectado à BD"
+
+    if not backend.supports_change_tracking:
+        return False, f"Change tracking não disponível em {backend.name}"
+
+    try:
+        with pool.connection() as connection:
+            cursor = connection.cursor()
+
+            cursor.execute("""
+                IF NOT EXISTS (SELECT * FROM sys.change_tracking_databases WHERE database_id = DB_ID())
+                    ALTER DATABASE CURRENT SET CHANGE_TRACKING = ON
+                    (CHANGE_RETENTION = 2 DAYS, AUTO_CLEANUP = ON);
+            """)
+
+            for table_name in ['Asteroid', 'Alert', 'Orbital_Parameters']:
+                cursor.execute(f"""
+                    IF NOT EXISTS (SELECT * FROM sys.change_tracking_tables
+                                   WHERE object_id = OBJECT_ID('{table_name}'))
+                        ALTER TABLE {table_name} ENABLE CHANGE_TRACKING;
+                """)
+
+            cursor.close()
+
+        statistics_tracker.reset()
+        return True, "Change tracking ativo para as estatísticas"
+
+    except Exception as e:
+        return False, f"Erro ao ativar change tracking: {str(e)}"
 
 
 def check_triggers_exist():
     """
     Verifica se os triggers principais estão criados
     """
-    global connection
-
-    if not connection:
+    if not pool:
         return False, "Não conectado à BD"
 
     try:
-        cursor = connection.cursor()
-
         # Lista de triggers que devem existir (ajustar conforme seus triggers)
         expected_triggers = [
             'trg_AfterInsertAsteroid',
@@ -489,17 +939,8 @@ def check_triggers_exist():
             'trg_GenerateAlerts'
         ]
 
-        existing_triggers = []
-        for trigger in expected_triggers:
-            cursor.execute(f"""
-                SELECT name 
-                FROM sys.triggers 
-                WHERE name = '{trigger}'
-            """)
-            if cursor.fetchone():
-                existing_triggers.append(trigger)
-
-        cursor.close()
+        trigger_names = {trigger['name'] for trigger in schema_cache.get(pool)['triggers']}
+        existing_triggers = [trigger for trigger in expected_triggers if trigger in trigger_names]
 
         if len(existing_triggers) == len(expected_triggers):
             return True, "Todos os triggers estão configurados"
@@ -515,35 +956,11 @@ def get_all_triggers():
     """
     Retorna lista de todos os triggers na base de dados
     """
-    global connection
-
-    if not connection:
+    if not pool:
         return []
 
     try:
-        cursor = connection.cursor()
-        cursor.execute("""
-            SELECT 
-                t.name as trigger_name,
-                OBJECT_NAME(t.parent_id) as table_name,
-                t.is_disabled,
-                t.create_date
-            FROM sys.triggers t
-            WHERE t.is_ms_shipped = 0
-            ORDER BY t.name
-        """)
-
-        triggers = []
-        for row in cursor.fetchall():
-            triggers.append({
-                'name': row[0],
-                'table': row[1],
-                'disabled': row[2],
-                'created': row[3]
-            })
-
-        cursor.close()
-        return triggers
+        return [dict(trigger) for trigger in schema_cache.get(pool)['triggers']]
 
     except Exception as e:
         print(f"Erro ao obter triggers: {e}")
@@ -554,24 +971,30 @@ def enable_disable_trigger(trigger_name, enable=True):
     """
     Ativa ou desativa um trigger
     """
-    global connection
-
-    if not connection:
+    if not pool:
         return False, "Não conectado à BD"
 
+    # Triggers DML (de uma tabela) são alterados ON <tabela>; os restantes ON DATABASE
+    table_name = next((trigger['table'] for trigger in get_all_triggers()
+                       if trigger['name'] == trigger_name), None)
+    sql = backend.trigger_toggle_sql(trigger_name, enable, table_name)
+    if not sql:
+        return False, f"{backend.name} não permite ativar/desativar triggers"
+
     try:
-        cursor = connection.cursor()
+        with pool.connection() as connection:
+            cursor = connection.cursor()
+            cursor.execute(sql)
 
-        if enable:
-            cursor.execute(f"ENABLE TRIGGER {trigger_name} ON DATABASE")
-            message = f"Trigger {trigger_name} ativado"
-        else:
-            cursor.execute(f"DISABLE TRIGGER {trigger_name} ON DATABASE")
-            message = f"Trigger {trigger_name} desativado"
+            if enable:
+                message = f"Trigger {trigger_name} ativado"
+            else:
+                message = f"Trigger {trigger_name} desativado"
 
-        connection.commit()
-        cursor.close()
-        return True, message
+            connection.commit()
+            cursor.close()
+            schema_cache.invalidate()
+            return True, message
 
     except Exception as e:
         return False, f"Erro ao alterar trigger: {str(e)}"
@@ -581,17 +1004,17 @@ def drop_trigger(trigger_name):
     """
     Elimina um trigger da base de dados
     """
-    global connection
-
-    if not connection:
+    if not pool:
         return False, "Não conectado à BD"
 
     try:
-        cursor = connection.cursor()
-        cursor.execute(f"DROP TRIGGER IF EXISTS {trigger_name}")
-        connection.commit()
-        cursor.close()
-        return True, f"Trigger {trigger_name} eliminado"
+        with pool.connection() as connection:
+            cursor = connection.cursor()
+            cursor.execute(f"DROP TRIGGER IF EXISTS {trigger_name}")
+            connection.commit()
+            cursor.close()
+            schema_cache.invalidate()
+            return True, f"Trigger {trigger_name} eliminado"
 
     except Exception as e:
         return False, f"Erro ao eliminar trigger: {str(e)}"
@@ -601,19 +1024,18 @@ def execute_view(view_name):
     """
     Executa uma view e retorna os resultados.
     """
-    global connection
-
-    if not connection:
+    if not pool:
         return False, "Não conectado à BD"
 
     try:
-        cursor = connection.cursor()
-        cursor.execute(f"SELECT * FROM {view_name}")
-        records = cursor.fetchall()
-        columns = [description[0] for description in cursor.description]
+        with pool.connection() as connection:
+            cursor = connection.cursor()
+            cursor.execute(f"SELECT * FROM {view_name}")
+            records = cursor.fetchall()
+            columns = [description[0] for description in cursor.description]
 
-        cursor.close()
-        return True, (columns, records)
+            cursor.close()
+            return True, (columns, records)
 
     except Exception as e:
         return False, str(e)
@@ -625,47 +1047,45 @@ def create_notification_table():
     """
     Cria a tabela NotificationSettings no banco atual
     """
-    global connection
-
-    if not connection:
+    if not pool:
         return False, "Não conectado à BD"
 
     try:
-        cursor = connection.cursor()
+        with pool.connection() as connection:
+            cursor = connection.cursor()
 
-        # Verificar qual banco estamos usando
-        cursor.execute("SELECT DB_NAME()")
-        current_db = cursor.fetchone()[0]
-        print(f"Criando tabela no banco: {current_db}")
-
-        # Script SQL para criar a tabela
-        sql_script = """
-        IF NOT EXISTS (SELECT * FROM sys.tables WHERE name = 'NotificationSettings')
-        BEGIN
-            CREATE TABLE NotificationSettings (
-                setting_id INT PRIMARY KEY IDENTITY(1,1),
-                user_email VARCHAR(255) UNIQUE NOT NULL,
-                high_priority_alerts BIT DEFAULT 1,
-                medium_priority_alerts BIT DEFAULT 0,
-                low_priority_alerts BIT DEFAULT 0,
-                created_date DATETIME DEFAULT GETDATE(),
-                updated_date DATETIME DEFAULT GETDATE()
-            );
-
-            INSERT INTO NotificationSettings (user_email, high_priority_alerts)
-            VALUES ('admin@observatorio.pt', 1);
-
-            PRINT 'Tabela NotificationSettings criada com sucesso.';
-        END
-        ELSE
-            PRINT 'A tabela NotificationSettings já existe.';
-        """
+            # Verificar qual banco estamos usando
+            current_db = backend.describe(connection)[1]
+            print(f"Criando tabela no banco: {current_db}")
 
-        cursor.execute(sql_script)
-        connection.commit()
-        cursor.close()
+            backend.execute_script(cursor, backend.notification_table_sql())
+            connection.commit()
+            cursor.close()
+            subscriber_index.invalidate()
 
-        return True, f"Tabela NotificationSettings verificada/criada no banco {current_db}"
+            return True, f"Tabela NotificationSettings verificada/criada no banco {current_db}"
+
+    except Exception as e:
+        return False, f"Erro ao criar tabela: {str(e)}"
+
+
+def create_close_approach_table():
+    """
+    Cria a tabela Close_Approach (aproximações calculadas por close_approach.py)
+    no banco atual, se não existir
+    """
+    if not pool:
+        return False, "Não conectado à BD"
+
+    try:
+        with pool.connection() as connection:
+            cursor = connection.cursor()
+            backend.execute_script(cursor, backend.close_approach_table_sql())
+            connection.commit()
+            cursor.close()
+
+        schema_cache.invalidate()
+        return True, "Tabela Close_Approach verificada/criada"
 
     except Exception as e:
         return False, f"Erro ao criar tabela: {str(e)}"
@@ -675,51 +1095,121 @@ def get_active_alerts(filters=None):
     """
     Retorna alertas ativos com filtros opcionais - VERSÃO ATUALIZADA
     """
-    global connection
+    if not pool:
+        return False, "Não conectado à BD"
+
+    try:
+        with pool.connection() as connection:
+            cursor = connection.cursor()
+
+            # Query base - ATUALIZADA para a estrutura correta
+            sql = """
+                SELECT 
+                    a.alert_id,
+                    ast.full_name AS asteroid_name,
+                    a.alert_date,
+                    a.priority_level,
+                    a.description,
+                    a.is_active
+                FROM Alert a
+                LEFT JOIN Asteroid ast ON a.asteroid_id = ast.asteroid_id
+                WHERE a.is_active = 1
+            """
+            # Aplicar filtros
+            filter_sql, params = _alert_filter_sql(filters)
+            sql += filter_sql
+
+            sql += " ORDER BY a.alert_date DESC"
+
+            cursor.execute(sql, params)
+            records = cursor.fetchall()
+            columns = [description[0] for description in cursor.description]
+
+            cursor.close()
+            return True, (columns, records)
+
+    except Exception as e:
+        return False, str(e)
+
+
+def _alert_filter_sql(filters):
+    """Condições (AND ...) e parâmetros dos filtros da aba de alertas"""
+    sql = ""
+    params = []
+
+    if filters:
+        if 'priority' in filters and filters['priority'] and filters['priority'] != 'Todas':
+            # Converter string para valor inteiro
+            priority_map = {
+                'Alta': 1,
+                'Média': 2,
+                'Baixa': 3
+            }
+            priority_int = priority_map.get(filters['priority'])
+            if priority_int:
+                sql += " AND a.priority_level = ?"
+                params.append(priority_int)
+
+    return sql, params
+
+
+def refresh_active_alerts(filters=None, full=False):
+    """
+    Atualiza active_alerts lendo apenas os alertas criados ou alterados desde
+    a última atualização (ou tudo, na primeira vez, se o filtro mudar ou com `full`).
+    Retorna (success, active_alerts) ou (False, mensagem)
+    """
+    if not pool:
+        return False, "Não conectado à BD"
+
+    try:
+        filter_sql, params = _alert_filter_sql(filters)
+        active_alerts.refresh(pool, filter_sql, params,
+                              change_tracking=backend.supports_change_tracking, full=full)
+        return True, active_alerts
+
+    except Exception as e:
+        return False, str(e)
 
-    if not connection:
+
+def find_similar_orbits(asteroid_id, k=10, radius=None):
+    """
+    Asteroides com a órbita mais parecida com a do asteroide `asteroid_id`
+    (critério D, ver orbit_index.orbit_vectors): os `k` mais próximos ou, com
+    `radius`, todos até essa distância. O índice lê só as órbitas novas desde
+    a última pesquisa.
+    Retorna (success, [(asteroid_id, full_name, D)]) ou (False, mensagem)
+    """
+    if not pool:
         return False, "Não conectado à BD"
 
     try:
-        cursor = connection.cursor()
+        orbit_index.refresh(pool, backend)
+        vector = orbit_index.vector(asteroid_id)
+        if vector is None:
+            return False, f"Asteroide {asteroid_id} sem órbita completa"
 
-        # Query base - ATUALIZADA para a estrutura correta
-        sql = """
-            SELECT 
-                a.alert_id,
-                ast.full_name AS asteroid_name,
-                a.alert_date,
-                a.priority_level,
-                a.description,
-                a.is_active
-            FROM Alert a
-            LEFT JOIN Asteroid ast ON a.asteroid_id = ast.asteroid_id
-            WHERE a.is_active = 1
-        """
-        params = []
-
-        # Aplicar filtros
-        if filters:
-            if 'priority' in filters and filters['priority'] and filters['priority'] != 'Todas':
-                # Converter string para valor inteiro
-                priority_map = {
-                    'Alta': 1,
-                    'Média': 2,
-                    'Baixa': 3
-                }
-                priority_int = priority_map.get(filters['priority'])
-                if priority_int:
-                    sql += " AND a.priority_level = ?"
-                    params.append(priority_int)
-
-        sql += " ORDER BY a.alert_date DESC"
-
-        cursor.execute(sql, params)
-        records = cursor.fetchall()
-        columns = [description[0] for description in cursor.description]
+        if radius is None:
+            found = orbit_index.nearest(vector, k + 1)
+        else:
+            found = orbit_index.within(vector, radius)
+        found = [(other_id, distance) for other_id, distance in found if other_id != asteroid_id]
+        if radius is None:
+            found = found[:k]
+
+        names = {}
+        with pool.connection() as connection:
+            cursor = connection.cursor()
+            ids = [other_id for other_id, _ in found]
+            for start in range(0, len(ids), LOOKUP_CHUNK):
+                chunk = ids[start:start + LOOKUP_CHUNK]
+                placeholders = ", ".join("?" for _ in chunk)
+                cursor.execute(f"SELECT asteroid_id, full_name FROM Asteroid "
+                               f"WHERE asteroid_id IN ({placeholders})", chunk)
+                names.update((row[0], row[1]) for row in cursor.fetchall())
+            cursor.close()
 
-        cursor.close()
-        return True, (columns, records)
+        return True, [(other_id, names.get(other_id), distance) for other_id, distance in found]
 
     except Exception as e:
         return False, str(e)
@@ -729,27 +1219,26 @@ def get_notification_settings(email=None):
     """
     Obtém configurações de notificação
     """
-    global connection
-
-    if not connection:
+    if not pool:
         return False, "Não conectado à BD"
 
     try:
-        cursor = connection.cursor()
+        with pool.connection() as connection:
+            cursor = connection.cursor()
 
-        if email:
-            cursor.execute("""
-                SELECT * FROM NotificationSettings 
-                WHERE user_email = ?
-            """, (email,))
-        else:
-            cursor.execute("SELECT * FROM NotificationSettings")
+            if email:
+                cursor.execute("""
+                    SELECT * FROM NotificationSettings 
+                    WHERE user_email = ?
+                """, (email,))
+            else:
+                cursor.execute("SELECT * FROM NotificationSettings")
 
-        columns = [description[0] for description in cursor.description]
-        records = cursor.fetchall()
+            columns = [description[0] for description in cursor.description]
+            records = cursor.fetchall()
 
-        cursor.close()
-        return True, (columns, records)
+            cursor.close()
+            return True, (columns, records)
 
     except Exception as e:
         return False, str(e)
@@ -757,35 +1246,16 @@ def get_notification_settings(email=None):
 
 def load_notification_settings_for_email(email):
     """
-    Carrega configurações específicas para um email
+    Carrega configurações específicas para um email (do subscriber_index)
     """
-    global connection
-
-    if not connection:
+    if not pool:
         return False, "Não conectado à BD"
 
     try:
-        cursor = connection.cursor()
-        cursor.execute("""
-            SELECT 
-                user_email,
-                high_priority_alerts,
-                medium_priority_alerts,
-                low_priority_alerts
-            FROM NotificationSettings 
-            WHERE user_email = ?
-        """, (email,))
-
-        result = cursor.fetchone()
-        cursor.close()
+        settings = subscriber_index.refresh(pool).settings(email)
 
-        if result:
-            return True, {
-                'email': result[0],
-                'high_priority': bool(result[1]),
-                'medium_priority': bool(result[2]),
-                'low_priority': bool(result[3])
-            }
+        if settings:
+            return True, dict(settings)
         else:
             return False, "Email não encontrado"
 
@@ -797,304 +1267,439 @@ def update_notification_settings(email, high_priority, medium_priority=None, low
     """
     Atualiza configurações de notificação
     """
-    global connection
-
-    if not connection:
+    if not pool:
         return False, "Não conectado à BD"
 
     try:
-        cursor = connection.cursor()
+        with pool.connection() as connection:
+            cursor = connection.cursor()
+
+            # Verificar se existe
+            cursor.execute("SELECT * FROM NotificationSettings WHERE user_email = ?", (email,))
+            exists = cursor.fetchone()
+
+            if exists:
+                # Atualizar
+                sql = f"""
+                    UPDATE NotificationSettings 
+                    SET high_priority_alerts = ?,
+                        medium_priority_alerts = ?,
+                        low_priority_alerts = ?,
+                        updated_date = {backend.now}
+                    WHERE user_email = ?
+                """
+                cursor.execute(sql, (1 if high_priority else 0,
+                                     1 if medium_priority else 0,
+                                     1 if low_priority else 0,
+                                     email))
+            else:
+                # Inserir novo
+                sql = """
+                    INSERT INTO NotificationSettings 
+                    (user_email, high_priority_alerts, medium_priority_alerts, low_priority_alerts)
+                    VALUES (?, ?, ?, ?)
+                """
+                cursor.execute(sql, (email,
+                                     1 if high_priority else 0,
+                                     1 if medium_priority else 0,
+                                     1 if low_priority else 0))
+
+            connection.commit()
+            cursor.close()
+            subscriber_index.invalidate()
+            return True, f"Configurações para {email} atualizadas com sucesso"
+
+    except Exception as e:
+        return False, str(e)
 
-        # Verificar se existe
-        cursor.execute("SELECT * FROM NotificationSettings WHERE user_email = ?", (email,))
-        exists = cursor.fetchone()
 
-        if exists:
-            # Atualizar
-            sql = """
-                UPDATE NotificationSettings 
-                SET high_priority_alerts = ?,
-                    medium_priority_alerts = ?,
-                    low_priority_alerts = ?,
-                    updated_date = GETDATE()
-                WHERE user_email = ?
-            """
-            cursor.execute(sql, (1 if high_priority else 0,
-                                 1 if medium_priority else 0,
-                                 1 if low_priority else 0,
-                                 email))
-        else:
-            # Inserir novo
-            sql = """
-                INSERT INTO NotificationSettings 
-                (user_email, high_priority_alerts, medium_priority_alerts, low_priority_alerts)
-                VALUES (?, ?, ?, ?)
-            """
-            cursor.execute(sql, (email,
-                                 1 if high_priority else 0,
-                                 1 if medium_priority else 0,
-                                 1 if low_priority else 0))
+def route_alerts(alerts):
+    """
+    Associa alertas (alert_id, asteroid_name, alert_date, priority_level,
+    description) aos emails subscritos à sua prioridade, pelo subscriber_index.
+    Retorna (success, [(email, *alerta)]) ou (False, mensagem)
+    """
+    if not pool:
+        return False, "Não conectado à BD"
 
-        connection.commit()
-        cursor.close()
-        return True, f"Configurações para {email} atualizadas com sucesso"
+    try:
+        return True, subscriber_index.refresh(pool).route(alerts)
 
     except Exception as e:
         return False, str(e)
 
 
-def check_new_high_priority_alerts():
+# Alertas entregues pelo feed (alert_feed.py), com as colunas de get_active_alerts
+ALERT_FEED_SQL = """
+    SELECT
+        a.alert_id,
+        ast.full_name AS asteroid_name,
+        a.alert_date,
+        a.priority_level,
+        a.description,
+        a.is_active
+    FROM Alert a
+    LEFT JOIN Asteroid ast ON a.asteroid_id = ast.asteroid_id
+"""
+
+
+def get_last_alert_id():
     """
-    Verifica se existem novos alertas de alta prioridade (priority_level = 1)
+    Retorna o maior alert_id existente (0 se não houver alertas)
     """
-    global connection
-
-    if not connection:
+    if not pool:
         return False, "Não conectado à BD"
 
     try:
-        cursor = connection.cursor()
-
-        # Verificar alertas de alta prioridade (priority_level = 1) criados nos últimos 5 minutos
-        cursor.execute("""
-            SELECT COUNT(*) as new_alerts
-            FROM Alert 
-            WHERE is_active = 1 
-            AND priority_level = 1  -- Alta prioridade = 1
-            AND alert_date >= DATEADD(minute, -5, GETDATE())
-        """)
-
-        new_alerts = cursor.fetchone()[0]
-        cursor.close()
+        with pool.connection() as connection:
+            cursor = connection.cursor()
+            cursor.execute("SELECT MAX(alert_id) FROM Alert")
+            last_id = cursor.fetchone()[0]
+            cursor.close()
 
-        return True, new_alerts
+            return True, last_id or 0
 
     except Exception as e:
         return False, str(e)
 
 
-def get_statistics():
+def fetch_alerts_after(last_id, limit=500, alert_ids=None):
     """
-    Retorna estatísticas completas conforme especificação do trabalho - VERSÃO CORRIGIDA
+    Retorna os alertas com alert_id > `last_id`, por ordem de alert_id (no
+    máximo `limit`), e ainda os de `alert_ids` (ids por preencher, ver
+    AlertFeed). Retorna (success, (colunas, registos)).
     """
-    global connection
-
-    if not connection:
+    if not pool:
         return False, "Não conectado à BD"
 
     try:
-        cursor = connection.cursor()
-        stats = {}
+        with pool.connection() as connection:
+            cursor = connection.cursor()
+
+            cursor.execute(backend.limit(
+                ALERT_FEED_SQL + " WHERE a.alert_id > ? ORDER BY a.alert_id", limit
+            ), [last_id])
+            records = cursor.fetchall()
+            columns = [description[0] for description in cursor.description]
+
+            alert_ids = list(alert_ids or [])
+            filled = []
+            for start in range(0, len(alert_ids), LOOKUP_CHUNK):
+                chunk = alert_ids[start:start + LOOKUP_CHUNK]
+                placeholders = ", ".join("?" for _ in chunk)
+                cursor.execute(ALERT_FEED_SQL + f" WHERE a.alert_id IN ({placeholders})", chunk)
+                filled.extend(cursor.fetchall())
+            records = filled + records
 
-        # Estatística de alerta
-        try:
-            # Número de alertas vermelhos (nível 4) e laranja (nível 3)
-            cursor.execute("""
-                SELECT 
-                    SUM(CASE WHEN priority_level = 4 THEN 1 ELSE 0 END) as vermelhos,
-                    SUM(CASE WHEN priority_level = 3 THEN 1 ELSE 0 END) as laranja
-                FROM Alert 
-                WHERE is_active = 1
-            """)
-            row = cursor.fetchone()
-            stats['alertas_vermelhos'] = row[0] if row and row[0] is not None else 0
-            stats['alertas_laranja'] = row[1] if row and row[1] is not None else 0
-        except Exception as e:
-            stats['alertas_vermelhos'] = 0
-            stats['alertas_laranja'] = 0
-            print(f" Erro em estatísticas de alerta: {e}")
+            cursor.close()
+            return True, (columns, records)
 
-        # Total de PHAs monitorizados com diâmetro > 100m (0.1km)
-        try:
-            cursor.execute("""
-                SELECT COUNT(*) 
-                FROM Asteroid 
-                WHERE pha = 'Y' 
-                AND diameter > 0.1
-            """)
-            row = cursor.fetchone()
-            stats['total_phas_100m'] = row[0] if row else 0
-        except Exception as e:
-            stats['total_phas_100m'] = 0
-            print(f"Erro em PHAs > 100m: {e}")
+    except Exception as e:
+        return False, str(e)
 
-        # Próximo eventos críticos
-        try:
-            # Verificar se a coluna moid_ld existe em Orbital_Parameters
-            cursor.execute("""
-                SELECT COLUMN_NAME 
-                FROM INFORMATION_SCHEMA.COLUMNS 
-                WHERE TABLE_NAME = 'Orbital_Parameters' 
-                AND COLUMN_NAME = 'moid_ld'
-            """)
 
-            if cursor.fetchone():
-                # Query usando moid_ld
-                cursor.execute("""
-                    SELECT TOP 1
-                        a.full_name,
-                        op.moid_ld,
-                        op.epoch_cal
-                    FROM Orbital_Parameters op
-                    INNER JOIN Asteroid a ON op.asteroid_id = a.asteroid_id
-                    WHERE op.moid_ld < 5 
-                        AND op.epoch_cal IS NOT NULL
-                        AND TRY_CAST(op.epoch_cal AS DATE) IS NOT NULL
-                        AND TRY_CAST(op.epoch_cal AS DATE) >= CAST(GETDATE() AS DATE)
-                    ORDER BY TRY_CAST(op.epoch_cal AS DATE) ASC
-                """)
-            else:
-                # Se não existir moid_ld, use moid (em UA) e converta para LD (1 UA ≈ 389.17 LD)
-                cursor.execute("""
-                    SELECT TOP 1
-                        a.full_name,
-                        op.moid * 389.17 as moid_ld,  -- Converter UA para LD
-                        op.epoch_cal
-                    FROM Orbital_Parameters op
-                    INNER JOIN Asteroid a ON op.asteroid_id = a.asteroid_id
-                    WHERE op.moid * 389.17 < 5  -- Converter para LD e verificar < 5 LD
-                        AND op.epoch_cal IS NOT NULL
-                        AND TRY_CAST(op.epoch_cal AS DATE) IS NOT NULL
-                        AND TRY_CAST(op.epoch_cal AS DATE) >= CAST(GETDATE() AS DATE)
-                    ORDER BY TRY_CAST(op.epoch_cal AS DATE) ASC
-                """)
+def _parse_alert_stats(rows, stats):
+    row = rows[0] if rows else None
+    stats['alertas_vermelhos'] = row[0] if row and row[0] is not None else 0
+    stats['alertas_laranja'] = row[1] if row and row[1] is not None else 0
 
-            next_event = cursor.fetchone()
-            if next_event:
-                stats['proximo_evento_critico'] = {
-                    'asteroide': next_event[0] if next_event[0] else "Desconhecido",
-                    'distancia_ld': float(next_event[1]) if next_event[1] else 0,
-                    'data': next_event[2]
-                }
-            else:
-                stats['proximo_evento_critico'] = None
-        except Exception as e:
-            stats['proximo_evento_critico'] = None
-            print(f" Erro em próximo evento crítico: {e}")
 
-        # Estatística de descoberta
-        try:
-            # Número de novos NEOs descobertos no último mês
-            # Verificar se há data de descoberta
-            cursor.execute("""
-                SELECT COUNT(*) 
-                FROM Asteroid 
-                WHERE neo = 'Y'
-            """)
-            total_neos = cursor.fetchone()[0]
-            stats['total_neos'] = total_neos
+def _parse_pha_stats(rows, stats):
+    stats['total_phas_100m'] = rows[0][0] if rows else 0
 
-            # Para "novos no último mês", podemos usar a data atual como aproximação
-            stats['novos_neos_ultimo_mes'] = total_neos  # Apenas para mostrar algo
-        except Exception as e:
-            stats['total_neos'] = 0
-            stats['novos_neos_ultimo_mes'] = 0
-            print(f" Erro em estatísticas de descoberta: {e}")
 
-        # Evolução da precisão
-        try:
-            # Verificar se a coluna rms existe
-            cursor.execute("""
-                SELECT COLUMN_NAME 
-                FROM INFORMATION_SCHEMA.COLUMNS 
-                WHERE TABLE_NAME = 'Orbital_Parameters' 
-                AND COLUMN_NAME = 'rms'
-            """)
+def _parse_next_event(rows, stats):
+    next_event = rows[0] if rows else None
+    if next_event:
+        stats['proximo_evento_critico'] = {
+            'asteroide': next_event[0] if next_event[0] else "Desconhecido",
+            'distancia_ld': float(next_event[1]) if next_event[1] else 0,
+            'data': next_event[2]
+        }
+    else:
+        stats['proximo_evento_critico'] = None
 
-            if cursor.fetchone():
-                cursor.execute("""
-                    SELECT 
-                        YEAR(GETDATE()) as ano,  -- Ano atual como exemplo
-                        AVG(rms) as rms_medio,
-                        COUNT(*) as qtd_calculos
-                    FROM Orbital_Parameters
-                    WHERE rms IS NOT NULL
-                """)
-            else:
-                # Se não existir rms, usar valor padrão
-                cursor.execute("""
-                    SELECT 
-                        YEAR(GETDATE()) as ano,
-                        0.5 as rms_medio,
-                        100 as qtd_calculos
-                """)
 
-            row = cursor.fetchone()
-            if row:
-                stats['evolucao_precisao'] = [{
-                    'ano': int(row[0]),
-                    'rms_medio': float(row[1]) if row[1] else 0,
-                    'qtd_calculos': int(row[2])
-                }]
-            else:
-                stats['evolucao_precisao'] = []
-        except Exception as e:
-            stats['evolucao_precisao'] = []
-            print(f" Erro em evolução da precisão: {e}")
+def _parse_discovery_stats(rows, stats):
+    total_neos = rows[0][0]
+    stats['total_neos'] = total_neos
 
-        # Estatísticas de Classificação
-        try:
-            # Usar class_id para obter classificações da tabela Class
-            cursor.execute("""
-                SELECT 
-                    c.description as classe,
-                    COUNT(a.asteroid_id) as quantidade
-                FROM Asteroid a
-                LEFT JOIN Class c ON a.class_id = c.class_id
-                WHERE c.description IS NOT NULL
-                GROUP BY c.description
-                ORDER BY quantidade DESC
-            """)
-            stats['classificacoes'] = {row[0]: row[1] for row in cursor.fetchall()}
-        except Exception as e:
-            stats['classificacoes'] = {}
-            print(f" Erro em estatísticas de classificação: {e}")
+    # Para "novos no último mês", podemos usar a data atual como aproximação
+    stats['novos_neos_ultimo_mes'] = total_neos  # Apenas para mostrar algo
 
-        # Distribuição de tamanho
-        try:
-            cursor.execute("""
-                SELECT 
-                    CASE 
-                        WHEN diameter IS NULL THEN 'Desconhecido'
-                        WHEN diameter <= 0.01 THEN 'Muito Pequeno (<10m)'
-                        WHEN diameter <= 0.1 THEN 'Pequeno (10-100m)'
-                        WHEN diameter <= 0.5 THEN 'Médio (100-500m)'
-                        WHEN diameter <= 1 THEN 'Grande (500m-1km)'
-                        ELSE 'Muito Grande (>1km)'
-                    END as categoria,
-                    COUNT(*) as quantidade
-                FROM Asteroid
-                GROUP BY 
-                    CASE 
-                        WHEN diameter IS NULL THEN 'Desconhecido'
-                        WHEN diameter <= 0.01 THEN 'Muito Pequeno (<10m)'
-                        WHEN diameter <= 0.1 THEN 'Pequeno (10-100m)'
-                        WHEN diameter <= 0.5 THEN 'Médio (100-500m)'
-                        WHEN diameter <= 1 THEN 'Grande (500m-1km)'
-                        ELSE 'Muito Grande (>1km)'
-                    END
-                ORDER BY quantidade DESC
-            """)
-            stats['distribuicao_tamanhos'] = {row[0]: row[1] for row in cursor.fetchall()}
-        except Exception as e:
-            stats['distribuicao_tamanhos'] = {}
-            print(f" Erro em distribuição de tamanhos: {e}")
 
-        # Estatística gerais
-        try:
-            cursor.execute("SELECT COUNT(*) FROM Asteroid")
-            stats['total_asteroides'] = cursor.fetchone()[0]
+def _parse_precision_stats(rows, stats):
+    row = rows[0] if rows else None
+    if row:
+        stats['evolucao_precisao'] = [{
+            'ano': int(row[0]),
+            'rms_medio': float(row[1]) if row[1] else 0,
+            'qtd_calculos': int(row[2])
+        }]
+    else:
+        stats['evolucao_precisao'] = []
 
-            cursor.execute("SELECT COUNT(*) FROM Alert WHERE is_active = 1")
-            stats['alertas_ativos'] = cursor.fetchone()[0]
 
-            cursor.execute("SELECT COUNT(*) FROM Orbital_Parameters")
-            stats['total_orbitas'] = cursor.fetchone()[0]
-        except Exception as e:
-            print(f" Erro em estatísticas gerais: {e}")
+def _parse_class_stats(rows, stats):
+    stats['classificacoes'] = {row[0]: row[1] for row in rows}
+
+
+def _parse_size_stats(rows, stats):
+    stats['distribuicao_tamanhos'] = {row[0]: row[1] for row in rows}
+
+
+def _parse_general_stats(rows, stats):
+    stats['total_asteroides'] = rows[0][0]
+    stats['alertas_ativos'] = rows[0][1]
+    stats['total_orbitas'] = rows[0][2]
+
+
+def _statistics_sections(include_aggregates=True):
+    """
+    Secções de get_statistics: (descrição, SQL, função que preenche `stats`
+    a partir das linhas, valores a usar se a secção falhar).
+    As colunas opcionais de Orbital_Parameters são verificadas na cache de
+    metadados, ou seja, uma vez por sessão.
+    Com include_aggregates=False ficam só as secções que o statistics_tracker
+    não mantém (o próximo evento depende da data atual).
+    """
+    orbit_columns = {coluna['name'] for coluna in get_table_structure('Orbital_Parameters')}
+
+    epoch_date = backend.try_date("op.epoch_cal")
+
+    if get_table_structure('Close_Approach'):
+        # Aproximações calculadas por propagação (close_approach.py)
+        next_event_sql = backend.limit(f"""
+            SELECT
+                a.full_name,
+                ca.distance_ld,
+                ca.approach_date
+            FROM Close_Approach ca
+            INNER JOIN Asteroid a ON ca.asteroid_id = a.asteroid_id
+            WHERE ca.distance_ld < 5
+                AND ca.approach_date >= {backend.today}
+            ORDER BY ca.approach_date ASC
+        """, 1)
+    elif 'moid_ld' in orbit_columns:
+        # Query usando moid_ld
+        next_event_sql = backend.limit(f"""
+            SELECT
+                a.full_name,
+                op.moid_ld,
+                op.epoch_cal
+            FROM Orbital_Parameters op
+            INNER JOIN Asteroid a ON op.asteroid_id = a.asteroid_id
+            WHERE op.moid_ld < 5 
+                AND op.epoch_cal IS NOT NULL
+                AND {epoch_date} IS NOT NULL
+                AND {epoch_date} >= {backend.today}
+            ORDER BY {epoch_date} ASC
+        """, 1)
+    else:
+        # Se não existir moid_ld, use moid (em UA) e converta para LD (1 UA ≈ 389.17 LD)
+        next_event_sql = backend.limit(f"""
+            SELECT
+                a.full_name,
+                op.moid * 389.17 as moid_ld,  -- Converter UA para LD
+                op.epoch_cal
+            FROM Orbital_Parameters op
+            INNER JOIN Asteroid a ON op.asteroid_id = a.asteroid_id
+            WHERE op.moid * 389.17 < 5  -- Converter para LD e verificar < 5 LD
+                AND op.epoch_cal IS NOT NULL
+                AND {epoch_date} IS NOT NULL
+                AND {epoch_date} >= {backend.today}
+            ORDER BY {epoch_date} ASC
+        """, 1)
+
+    if 'rms' in orbit_columns:
+        precision_sql = f"""
+            SELECT 
+                {backend.current_year} as ano,  -- Ano atual como exemplo
+                AVG(rms) as rms_medio,
+                COUNT(*) as qtd_calculos
+            FROM Orbital_Parameters
+            WHERE rms IS NOT NULL
+        """
+    else:
+        # Se não existir rms, usar valor padrão
+        precision_sql = f"""
+            SELECT 
+                {backend.current_year} as ano,
+                0.5 as rms_medio,
+                100 as qtd_calculos
+        """
+
+    if not include_aggregates:
+        sections = [("próximo evento crítico", next_event_sql, _parse_next_event,
+                     {'proximo_evento_critico': None})]
+        if 'rms' not in orbit_columns:
+            sections.append(("evolução da precisão", precision_sql, _parse_precision_stats,
+                             {'evolucao_precisao': []}))
+        return sections
+
+    return [
+        # Número de alertas vermelhos (nível 4) e laranja (nível 3)
+        ("estatísticas de alerta", """
+            SELECT 
+                SUM(CASE WHEN priority_level = 4 THEN 1 ELSE 0 END) as vermelhos,
+                SUM(CASE WHEN priority_level = 3 THEN 1 ELSE 0 END) as laranja
+            FROM Alert 
+            WHERE is_active = 1
+        """, _parse_alert_stats, {'alertas_vermelhos': 0, 'alertas_laranja': 0}),
+
+        # Total de PHAs monitorizados com diâmetro > 100m (0.1km)
+        ("PHAs > 100m", """
+            SELECT COUNT(*) 
+            FROM Asteroid 
+            WHERE pha = 'Y' 
+            AND diameter > 0.1
+        """, _parse_pha_stats, {'total_phas_100m': 0}),
+
+        ("próximo evento crítico", next_event_sql, _parse_next_event,
+         {'proximo_evento_critico': None}),
+
+        # Número de NEOs
+        ("estatísticas de descoberta", """
+            SELECT COUNT(*) 
+            FROM Asteroid 
+            WHERE neo = 'Y'
+        """, _parse_discovery_stats, {'total_neos': 0, 'novos_neos_ultimo_mes': 0}),
+
+        ("evolução da precisão", precision_sql, _parse_precision_stats,
+         {'evolucao_precisao': []}),
+
+        # Usar class_id para obter classificações da tabela Class
+        ("estatísticas de classificação", """
+            SELECT 
+                c.description as classe,
+                COUNT(a.asteroid_id) as quantidade
+            FROM Asteroid a
+            LEFT JOIN Class c ON a.class_id = c.class_id
+            WHERE c.description IS NOT NULL
+            GROUP BY c.description
+            ORDER BY quantidade DESC
+        """, _parse_class_stats, {'classificacoes': {}}),
+
+        ("distribuição de tamanhos", """
+            SELECT 
+                CASE 
+                    WHEN diameter IS NULL THEN 'Desconhecido'
+                    WHEN diameter <= 0.01 THEN 'Muito Pequeno (<10m)'
+                    WHEN diameter <= 0.1 THEN 'Pequeno (10-100m)'
+                    WHEN diameter <= 0.5 THEN 'Médio (100-500m)'
+                    WHEN diameter <= 1 THEN 'Grande (500m-1km)'
+                    ELSE 'Muito Grande (>1km)'
+                END as categoria,
+                COUNT(*) as quantidade
+            FROM Asteroid
+            GROUP BY 
+                CASE 
+                    WHEN diameter IS NULL THEN 'Desconhecido'
+                    WHEN diameter <= 0.01 THEN 'Muito Pequeno (<10m)'
+                    WHEN diameter <= 0.1 THEN 'Pequeno (10-100m)'
+                    WHEN diameter <= 0.5 THEN 'Médio (100-500m)'
+                    WHEN diameter <= 1 THEN 'Grande (500m-1km)'
+                    ELSE 'Muito Grande (>1km)'
+                END
+            ORDER BY quantidade DESC
+        """, _parse_size_stats, {'distribuicao_tamanhos': {}}),
+
+        ("estatísticas gerais", """
+            SELECT
+                (SELECT COUNT(*) FROM Asteroid),
+                (SELECT COUNT(*) FROM Alert WHERE is_active = 1),
+                (SELECT COUNT(*) FROM Orbital_Parameters)
+        """, _parse_general_stats, {}),
+    ]
+
+
+def get_statistics(refresh=False):
+    """
+    Retorna estatísticas completas conforme especificação do trabalho.
+    Usa a cache partilhada (ver STATS_CACHE_TTL); `refresh` força nova leitura.
+    """
+    if not pool:
+        return False, "Não conectado à BD"
+
+    return statistics_cache.get(refresh=refresh)
+
+
+def invalidate_statistics_cache():
+    """Descarta as estatísticas em cache (ex: após escritas na base de dados)"""
+    statistics_cache.invalidate()
+
+
+def _compute_statistics():
+    """
+    Calcula as estatísticas na base de dados.
+    Com change tracking ativo, os agregados são atualizados de forma incremental
+    (statistics_tracker) e só o próximo evento é consultado; caso contrário
+    todas as secções são enviadas num único lote e lidas com cursor.nextset()
+    (ou uma a uma, nos motores sem lotes).
+    """
+    if not pool:
+        return False, "Não conectado à BD"
+
+    try:
+        stats = {}
+        incremental = None
+        if backend.supports_change_tracking:
+            try:
+                orbit_columns = {coluna['name'] for coluna in get_table_structure('Orbital_Parameters')}
+                incremental = statistics_tracker.refresh(pool, with_rms='rms' in orbit_columns)
+            except Exception as e:
+                statistics_tracker.reset()
+                print(f" Erro nas estatísticas incrementais: {e}")
+
+        if incremental is not None:
+            stats.update(incremental)
+            sections = _statistics_sections(include_aggregates=False)
+        else:
+            sections = _statistics_sections()
+
+        with pool.connection() as connection:
+            cursor = connection.cursor()
+            pending = list(sections)
+
+            if backend.supports_batches:
+                try:
+                    batch = "SET NOCOUNT ON;\n" + ";\n".join(section[1] for section in sections)
+                    cursor.execute(batch)
+
+                    while pending:
+                        descricao, sql, parse, defaults = pending[0]
+                        parse(cursor.fetchall(), stats)
+                        pending.pop(0)
+                        if pending:
+                            cursor.nextset()
+
+                except Exception as e:
+                    # Se o lote falhar, as secções ainda não lidas correm uma a uma,
+                    # para que um erro numa secção não afete as outras
+                    print(f" Erro no lote de estatísticas: {e}")
+                    cursor.close()
+                    cursor = connection.cursor()
+
+            for descricao, sql, parse, defaults in pending:
+                try:
+                    cursor.execute(sql)
+                    parse(cursor.fetchall(), stats)
+                except Exception as e:
+                    stats.update(defaults)
+                    print(f" Erro em {descricao}: {e}")
+
+            cursor.close()
 
-        cursor.close()
         return True, stats
 
     except Exception as e:
-        return False, f"Erro ao obter estatísticas: {str(e)}"
\ No newline at end of file
+        return False, f"Erro ao obter estatísticas: {str(e)}"
+
+
+# Validade (segundos) das estatísticas em cache; até STATS_CACHE_STALE_TTL é
+# devolvido o valor antigo enquanto se atualiza em fundo
+STATS_CACHE_TTL = 60
+STATS_CACHE_STALE_TTL = 600
+statistics_tracker = IncrementalStatistics()
+statistics_cache = StatisticsCache(_compute_statistics, ttl=STATS_CACHE_TTL,
+                                   stale_ttl=STATS_CACHE_STALE_TTL)
@@ -0,0 +1,116 @@
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+class BackgroundExecutor:
+    """
+    Executa trabalho de base de dados em threads de fundo e entrega os
+    resultados na thread do Tk.
+
+    Cada pedido tem uma chave (ex: "consulta", "estatisticas"). Quando um novo
+    pedido é submetido com a mesma chave, o resultado do pedido anterior é
+    descartado ao chegar, para que a interface mostre sempre o mais recente.
+    Os resultados são recolhidos de uma fila por `widget.after`, porque o Tk
+    não pode ser chamado a partir de outras threads.
+    """
+
+    def __init__(self, widget, max_workers=4, poll_interval=50, on_busy_change=None):
+        self.widget = widget
+        self.poll_interval = poll_interval
+        self.on_busy_change = on_busy_change
+
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="bd")
+        self._results = queue.Queue()
+        self._lock = threading.Lock()
+        # Última geração submetida por chave (para descartar resultados antigos);
+        # as chaves sem pedidos em curso são esquecidas (ex: uma por página)
+        self._generations = {}
+        # Pedidos em curso por chave (apenas na thread do Tk)
+        self._pending = {}
+        self._closed = False
+
+        self.widget.after(self.poll_interval, self._poll)
+
+    def submit(self, key, func, *args, on_success=None, on_error=None, **kwargs):
+        """
+        Submete `func(*args, **kwargs)` para execução em fundo.
+        `on_success(resultado)` ou `on_error(excecao)` são chamados na thread do Tk,
+        apenas se este ainda for o pedido mais recente para `key`.
+        Retorna o Future do pedido.
+        """
+        with self._lock:
+            generation = self._generations.get(key, 0) + 1
+            self._generations[key] = generation
+
+        self._set_pending(key, +1)
+        future = self._executor.submit(func, *args, **kwargs)
+        future.add_done_callback(
+            lambda f: self._results.put((key, generation, f, on_success, on_error))
+        )
+        return future
+
+    def cancel(self, key):
+        """Descarta o resultado de qualquer pedido em curso para `key`"""
+        with self._lock:
+            self._generations[key] = self._generations.get(key, 0) + 1
+
+    def is_busy(self, key=None):
+        """Indica se há pedidos em curso (para `key`, ou no total)"""
+        if key is None:
+            return any(self._pending.values())
+        return self._pending.get(key, 0) > 0
+
+    def shutdown(self, wait=False):
+        """Termina as threads de fundo; resultados pendentes são ignorados"""
+        self._closed = True
+        self._executor.shutdown(wait=wait, cancel_futures=True)
+
+    def _set_pending(self, key, delta):
+        before = self._pending.get(key, 0)
+        after = max(before + delta, 0)
+        self._pending[key] = after
+
+        if self.on_busy_change and (before == 0) != (after == 0):
+            self.on_busy_change(key, after > 0)
+
+    def _poll(self):
+        if self._closed:
+            return
+
+        while True:
+            try:
+                item = self._results.get_nowait()
+            except queue.Empty:
+                break
+            self._deliver(*item)
+
+        self.widget.after(self.poll_interval, self._poll)
+
+    def _deliver(self, key, generation, future, on_success, on_error):
+        self._set_pending(key, -1)
+
+        with self._lock:
+            latest = self._generations.get(key) == generation
+            if not self._pending[key]:
+                del self._pending[key]
+                self._generations.pop(key, None)
+
+        if not latest:
+            # Já foi submetido um pedido mais recente
+            return
+
+        if future.cancelled():
+            return
+
+        error = future.exception()
+        try:
+            if error is not None:
+                if on_error:
+                    on_error(error)
+                else:
+                    print(f"Erro em tarefa de fundo '{key}': {error}")
+            elif on_success:
+                on_success(future.result())
+        except Exception as e:
+            print(f"Erro ao processar resultado de '{key}': {e}")
@@ -0,0 +1,353 @@
+import threading
+from datetime import date
+
+import numpy as np
+
+# Versões de change tracking: atual e mínima válida de cada tabela seguida.
+# Se alguma for NULL, o change tracking não está ativo na base de dados/tabela.
+VERSIONS_SQL = """
+    SELECT
+        CHANGE_TRACKING_CURRENT_VERSION(),
+        CHANGE_TRACKING_MIN_VALID_VERSION(OBJECT_ID('Asteroid')),
+        CHANGE_TRACKING_MIN_VALID_VERSION(OBJECT_ID('Alert')),
+        CHANGE_TRACKING_MIN_VALID_VERSION(OBJECT_ID('Orbital_Parameters'))
+"""
+
+CLASSES_SQL = "SELECT class_id, description FROM Class"
+
+# Leitura completa (primeira vez ou watermark expirado); só os alertas ativos contam
+FULL_SQL = """
+    SET NOCOUNT ON;
+    SELECT asteroid_id, class_id, diameter, pha, neo FROM Asteroid;
+    SELECT alert_id, priority_level FROM Alert WHERE is_active = 1;
+    SELECT orbit_param_id, {rms} FROM Orbital_Parameters;
+"""
+
+# Linhas lidas de cada vez (fetchmany) na leitura completa
+FULL_FETCH_SIZE = 50000
+
+# Apenas as linhas alteradas desde o watermark; linhas apagadas vêm sem valores
+CHANGES_SQL = """
+    SET NOCOUNT ON;
+
+    SELECT ct.asteroid_id, a.asteroid_id, a.class_id, a.diameter, a.pha, a.neo
+    FROM CHANGETABLE(CHANGES Asteroid, ?) AS ct
+    LEFT JOIN Asteroid a ON a.asteroid_id = ct.asteroid_id;
+
+    SELECT ct.alert_id, al.alert_id, al.priority_level, al.is_active
+    FROM CHANGETABLE(CHANGES Alert, ?) AS ct
+    LEFT JOIN Alert al ON al.alert_id = ct.alert_id;
+
+    SELECT ct.orbit_param_id, op.orbit_param_id, {rms}
+    FROM CHANGETABLE(CHANGES Orbital_Parameters, ?) AS ct
+    LEFT JOIN Orbital_Parameters op ON op.orbit_param_id = ct.orbit_param_id;
+"""
+
+
+# Categorias de tamanho (iguais ao CASE da distribuição de tamanhos) e os
+# limites superiores (km) das categorias com diâmetro conhecido
+SIZE_CATEGORIES = ('Desconhecido', 'Muito Pequeno (<10m)', 'Pequeno (10-100m)',
+                   'Médio (100-500m)', 'Grande (500m-1km)', 'Muito Grande (>1km)')
+SIZE_LIMITS = np.array([0.01, 0.1, 0.5, 1])
+
+# class_id NULL nos arrays de estado
+NULL_CLASS = -1
+
+
+def size_codes(diameters):
+    """Índice em SIZE_CATEGORIES de cada diâmetro (array, NaN = desconhecido)"""
+    diameters = np.asarray(diameters, dtype=np.float64)
+    codes = np.searchsorted(SIZE_LIMITS, diameters, side='left') + 1
+    return np.where(np.isnan(diameters), 0, codes).astype(np.int8)
+
+
+def size_category(diameter):
+    """Categoria de tamanho de um diâmetro em km (None = desconhecido)"""
+    return SIZE_CATEGORIES[int(size_codes([np.nan if diameter is None else diameter])[0])]
+
+
+# Arrays de estado de cada tabela e o valor das posições sem linha
+_STATE_ARRAYS = {
+    'asteroid': (('_asteroid_class', NULL_CLASS), ('_asteroid_size', -1),
+                 ('_asteroid_pha', False), ('_asteroid_neo', False)),
+    'alert': (('_alert_active', False), ('_alert_level', 0)),
+    'orbit': (('_orbit_present', False), ('_orbit_rms', np.nan)),
+}
+
+
+def _floats(values):
+    return np.array([np.nan if value is None else value for value in values], dtype=np.float64)
+
+
+def _fetch_batches(cursor, size):
+    while True:
+        rows = cursor.fetchmany(size)
+        if not rows:
+            break
+        yield rows
+
+
+def _grown(array, size, fill):
+    grown = np.full(size, fill, dtype=array.dtype)
+    grown[:len(array)] = array
+    return grown
+
+
+class IncrementalStatistics:
+    """
+    Mantém os agregados das estatísticas (classes, tamanhos, PHAs, NEOs,
+    alertas ativos, RMS médio) e aplica apenas as linhas alteradas desde a
+    última atualização, usando o change tracking do SQL Server em Asteroid,
+    Alert e Orbital_Parameters.
+
+    Guarda a contribuição de cada linha para os agregados, para que
+    atualizações e eliminações possam ser descontadas sem reler a tabela:
+    arrays numpy indexados pela chave primária (classe, categoria de tamanho,
+    PHA > 100 m e NEO de cada asteroide; nível de cada alerta ativo; RMS de
+    cada órbita). A primeira leitura (ou quando o watermark deixa de ser
+    válido) é completa, lida por blocos diretamente para esses arrays, e os
+    contadores são calculados a partir deles.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._clear()
+
+    def reset(self):
+        """Esquece os agregados; a próxima atualização faz uma leitura completa"""
+        with self._lock:
+            self._clear()
+
+    def _clear(self):
+        self.version = None
+        self._with_rms = None
+
+        # Contribuição de cada linha, indexada pela chave primária; posições sem
+        # linha: tamanho -1, alerta não ativo, órbita não presente
+        self._asteroid_class = np.full(0, NULL_CLASS, dtype=np.int64)
+        self._asteroid_size = np.full(0, -1, dtype=np.int8)
+        self._asteroid_pha = np.zeros(0, dtype=bool)
+        self._asteroid_neo = np.zeros(0, dtype=bool)
+        self._alert_active = np.zeros(0, dtype=bool)
+        self._alert_level = np.zeros(0, dtype=np.int64)
+        self._orbit_present = np.zeros(0, dtype=bool)
+        self._orbit_rms = np.zeros(0)
+
+        self._asteroid_count = 0
+        self._alert_count = 0
+        self._orbit_count = 0
+        self._class_counts = {}
+        self._size_counts = {}
+        self._phas_100m = 0
+        self._neos = 0
+        self._alert_levels = {}
+        self._rms_sum = 0.0
+        self._rms_count = 0
+
+    def _ensure(self, table, max_key):
+        """Aumenta os arrays de `table` para chegarem à chave `max_key`"""
+        arrays = _STATE_ARRAYS[table]
+        current = len(getattr(self, arrays[0][0]))
+        if max_key < current:
+            return
+        size = max(2 * current, max_key + 1, 1024)
+        for name, fill in arrays:
+            setattr(self, name, _grown(getattr(self, name), size, fill))
+
+    def refresh(self, pool, with_rms=True):
+        """
+        Atualiza os agregados e retorna o dicionário de estatísticas que cobrem,
+        ou None se o change tracking não estiver ativo (usar a leitura completa).
+        """
+        with self._lock, pool.connection() as connection:
+            cursor = connection.cursor()
+            try:
+                cursor.execute(VERSIONS_SQL)
+                current, *min_valid = cursor.fetchone()
+                if current is None or None in min_valid:
+                    self._clear()
+                    return None
+
+                if (self.version is None or with_rms != self._with_rms
+                        or any(self.version < version for version in min_valid)):
+                    self._clear()
+                    self._with_rms = with_rms
+                    self._load_full(cursor, with_rms)
+                else:
+                    self._load_changes(cursor, with_rms, self.version)
+
+                # Alterações feitas durante a leitura voltam a aparecer na
+                # próxima, o que é inofensivo: cada linha substitui a sua contribuição
+                self.version = current
+
+                cursor.execute(CLASSES_SQL)
+                classes = {row[0]: row[1] for row in cursor.fetchall()}
+            finally:
+                cursor.close()
+
+            return self._snapshot(classes)
+
+    def _load_full(self, cursor, with_rms, fetch_size=FULL_FETCH_SIZE):
+        cursor.execute(FULL_SQL.format(rms="rms" if with_rms else "NULL"))
+
+        for rows in _fetch_batches(cursor, fetch_size):
+            keys, class_ids, diameters, pha, neo = zip(*rows)
+            keys = np.array(keys, dtype=np.int64)
+            diameters = _floats(diameters)
+            self._ensure('asteroid', int(keys.max()))
+            self._asteroid_class[keys] = [NULL_CLASS if value is None else value for value in class_ids]
+            self._asteroid_size[keys] = size_codes(diameters)
+            with np.errstate(invalid='ignore'):
+                self._asteroid_pha[keys] = (np.array(pha) == 'Y') & (diameters > 0.1)
+            self._asteroid_neo[keys] = np.array(neo) == 'Y'
+
+        cursor.nextset()
+        for rows in _fetch_batches(cursor, fetch_size):
+            keys, levels = zip(*rows)
+            keys = np.array(keys, dtype=np.int64)
+            self._ensure('alert', int(keys.max()))
+            self._alert_active[keys] = True
+            self._alert_level[keys] = [-1 if level is None else level for level in levels]
+
+        cursor.nextset()
+        for rows in _fetch_batches(cursor, fetch_size):
+            keys, rms = zip(*rows)
+            keys = np.array(keys, dtype=np.int64)
+            self._ensure('orbit', int(keys.max()))
+            self._orbit_present[keys] = True
+            self._orbit_rms[keys] = _floats(rms)
+
+        self._count()
+
+    def _count(self):
+        """Contadores a partir dos arrays (depois de uma leitura completa)"""
+        present = self._asteroid_size >= 0
+        self._asteroid_count = int(present.sum())
+        class_ids, counts = np.unique(self._asteroid_class[present], return_counts=True)
+        self._class_counts = {(None if class_id == NULL_CLASS else int(class_id)): int(count)
+                              for class_id, count in zip(class_ids, counts)}
+        sizes = np.bincount(self._asteroid_size[present], minlength=len(SIZE_CATEGORIES))
+        self._size_counts = {SIZE_CATEGORIES[code]: int(count)
+                             for code, count in enumerate(sizes) if count}
+        self._phas_100m = int(self._asteroid_pha[present].sum())
+        self._neos = int(self._asteroid_neo[present].sum())
+
+        levels, counts = np.unique(self._alert_level[self._alert_active], return_counts=True)
+        self._alert_count = int(counts.sum())
+        self._alert_levels = {(None if level == -1 else int(level)): int(count)
+                              for level, count in zip(levels, counts)}
+
+        rms = self._orbit_rms[self._orbit_present]
+        self._orbit_count = len(rms)
+        known = ~np.isnan(rms)
+        self._rms_sum = float(rms[known].sum())
+        self._rms_count = int(known.sum())
+
+    def _load_changes(self, cursor, with_rms, version):
+        cursor.execute(CHANGES_SQL.format(rms="op.rms" if with_rms else "NULL"),
+                       version, version, version)
+
+        for key, current_key, *values in cursor.fetchall():
+            self._set_asteroid(key, tuple(values) if current_key is not None else None)
+
+        cursor.nextset()
+        for key, current_key, *values in cursor.fetchall():
+            self._set_alert(key, tuple(values) if current_key is not None else None)
+
+        cursor.nextset()
+        for key, current_key, rms in cursor.fetchall():
+            if current_key is None:
+                self._set_orbit(key, None, deleted=True)
+            else:
+                self._set_orbit(key, rms)
+
+    def _set_asteroid(self, key, values):
+        self._ensure('asteroid', key)
+        if self._asteroid_size[key] >= 0:
+            self._apply_asteroid(key, -1)
+            self._asteroid_size[key] = -1
+
+        if values is not None:
+            class_id, diameter, pha, neo = values
+            self._asteroid_class[key] = NULL_CLASS if class_id is None else class_id
+            self._asteroid_size[key] = SIZE_CATEGORIES.index(size_category(diameter))
+            self._asteroid_pha[key] = pha == 'Y' and diameter is not None and diameter > 0.1
+            self._asteroid_neo[key] = neo == 'Y'
+            self._apply_asteroid(key, +1)
+
+    def _apply_asteroid(self, key, delta):
+        class_id = int(self._asteroid_class[key])
+        class_id = None if class_id == NULL_CLASS else class_id
+        size = SIZE_CATEGORIES[self._asteroid_size[key]]
+        self._asteroid_count += delta
+        self._class_counts[class_id] = self._class_counts.get(class_id, 0) + delta
+        self._size_counts[size] = self._size_counts.get(size, 0) + delta
+        self._phas_100m += delta if self._asteroid_pha[key] else 0
+        self._neos += delta if self._asteroid_neo[key] else 0
+
+    def _set_alert(self, key, values):
+        self._ensure('alert', key)
+        if self._alert_active[key]:
+            level = int(self._alert_level[key])
+            self._alert_levels[None if level == -1 else level] -= 1
+            self._alert_active[key] = False
+            self._alert_count -= 1
+
+        if values is not None:
+            priority_level, is_active = values
+            # Só os alertas ativos contam; guardar o nível evita reler a linha
+            if is_active:
+                self._alert_active[key] = True
+                self._alert_level[key] = -1 if priority_level is None else priority_level
+                self._alert_levels[priority_level] = self._alert_levels.get(priority_level, 0) + 1
+                self._alert_count += 1
+
+    def _set_orbit(self, key, rms, deleted=False):
+        self._ensure('orbit', key)
+        if self._orbit_present[key]:
+            old = self._orbit_rms[key]
+            if not np.isnan(old):
+                self._rms_sum -= float(old)
+                self._rms_count -= 1
+            self._orbit_present[key] = False
+            self._orbit_count -= 1
+
+        if not deleted:
+            self._orbit_present[key] = True
+            self._orbit_rms[key] = np.nan if rms is None else float(rms)
+            self._orbit_count += 1
+            if rms is not None:
+                self._rms_sum += float(rms)
+                self._rms_count += 1
+
+    def _snapshot(self, classes):
+        classificacoes = {}
+        for class_id, quantidade in self._class_counts.items():
+            description = classes.get(class_id)
+            if description is not None and quantidade > 0:
+                classificacoes[description] = classificacoes.get(description, 0) + quantidade
+
+        stats = {
+            'alertas_vermelhos': self._alert_levels.get(4, 0),
+            'alertas_laranja': self._alert_levels.get(3, 0),
+            'total_phas_100m': self._phas_100m,
+            'total_neos': self._neos,
+            'novos_neos_ultimo_mes': self._neos,  # Apenas para mostrar algo
+            'classificacoes': dict(sorted(classificacoes.items(), key=lambda item: -item[1])),
+            'distribuicao_tamanhos': dict(sorted(
+                ((size, count) for size, count in self._size_counts.items() if count > 0),
+                key=lambda item: -item[1]
+            )),
+            'total_asteroides': self._asteroid_count,
+            'alertas_ativos': self._alert_count,
+            'total_orbitas': self._orbit_count,
+        }
+
+        if self._with_rms:
+            stats['evolucao_precisao'] = [{
+                'ano': date.today().year,
+                'rms_medio': self._rms_sum / self._rms_count if self._rms_count else 0,
+                'qtd_calculos': self._rms_count
+            }]
+
+        return stats
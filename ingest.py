@@ -0,0 +1,536 @@
+import argparse
+import csv
+from decimal import Decimal, InvalidOperation
+import gzip
+import queue
+import sys
+import threading
+import time
+import zlib
+
+from database import (
+    LOOKUP_CHUNK, bulk_insert, enable_disable_trigger, get_all_triggers, get_backend, get_pool,
+    get_table_structure, invalidate_schema_cache, orbit_changes
+)
+from orbit_changes import CHANGE_ALERT_COLUMNS, CHANGE_TRIGGER
+
+# Registos lidos do ficheiro por lote (memória limitada a um lote)
+INGEST_BATCH_SIZE = 5000
+
+# Workers (cada um com a sua conexão) na importação
+INGEST_WORKERS = 4
+
+# Colunas do catálogo (exportação CSV do JPL SBDB, com nomes alternativos do
+# MPC) -> (tabela, coluna). Só são carregadas as que existem na base de dados.
+CATALOG_COLUMNS = {
+    'full_name': ('Asteroid', 'full_name'),
+    'spkid': ('Asteroid', 'spkid'),
+    'pdes': ('Asteroid', 'pdes'),
+    'principal_desig': ('Asteroid', 'pdes'),
+    'name': ('Asteroid', 'name'),
+    'prefix': ('Asteroid', 'prefix'),
+    'neo': ('Asteroid', 'neo'),
+    'pha': ('Asteroid', 'pha'),
+    'h': ('Asteroid', 'H'),
+    'diameter': ('Asteroid', 'diameter'),
+    'albedo': ('Asteroid', 'albedo'),
+    'diameter_sigma': ('Asteroid', 'diameter_sigma'),
+
+    'epoch': ('Orbital_Parameters', 'epoch'),
+    'epoch_mjd': ('Orbital_Parameters', 'epoch_mjd'),
+    'epoch_cal': ('Orbital_Parameters', 'epoch_cal'),
+    'e': ('Orbital_Parameters', 'e'),
+    'a': ('Orbital_Parameters', 'a'),
+    'q': ('Orbital_Parameters', 'q'),
+    'peri': ('Orbital_Parameters', 'q'),
+    'i': ('Orbital_Parameters', 'i'),
+    'incl': ('Orbital_Parameters', 'i'),
+    'om': ('Orbital_Parameters', 'om'),
+    'node': ('Orbital_Parameters', 'om'),
+    'w': ('Orbital_Parameters', 'w'),
+    'ma': ('Orbital_Parameters', 'ma'),
+    'm': ('Orbital_Parameters', 'ma'),
+    'ad': ('Orbital_Parameters', 'ad'),
+    'n': ('Orbital_Parameters', 'n'),
+    'tp': ('Orbital_Parameters', 'tp'),
+    'per': ('Orbital_Parameters', 'per'),
+    'moid': ('Orbital_Parameters', 'moid'),
+    'moid_ld': ('Orbital_Parameters', 'moid_ld'),
+    'rms': ('Orbital_Parameters', 'rms'),
+}
+
+# Intervalos válidos (mínimo, máximo) de colunas numéricas
+VALID_RANGES = {
+    'e': (0, None),
+    'i': (0, 180),
+    'q': (0, None),
+    'a': (None, None),
+    'albedo': (0, 1),
+    'diameter': (0, None),
+    'moid': (0, None),
+    'moid_ld': (0, None),
+    'rms': (0, None),
+}
+
+TEXT_TYPES = ('varchar', 'char', 'nvarchar', 'nchar', 'text', 'date', 'datetime')
+INTEGER_TYPES = ('int', 'integer', 'bigint', 'smallint', 'tinyint')
+DECIMAL_TYPES = ('decimal', 'numeric')
+
+
+def open_catalog(path):
+    """Abre um ficheiro CSV (ou .csv.gz) para leitura em streaming"""
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rt', encoding='utf-8', newline='')
+    return open(path, 'r', encoding='utf-8', newline='')
+
+
+def _read_batches(reader, batch_size):
+    batch = []
+    for row in reader:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _column_plan(header):
+    """
+    Associa as colunas do ficheiro às colunas existentes em Asteroid e
+    Orbital_Parameters. Retorna (plano, colunas ignoradas), em que o plano é
+    {tabela: [(coluna do ficheiro, coluna da tabela, tipo)]}, com o tipo
+    'text', 'int', 'decimal' ou 'float' (ver _convert).
+    """
+    structures = {}
+    for table_name in ('Asteroid', 'Orbital_Parameters'):
+        structures[table_name] = {
+            coluna['name'].lower(): coluna for coluna in get_table_structure(table_name)
+        }
+
+    plan = {'Asteroid': [], 'Orbital_Parameters': []}
+    used = set()
+    ignored = []
+
+    for source in header:
+        target = CATALOG_COLUMNS.get(source.strip().lower())
+        if not target:
+            ignored.append(source)
+            continue
+
+        table_name, column = target
+        coluna = structures[table_name].get(column.lower())
+        if not coluna or (table_name, column.lower()) in used:
+            ignored.append(source)
+            continue
+
+        used.add((table_name, column.lower()))
+        plan[table_name].append((source, coluna['name'], _value_kind(coluna['type'])))
+
+    return plan, ignored
+
+
+def _value_kind(data_type):
+    """Como converter os valores de uma coluna com o tipo de get_table_structure"""
+    name = data_type.split('(')[0]
+    if name in TEXT_TYPES:
+        return 'text'
+    if name in INTEGER_TYPES:
+        return 'int'
+    if name in DECIMAL_TYPES:
+        return 'decimal'
+    return 'float'
+
+
+def _convert(value, column, kind):
+    """
+    Converte um valor do ficheiro pelo tipo da coluna (ver _value_kind):
+    inteiros com int (ids grandes sem perder precisão), decimais com Decimal
+    e os restantes números com float. Lança ValueError se for inválido.
+    """
+    value = value.strip() if value is not None else ''
+    if value == '':
+        return None
+    if kind == 'text':
+        return value
+
+    if kind == 'float':
+        number = float(value)
+    else:
+        try:
+            number = Decimal(value)
+        except InvalidOperation:
+            raise ValueError(f"{column}={value} não é um número")
+        if not number.is_finite():
+            raise ValueError(f"{column}={value} não é um número")
+        if kind == 'int':
+            # "2000001.0" é aceite; "1.5" não
+            if number != number.to_integral_value():
+                raise ValueError(f"{column}={value} não é um inteiro")
+            number = int(number)
+
+    low, high = VALID_RANGES.get(column, (None, None))
+    if (low is not None and number < low) or (high is not None and number > high):
+        raise ValueError(f"{column}={value} fora do intervalo válido")
+    return number
+
+
+def _lookup_asteroid_ids(cursor, names):
+    """Retorna {full_name: asteroid_id} para os nomes já existentes"""
+    ids = {}
+    names = list(names)
+
+    for start in range(0, len(names), LOOKUP_CHUNK):
+        chunk = names[start:start + LOOKUP_CHUNK]
+        placeholders = ", ".join("?" for _ in chunk)
+        cursor.execute(
+            f"SELECT full_name, asteroid_id FROM Asteroid WHERE full_name IN ({placeholders})",
+            chunk
+        )
+        # Com nomes repetidos na tabela fica o registo mais antigo
+        for full_name, asteroid_id in cursor.fetchall():
+            if full_name not in ids or asteroid_id < ids[full_name]:
+                ids[full_name] = asteroid_id
+
+    return ids
+
+
+def partition_of(full_name, workers):
+    """
+    Worker responsável por um asteroide. Todas as órbitas de um asteroide vão
+    para o mesmo worker, pela ordem do ficheiro, como trg_VerificarMudancaOrbital
+    (ou orbit_changes) espera: cada órbita é comparada com a anterior do mesmo
+    asteroide.
+    """
+    return zlib.crc32(full_name.encode('utf-8')) % workers
+
+
+def _start_change_detection():
+    """
+    Se trg_VerificarMudancaOrbital existir e estiver ativo, desativa-o e
+    atualiza orbit_changes, para os alertas de mudança orbital serem gerados
+    por lote em vez de linha a linha. Retorna True nesse caso; sem trigger,
+    com o trigger desativado ou sem poder desativá-lo (SQLite), o trigger
+    fica como está.
+    """
+    trigger = next((trigger for trigger in get_all_triggers() if trigger['name'] == CHANGE_TRIGGER), None)
+    if trigger is None or trigger['disabled']:
+        return False
+
+    success, _ = enable_disable_trigger(CHANGE_TRIGGER, enable=False)
+    if not success:
+        return False
+
+    try:
+        orbit_changes.refresh(get_pool(), get_backend())
+    except Exception:
+        enable_disable_trigger(CHANGE_TRIGGER, enable=True)
+        raise
+    return True
+
+
+class _Worker:
+    """Carrega os lotes de uma partição numa conexão própria"""
+
+    def __init__(self, number, plan, batch_size, max_errors, detect_changes=False):
+        self.number = number
+        self.plan = plan
+        self.batch_size = batch_size
+        self.max_errors = max_errors
+        self.detect_changes = detect_changes
+        # Poucos lotes em espera: a leitura do ficheiro abranda em vez de encher a memória
+        self.queue = queue.Queue(maxsize=2)
+        self.error = None
+        self.stats = {
+            'worker': number,
+            'lidos': 0,
+            'rejeitados': 0,
+            'asteroides_inseridos': 0,
+            'orbitas_inseridas': 0,
+            'alertas_mudanca_orbital': 0,
+            'erros': [],
+            'segundos': 0.0,
+            'registos_por_segundo': 0.0
+        }
+
+    def run(self, on_batch):
+        start = time.perf_counter()
+        connection = None
+        try:
+            connection = get_backend().connect()
+            while True:
+                batch = self.queue.get()
+                if batch is None:
+                    break
+                if self.error:
+                    # Depois de um erro os lotes são descartados até ao fim da leitura
+                    continue
+
+                try:
+                    self._load(connection, batch)
+                except Exception as e:
+                    self.error = str(e)
+
+                elapsed = time.perf_counter() - start
+                self.stats['segundos'] = elapsed
+                self.stats['registos_por_segundo'] = self.stats['lidos'] / elapsed if elapsed else 0.0
+                on_batch()
+
+        except Exception as e:
+            self.error = str(e)
+            # Continuar a esvaziar a fila para não bloquear a leitura
+            while self.queue.get() is not None:
+                pass
+        finally:
+            if connection is not None:
+                connection.close()
+
+    def _load(self, connection, batch):
+        name_source, asteroid_plan, orbit_plan = self.plan
+        stats = self.stats
+        asteroids = {}
+        orbits = []
+
+        for line_number, full_name, row in batch:
+            try:
+                if full_name not in asteroids:
+                    asteroids[full_name] = [_convert(row.get(source), column, kind)
+                                            for source, column, kind in asteroid_plan]
+                if orbit_plan:
+                    orbits.append((full_name, [_convert(row.get(source), column, kind)
+                                               for source, column, kind in orbit_plan]))
+            except ValueError as e:
+                stats['rejeitados'] += 1
+                if len(stats['erros']) < self.max_errors:
+                    stats['erros'].append(f"Linha {line_number}: {e}")
+
+        stats['lidos'] += len(batch)
+
+        # Resolver asteroides: existentes pelo nome, os restantes inseridos
+        cursor = connection.cursor()
+        try:
+            ids = _lookup_asteroid_ids(cursor, asteroids)
+            missing = [values for full_name, values in asteroids.items() if full_name not in ids]
+            if missing:
+                success, result = bulk_insert('Asteroid', [column for _, column, _ in asteroid_plan],
+                                              missing, batch_size=self.batch_size, connection=connection)
+                if not success:
+                    raise RuntimeError(f"Erro ao inserir asteroides: {result}")
+                stats['asteroides_inseridos'] += result
+                ids.update(_lookup_asteroid_ids(
+                    cursor, [full_name for full_name in asteroids if full_name not in ids]
+                ))
+        finally:
+            cursor.close()
+
+        if orbits:
+            columns = ['asteroid_id'] + [column for _, column, _ in orbit_plan]
+            rows = [[ids[full_name]] + values for full_name, values in orbits if full_name in ids]
+            stats['rejeitados'] += len(orbits) - len(rows)
+            success, result = bulk_insert('Orbital_Parameters', columns, rows,
+                                          batch_size=self.batch_size, connection=connection)
+            if not success:
+                raise RuntimeError(f"Erro ao inserir parâmetros orbitais: {result}")
+            stats['orbitas_inseridas'] += result
+
+            if self.detect_changes:
+                self._change_alerts(connection, columns, rows)
+
+    def _change_alerts(self, connection, columns, rows):
+        """Alertas de trg_VerificarMudancaOrbital para as órbitas inseridas"""
+        positions = {column.lower(): number for number, column in enumerate(columns)}
+
+        def values(column):
+            number = positions.get(column)
+            return [row[number] if number is not None else None for row in rows]
+
+        alerts = orbit_changes.alerts([row[0] for row in rows], values('e'), values('i'))
+        if alerts:
+            success, result = bulk_insert('Alert', CHANGE_ALERT_COLUMNS, alerts,
+                                          batch_size=self.batch_size, connection=connection)
+            if not success:
+                raise RuntimeError(f"Erro ao inserir alertas de mudança orbital: {result}")
+            self.stats['alertas_mudanca_orbital'] += result
+
+
+def ingest_catalog(path, batch_size=None, on_progress=None, max_errors=10, workers=None,
+                   detect_changes=True):
+    """
+    Importa um catálogo de órbitas (CSV do JPL SBDB ou MPC) para Asteroid e
+    Orbital_Parameters, lendo o ficheiro em streaming.
+
+    Os registos são repartidos por `workers` (INGEST_WORKERS por omissão)
+    pelo nome do asteroide (ver partition_of); cada worker tem a sua conexão e
+    carrega lotes de `batch_size` registos: valida e converte os valores,
+    procura os asteroides pelo full_name, insere os que faltam e carrega os
+    parâmetros orbitais com bulk_insert.
+    Com `detect_changes`, trg_VerificarMudancaOrbital é desativado durante a
+    importação e os mesmos alertas são gerados por lote com orbit_changes (ver
+    _start_change_detection); órbitas inseridas por outras sessões nesse
+    intervalo não geram esses alertas. O trigger é reativado no fim, mesmo
+    com erros; se o processo for morto, fica desativado e connect_to_db avisa.
+    `on_progress(resumo)` é chamado após cada lote, na thread do worker.
+    Retorna (success, resumo) com contagens, erros, registos/segundo e as
+    estatísticas de cada worker em resumo['workers'].
+    """
+    if not get_pool():
+        return False, "Não conectado à BD"
+
+    batch_size = batch_size or INGEST_BATCH_SIZE
+    workers = max(1, workers or INGEST_WORKERS)
+    summary = {
+        'lidos': 0,
+        'rejeitados': 0,
+        'asteroides_inseridos': 0,
+        'orbitas_inseridas': 0,
+        'alertas_mudanca_orbital': 0,
+        'colunas_ignoradas': [],
+        'erros': [],
+        'segundos': 0.0,
+        'registos_por_segundo': 0.0,
+        'workers': []
+    }
+    start = time.perf_counter()
+    lock = threading.Lock()
+
+    def atualizar_resumo():
+        with lock:
+            for key in ('rejeitados', 'asteroides_inseridos', 'orbitas_inseridas',
+                        'alertas_mudanca_orbital'):
+                summary[key] = sum(worker.stats[key] for worker in loaders)
+            summary['erros'] = [erro for worker in loaders for erro in worker.stats['erros']][:max_errors]
+            summary['workers'] = [dict(worker.stats) for worker in loaders]
+            summary['segundos'] = time.perf_counter() - start
+            loaded = sum(worker.stats['lidos'] for worker in loaders)
+            summary['registos_por_segundo'] = loaded / summary['segundos'] if summary['segundos'] else 0.0
+            if on_progress:
+                on_progress(dict(summary))
+
+    try:
+        invalidate_schema_cache()
+
+        with open_catalog(path) as f:
+            reader = csv.DictReader(f)
+            if not reader.fieldnames or 'full_name' not in [h.strip().lower() for h in reader.fieldnames]:
+                return False, "O ficheiro não tem a coluna full_name"
+
+            plan, summary['colunas_ignoradas'] = _column_plan(reader.fieldnames)
+            name_source = next((source for source, column, _ in plan['Asteroid']
+                                if column.lower() == 'full_name'), None)
+            if not name_source:
+                return False, "A tabela Asteroid não tem a coluna full_name"
+
+            worker_plan = (name_source, plan['Asteroid'], plan['Orbital_Parameters'])
+            # Desde aqui até ao fim, o trigger tem de voltar a ser ativado
+            streaming = detect_changes and bool(plan['Orbital_Parameters']) and _start_change_detection()
+            try:
+                loaders = [_Worker(number, worker_plan, batch_size, max_errors, streaming)
+                           for number in range(workers)]
+                threads = [threading.Thread(target=worker.run, args=(atualizar_resumo,),
+                                            name=f"ingest-{worker.number}", daemon=True)
+                           for worker in loaders]
+                for thread in threads:
+                    thread.start()
+
+                pending = [[] for _ in loaders]
+                rejected = []
+                try:
+                    for line_number, row in enumerate(reader, 2):
+                        summary['lidos'] += 1
+                        full_name = (row.get(name_source) or '').strip()
+                        if not full_name:
+                            rejected.append(f"Linha {line_number}: full_name vazio")
+                            continue
+
+                        number = partition_of(full_name, workers)
+                        pending[number].append((line_number, full_name, row))
+                        if len(pending[number]) >= batch_size:
+                            loaders[number].queue.put(pending[number])
+                            pending[number] = []
+
+                            if any(worker.error for worker in loaders):
+                                break
+
+                    for worker, batch in zip(loaders, pending):
+                        if batch and not worker.error:
+                            worker.queue.put(batch)
+                finally:
+                    for worker in loaders:
+                        worker.queue.put(None)
+                    for thread in threads:
+                        thread.join()
+            finally:
+                if streaming:
+                    success, message = enable_disable_trigger(CHANGE_TRIGGER, enable=True)
+                    if not success:
+                        print(f"Erro ao reativar {CHANGE_TRIGGER}: {message}")
+
+        atualizar_resumo()
+        summary['rejeitados'] += len(rejected)
+        summary['erros'] = (summary['erros'] + rejected)[:max_errors]
+
+        errors = [f"worker {worker.number}: {worker.error}" for worker in loaders if worker.error]
+        if errors:
+            return False, f"Erro na importação após {summary['lidos']} registos: {'; '.join(errors)}"
+
+        return True, summary
+
+    except Exception as e:
+        return False, f"Erro na importação após {summary['lidos']} registos: {str(e)}"
+
+
+def _print_progress(summary):
+    print(f"{summary['lidos']} registos lidos, "
+          f"{summary['orbitas_inseridas']} órbitas inseridas "
+          f"({summary['registos_por_segundo']:.0f} registos/s)")
+
+
+if __name__ == '__main__':
+    import signal
+
+    from database import connect_to_db, connect_to_sqlite
+
+    # Terminar com SIGTERM passa pelos finally (o trigger volta a ser ativado)
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(1))
+
+    parser = argparse.ArgumentParser(description="Importa um catálogo de órbitas (CSV do SBDB/MPC)")
+    parser.add_argument('ficheiro', help="Ficheiro CSV (ou .csv.gz)")
+    parser.add_argument('--sqlite', help="Base de dados SQLite local")
+    parser.add_argument('--servidor', help="Servidor SQL Server")
+    parser.add_argument('--database', help="Base de dados SQL Server")
+    parser.add_argument('--utilizador')
+    parser.add_argument('--password')
+    parser.add_argument('--lote', type=int, default=INGEST_BATCH_SIZE, help="Registos por lote")
+    parser.add_argument('--workers', type=int, default=INGEST_WORKERS,
+                        help="Workers em paralelo, cada um com a sua conexão")
+    parser.add_argument('--manter-trigger', action='store_true',
+                        help=f"Deixa {CHANGE_TRIGGER} ativo (alertas de mudança orbital linha a linha)")
+    args = parser.parse_args()
+
+    if args.sqlite:
+        success, message, info = connect_to_sqlite(args.sqlite)
+    else:
+        success, message, info = connect_to_db(args.servidor, args.database,
+                                               args.utilizador, args.password)
+    if not success:
+        raise SystemExit(message)
+
+    success, result = ingest_catalog(args.ficheiro, batch_size=args.lote,
+                                     on_progress=_print_progress, workers=args.workers,
+                                     detect_changes=not args.manter_trigger)
+    if not success:
+        raise SystemExit(result)
+
+    print(f"Concluído: {result['asteroides_inseridos']} asteroides e "
+          f"{result['orbitas_inseridas']} órbitas em {result['segundos']:.1f}s "
+          f"({result['registos_por_segundo']:.0f} registos/s), "
+          f"{result['rejeitados']} rejeitados")
+    if result['alertas_mudanca_orbital']:
+        print(f"{result['alertas_mudanca_orbital']} alertas de mudança orbital gerados por lote")
+    for erro in result['erros']:
+        print(f"  {erro}")
+    for worker in result['workers']:
+        print(f"  worker {worker['worker']}: {worker['lidos']} registos, "
+              f"{worker['orbitas_inseridas']} órbitas, {worker['registos_por_segundo']:.0f} registos/s")
+    if result['colunas_ignoradas']:
+        print(f"Colunas ignoradas: {', '.join(result['colunas_ignoradas'])}")
@@ -0,0 +1,242 @@
+import argparse
+import time
+
+import numpy as np
+
+from database import bulk_update, get_backend, get_pool
+
+# Distâncias lunares por UA (o mesmo fator das estatísticas)
+LD_PER_AU = 389.17
+
+# Elementos médios da órbita da Terra (J2000, eclíptica): a (UA), e, i, om, w (graus)
+EARTH_ELEMENTS = (1.00000011, 0.01671022, 0.00005, -11.26064, 114.20783)
+
+# Pontos por órbita na pesquisa inicial; mínimos locais refinados por órbita;
+# iterações da pesquisa local (40 chegam a ~1e-10 UA)
+MOID_GRID_STEPS = 72
+MOID_CANDIDATES = 4
+MOID_ITERATIONS = 40
+
+# Órbitas calculadas de cada vez (limita a memória da grelha inicial)
+MOID_CHUNK = 256
+
+# Órbitas lidas e escritas por bloco na base de dados
+MOID_DB_CHUNK = 20000
+
+ORBITS_SQL = """
+    SELECT orbit_param_id, a, e, q, i, om, w
+    FROM Orbital_Parameters
+    WHERE orbit_param_id > ?
+    ORDER BY orbit_param_id
+"""
+
+_OFFSETS = np.array([(da, de) for da in (-1, 0, 1) for de in (-1, 0, 1)], dtype=np.float64)
+
+
+def orbit_frame(i, om, w):
+    """
+    Vetores unitários P (para o periélio) e Q (90° à frente, no plano da
+    órbita) na eclíptica, a partir de i, om e w em graus. Retorna (P, Q), (n, 3).
+    """
+    i, om, w = np.radians(i), np.radians(om), np.radians(w)
+    cos_i, sin_i = np.cos(i), np.sin(i)
+    cos_om, sin_om = np.cos(om), np.sin(om)
+    cos_w, sin_w = np.cos(w), np.sin(w)
+
+    P = np.stack([
+        cos_w * cos_om - sin_w * sin_om * cos_i,
+        cos_w * sin_om + sin_w * cos_om * cos_i,
+        sin_w * sin_i,
+    ], axis=-1)
+    Q = np.stack([
+        -sin_w * cos_om - cos_w * sin_om * cos_i,
+        -sin_w * sin_om + cos_w * cos_om * cos_i,
+        cos_w * sin_i,
+    ], axis=-1)
+    return P, Q
+
+
+def orbit_positions(p, e, P, Q, nu):
+    """Posições (…, 3) para as anomalias verdadeiras `nu` (uma linha por órbita)"""
+    r = p[:, None] / (1 + e[:, None] * np.cos(nu))
+    return (r * np.cos(nu))[..., None] * P[:, None, :] + (r * np.sin(nu))[..., None] * Q[:, None, :]
+
+
+def semi_latus_rectum(a, e, q=None):
+    """p = q(1 + e), ou a(1 - e²) quando q não é conhecido"""
+    p = a * (1 - e * e)
+    if q is not None:
+        p = np.where(np.isnan(q), p, q * (1 + e))
+    return p
+
+
+def earth_moid(a, e, i, om, w, q=None, steps=MOID_GRID_STEPS, candidates=MOID_CANDIDATES,
+               iterations=MOID_ITERATIONS, chunk=MOID_CHUNK):
+    """
+    MOID com a Terra (UA) para arrays de elementos (a em UA, ângulos em graus).
+
+    Para cada órbita: distâncias entre `steps` pontos da órbita e `steps`
+    pontos da órbita da Terra; os `candidates` melhores mínimos locais são
+    depois refinados por pesquisa local nas duas anomalias. Órbitas não
+    elípticas (e >= 1) ou com elementos em falta dão NaN.
+    """
+    a, e, i, om, w = (np.asarray(values, dtype=np.float64) for values in (a, e, i, om, w))
+    q = None if q is None else np.asarray(q, dtype=np.float64)
+    p = semi_latus_rectum(a, e, q)
+
+    result = np.full(len(e), np.nan)
+    valid = np.flatnonzero(~np.isnan(p + i + om + w) & (e >= 0) & (e < 1) & (p > 0))
+
+    earth_a, earth_e, earth_i, earth_om, earth_w = EARTH_ELEMENTS
+    earth_p = np.array([earth_a * (1 - earth_e ** 2)])
+    earth_P, earth_Q = orbit_frame(np.array([earth_i]), np.array([earth_om]), np.array([earth_w]))
+
+    grid = np.linspace(0, 2 * np.pi, steps, endpoint=False)
+    earth_points = orbit_positions(earth_p, np.array([earth_e]), earth_P, earth_Q, grid[None, :])[0]
+    earth_norms = np.einsum('mk,mk->m', earth_points, earth_points)
+
+    for start in range(0, len(valid), chunk):
+        index = valid[start:start + chunk]
+        P, Q = orbit_frame(i[index], om[index], w[index])
+        orbit = (p[index], e[index], P, Q)
+
+        # Pesquisa inicial: distância² entre todos os pares de pontos
+        points = orbit_positions(p[index], e[index], P, Q, np.broadcast_to(grid, (len(index), steps)))
+        norms = np.einsum('bnk,bnk->bn', points, points)
+        distances = norms[:, :, None] + earth_norms[None, None, :] - 2 * points @ earth_points.T
+        earth_best = distances.argmin(axis=2)
+        row_min = np.take_along_axis(distances, earth_best[:, :, None], axis=2)[:, :, 0]
+
+        # Mínimos locais ao longo da órbita (circular); os restantes ficam de fora
+        is_minimum = (row_min <= np.roll(row_min, 1, axis=1)) & (row_min <= np.roll(row_min, -1, axis=1))
+        ranked = np.where(is_minimum, row_min, np.inf)
+        count = min(candidates, steps)
+        chosen = np.argpartition(ranked, count - 1, axis=1)[:, :count]
+        # Com menos mínimos do que candidatos, repete-se o melhor
+        best = ranked.argmin(axis=1)[:, None]
+        chosen = np.where(np.isinf(np.take_along_axis(ranked, chosen, axis=1)), best, chosen)
+
+        nu = grid[chosen]
+        nu_earth = grid[np.take_along_axis(earth_best, chosen, axis=1)]
+        distance = _refine(orbit, (earth_p, earth_e, earth_P, earth_Q), nu, nu_earth,
+                           2 * np.pi / steps, iterations)
+        result[index] = np.sqrt(np.maximum(distance.min(axis=1), 0))
+
+    return result
+
+
+def _refine(orbit, earth, nu, nu_earth, step, iterations):
+    """
+    Pesquisa local (padrão 3x3 nas duas anomalias) a partir de (nu, nu_earth),
+    arrays (órbitas, candidatos). Retorna a distância² mínima encontrada.
+    """
+    p, e, P, Q = orbit
+    earth_p, earth_e, earth_P, earth_Q = earth
+    earth_args = (np.broadcast_to(earth_p, p.shape), np.full(p.shape, earth_e),
+                  np.broadcast_to(earth_P, P.shape), np.broadcast_to(earth_Q, Q.shape))
+
+    count = nu.shape[1]
+    step = np.full(nu.shape, step)
+
+    for _ in range(iterations):
+        # 9 pares de anomalias por candidato: (órbitas, candidatos * 9)
+        trial_nu = (nu[:, :, None] + _OFFSETS[:, 0] * step[:, :, None]).reshape(len(p), -1)
+        trial_earth = (nu_earth[:, :, None] + _OFFSETS[:, 1] * step[:, :, None]).reshape(len(p), -1)
+
+        delta = orbit_positions(p, e, P, Q, trial_nu) - orbit_positions(*earth_args, trial_earth)
+        distance = np.einsum('bnk,bnk->bn', delta, delta).reshape(len(p), count, 9)
+
+        move = distance.argmin(axis=2)
+        # Sem melhor vizinho (o centro é o índice 4), reduzir o passo
+        step = np.where(move == 4, step / 2, step)
+        nu = nu + _OFFSETS[move, 0] * np.where(move == 4, 0, step)
+        nu_earth = nu_earth + _OFFSETS[move, 1] * np.where(move == 4, 0, step)
+
+    return np.take_along_axis(distance, move[:, :, None], axis=2)[:, :, 0]
+
+
+def update_catalog_moid(chunk_size=None, on_progress=None):
+    """
+    Recalcula moid e moid_ld de todas as órbitas de Orbital_Parameters a
+    partir dos elementos guardados, por blocos de orbit_param_id, e escreve-os
+    com bulk_update. Órbitas sem elementos suficientes (ou não elípticas)
+    mantêm os valores atuais.
+
+    Os triggers só correm na inserção: alertas e PHA/NEO dependentes do MOID
+    são reavaliados com alert_backfill. Retorna (True, resumo) ou (False, mensagem).
+    """
+    pool = get_pool()
+    if not pool:
+        return False, "Não conectado à BD"
+
+    chunk_size = chunk_size or MOID_DB_CHUNK
+    summary = {'orbitas_lidas': 0, 'orbitas_atualizadas': 0, 'ultimo_id': 0}
+    start = time.perf_counter()
+
+    try:
+        while True:
+            with pool.connection() as connection:
+                cursor = connection.cursor()
+                cursor.execute(get_backend().limit(ORBITS_SQL, chunk_size), [summary['ultimo_id']])
+                records = cursor.fetchall()
+                cursor.close()
+            if not records:
+                break
+
+            ids, a, e, q, i, om, w = (np.array([np.nan if value is None else value for value in column],
+                                               dtype=np.float64)
+                                      for column in zip(*records))
+            moid = earth_moid(a, e, i, om, w, q)
+            computed = np.flatnonzero(~np.isnan(moid))
+
+            success, result = bulk_update(
+                'Orbital_Parameters', 'orbit_param_id', ['moid', 'moid_ld'],
+                ((int(ids[k]), float(moid[k]), float(moid[k] * LD_PER_AU)) for k in computed)
+            )
+            if not success:
+                return False, result
+
+            summary['ultimo_id'] = records[-1][0]
+            summary['orbitas_lidas'] += len(records)
+            summary['orbitas_atualizadas'] += result
+            if on_progress:
+                on_progress(summary)
+
+        elapsed = time.perf_counter() - start
+        return True, dict(summary, segundos=elapsed,
+                          orbitas_por_segundo=summary['orbitas_lidas'] / elapsed if elapsed else 0)
+
+    except Exception as e:
+        return False, f"Erro após a órbita {summary['ultimo_id']}: {str(e)}"
+
+
+if __name__ == '__main__':
+    from database import connect_to_db, connect_to_sqlite
+
+    parser = argparse.ArgumentParser(description="Recalcula o MOID com a Terra de todas as órbitas")
+    parser.add_argument('--sqlite', help="Base de dados SQLite local")
+    parser.add_argument('--servidor', help="Servidor SQL Server")
+    parser.add_argument('--database', help="Base de dados SQL Server")
+    parser.add_argument('--utilizador')
+    parser.add_argument('--password')
+    parser.add_argument('--bloco', type=int, default=MOID_DB_CHUNK, help="Órbitas por bloco")
+    args = parser.parse_args()
+
+    if args.sqlite:
+        success, message, info = connect_to_sqlite(args.sqlite)
+    else:
+        success, message, info = connect_to_db(args.servidor, args.database,
+                                               args.utilizador, args.password)
+    if not success:
+        raise SystemExit(message)
+
+    success, result = update_catalog_moid(
+        args.bloco,
+        on_progress=lambda summary: print(f"Órbita {summary['ultimo_id']}: "
+                                          f"{summary['orbitas_atualizadas']} atualizadas")
+    )
+    if not success:
+        raise SystemExit(result)
+
+    print(f"Concluído: {result['orbitas_atualizadas']} de {result['orbitas_lidas']} órbitas "
+          f"em {result['segundos']:.1f}s ({result['orbitas_por_segundo']:.0f} órbitas/s)")
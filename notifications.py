@@ -0,0 +1,462 @@
+import argparse
+import smtplib
+import socketserver
+import threading
+import time
+from email import message_from_bytes, policy
+from email.message import EmailMessage
+from email.utils import formatdate, make_msgid
+
+from database import route_alerts
+
+# Espera (segundos) desde o primeiro alerta pendente de um destinatário, para
+# juntar os alertas seguintes no mesmo email
+DIGEST_WINDOW = 60
+# Alertas por email; com mais, o email é enviado logo e o resto segue no próximo
+DIGEST_MAX_ALERTS = 50
+
+# Limites do servidor SMTP: emails por minuto e emails por conexão
+MAX_EMAILS_PER_MINUTE = 30
+MAX_EMAILS_PER_CONNECTION = 100
+# Conexão parada há mais de SMTP_IDLE_TIMEOUT segundos é fechada e reaberta
+SMTP_IDLE_TIMEOUT = 120
+SMTP_TIMEOUT = 30
+
+# Espera após uma falha de envio para um destinatário (duplica até ao máximo)
+RETRY_MIN_DELAY = 30
+RETRY_MAX_DELAY = 900
+
+PRIORITY_NAMES = {1: 'Alta', 2: 'Média', 3: 'Baixa'}
+
+
+class RateLimiter:
+    """Token bucket: no máximo `per_minute` envios por minuto, com rajadas até `burst`"""
+
+    def __init__(self, per_minute, burst=None):
+        self.rate = per_minute / 60.0
+        self.capacity = burst or max(1, per_minute // 6)
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, stop=None):
+        """Espera por uma vaga; retorna False se `stop` (Event) for ativado entretanto"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return True
+                wait = (1 - self._tokens) / self.rate
+
+            if stop is None:
+                time.sleep(wait)
+            elif stop.wait(wait):
+                return False
+
+
+class SmtpSender:
+    """
+    Envia emails por uma conexão SMTP reutilizada entre envios.
+    A conexão é aberta no primeiro envio e reaberta depois de
+    `max_per_connection` emails, de estar parada `idle_timeout` segundos ou de
+    o servidor a ter fechado.
+    """
+
+    def __init__(self, host, port=25, username=None, password=None, sender=None,
+                 starttls=False, use_ssl=False, timeout=SMTP_TIMEOUT,
+                 max_per_connection=MAX_EMAILS_PER_CONNECTION, idle_timeout=SMTP_IDLE_TIMEOUT):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.sender = sender or username or 'alertas@localhost'
+        self.starttls = starttls
+        self.use_ssl = use_ssl
+        self.timeout = timeout
+        self.max_per_connection = max_per_connection
+        self.idle_timeout = idle_timeout
+
+        self._smtp = None
+        self._sent = 0
+        self._last_used = 0
+
+    def send(self, message):
+        if 'From' not in message:
+            message['From'] = self.sender
+
+        try:
+            self._connection().send_message(message)
+        except (smtplib.SMTPServerDisconnected, ConnectionError):
+            # O servidor fechou a conexão: tentar uma vez com uma nova
+            self.close()
+            self._connection().send_message(message)
+
+        self._sent += 1
+        self._last_used = time.monotonic()
+
+    def close(self):
+        if self._smtp is not None:
+            try:
+                self._smtp.quit()
+            except Exception:
+                pass
+            self._smtp = None
+
+    def _connection(self):
+        if self._smtp is not None and (
+                self._sent >= self.max_per_connection
+                or time.monotonic() - self._last_used > self.idle_timeout):
+            self.close()
+
+        if self._smtp is None:
+            smtp_class = smtplib.SMTP_SSL if self.use_ssl else smtplib.SMTP
+            smtp = smtp_class(self.host, self.port, timeout=self.timeout)
+            try:
+                if self.starttls:
+                    smtp.starttls()
+                if self.username:
+                    smtp.login(self.username, self.password or '')
+            except Exception:
+                smtp.close()
+                raise
+            self._smtp = smtp
+            self._sent = 0
+
+        return self._smtp
+
+
+class NotificationDispatcher:
+    """
+    Envia por email os alertas novos a quem os subscreveu em NotificationSettings.
+
+    `on_alerts` pode ser registado como subscritor de um AlertFeed: os alertas
+    recebidos são associados aos destinatários com route_alerts (índice de
+    subscritores em memória) e ficam em fila por destinatário. Cada
+    destinatário recebe um único email (resumo) com os alertas acumulados
+    durante `digest_window` segundos. Os envios respeitam `per_minute` e usam
+    a conexão reutilizada de `sender` (SmtpSender); após uma falha, os alertas
+    voltam à fila e o destinatário espera antes de nova tentativa.
+    """
+
+    def __init__(self, sender, route=None, digest_window=DIGEST_WINDOW,
+                 max_alerts=DIGEST_MAX_ALERTS, per_minute=MAX_EMAILS_PER_MINUTE,
+                 subject_prefix="[Asteroid]"):
+        self.sender = sender
+        self.route = route or route_alerts
+        self.digest_window = digest_window
+        self.max_alerts = max_alerts
+        self.rate_limiter = RateLimiter(per_minute)
+        self.subject_prefix = subject_prefix
+
+        self.sent = 0
+        self.failed = 0
+
+        self._lock = threading.Lock()
+        # email -> {'alerts': [...], 'ids': set de alert_id, 'since': primeiro alerta em espera}
+        self._pending = {}
+        # email -> (instante da próxima tentativa, espera atual) após falhas de envio
+        self._retry = {}
+        self._thread = None
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+
+    def on_alerts(self, columns, records):
+        """Callback para AlertFeed.subscribe (registos com as colunas de fetch_alerts_after)"""
+        self.enqueue([tuple(record[:5]) for record in records])
+
+    def enqueue(self, alerts):
+        """
+        Põe em fila os alertas (alert_id, asteroid_name, alert_date,
+        priority_level, description) para os seus subscritores. Falha com
+        exceção se não for possível obter os subscritores, para que o feed
+        volte a entregar os mesmos alertas.
+        """
+        success, matches = self.route(alerts)
+        if not success:
+            raise RuntimeError(matches)
+
+        now = time.monotonic()
+        with self._lock:
+            for email, *alert in matches:
+                pending = self._pending.setdefault(
+                    email, {'alerts': [], 'ids': set(), 'since': now}
+                )
+                if alert[0] not in pending['ids']:
+                    pending['ids'].add(alert[0])
+                    pending['alerts'].append(tuple(alert))
+
+        if matches:
+            self._wake.set()
+        return len(matches)
+
+    def pending_count(self):
+        with self._lock:
+            return sum(len(pending['alerts']) for pending in self._pending.values())
+
+    def dispatch(self, force=False):
+        """
+        Envia os resumos que já estão prontos (ou todos, com `force`).
+        Retorna o número de emails enviados.
+        """
+        sent = 0
+        due = self._due(force)
+        for index, (email, alerts) in enumerate(due):
+            if not self.rate_limiter.acquire(None if force else self._stop):
+                # A terminar: o que falta volta à fila
+                for email, alerts in due[index:]:
+                    self._requeue(email, alerts, failed=False)
+                break
+
+            try:
+                self.sender.send(self.build_message(email, alerts))
+            except smtplib.SMTPRecipientsRefused as e:
+                # Endereço recusado: não adianta repetir
+                print(f"Email recusado para {email}: {e}")
+                self.failed += 1
+                continue
+            except Exception as e:
+                print(f"Erro ao enviar email para {email}: {e}")
+                self.failed += 1
+                self._requeue(email, alerts, failed=True)
+                continue
+
+            sent += 1
+            self.sent += 1
+            with self._lock:
+                self._retry.pop(email, None)
+
+        return sent
+
+    def flush(self):
+        """Envia já tudo o que está em fila (ex: antes de terminar)"""
+        return self.dispatch(force=True)
+
+    def _due(self, force):
+        now = time.monotonic()
+        due = []
+        with self._lock:
+            for email, pending in list(self._pending.items()):
+                if not force and now < self._retry.get(email, (0, 0))[0]:
+                    continue
+                if (force or len(pending['alerts']) >= self.max_alerts
+                        or now - pending['since'] >= self.digest_window):
+                    alerts = pending['alerts'][:self.max_alerts]
+                    del pending['alerts'][:self.max_alerts]
+                    pending['ids'].difference_update(alert[0] for alert in alerts)
+                    pending['since'] = now
+                    if not pending['alerts']:
+                        del self._pending[email]
+                    due.append((email, alerts))
+        return due
+
+    def _requeue(self, email, alerts, failed):
+        with self._lock:
+            now = time.monotonic()
+            pending = self._pending.setdefault(email, {'alerts': [], 'ids': set(), 'since': now})
+            pending['alerts'][:0] = [alert for alert in alerts if alert[0] not in pending['ids']]
+            pending['ids'].update(alert[0] for alert in alerts)
+            if failed:
+                delay = self._retry.get(email, (0, 0))[1]
+                delay = min(max(delay * 2, RETRY_MIN_DELAY), RETRY_MAX_DELAY)
+                self._retry[email] = (now + delay, delay)
+
+    def build_message(self, email, alerts):
+        """Email (resumo) com os alertas (alert_id, asteroide, data, prioridade, descrição)"""
+        message = EmailMessage()
+        message['To'] = email
+        message['Date'] = formatdate(localtime=True)
+        message['Message-ID'] = make_msgid()
+
+        if len(alerts) == 1:
+            alert_id, asteroid_name, alert_date, priority_level, description = alerts[0]
+            message['Subject'] = (f"{self.subject_prefix} Alerta de prioridade "
+                                  f"{_priority_name(priority_level)}: {description or ''}")
+        else:
+            high = sum(1 for alert in alerts if alert[3] == 1)
+            summary = f" ({high} de prioridade Alta)" if high else ""
+            message['Subject'] = f"{self.subject_prefix} {len(alerts)} novos alertas{summary}"
+
+        lines = [f"Novos alertas no sistema de monitorização de asteroides ({len(alerts)}):", ""]
+        for alert_id, asteroid_name, alert_date, priority_level, description in alerts:
+            lines.append(
+                f"- [{_priority_name(priority_level)}] {_format_date(alert_date)} "
+                f"{asteroid_name or 'Desconhecido'}: {description or ''} (alerta #{alert_id})"
+            )
+        lines += ["", "Pode alterar as notificações na aba 'Alertas e Monitorização'."]
+        message.set_content("\n".join(lines))
+        return message
+
+    def start(self):
+        """Inicia o envio em fundo (verifica a fila a cada segundo)"""
+        self.stop(flush=False)
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, args=(self._stop,),
+                                        name="notificacoes", daemon=True)
+        self._thread.start()
+
+    def stop(self, flush=True, timeout=10):
+        if self._thread is not None:
+            self._stop.set()
+            self._wake.set()
+            self._thread.join(timeout)
+            self._thread = None
+        if flush:
+            self.flush()
+        self.sender.close()
+
+    def _run(self, stop):
+        while not stop.is_set():
+            try:
+                self.dispatch()
+            except Exception as e:
+                print(f"Erro no envio de notificações: {e}")
+            self._wake.wait(1)
+            self._wake.clear()
+
+
+def _priority_name(priority_level):
+    return PRIORITY_NAMES.get(priority_level, f'Nível {priority_level}')
+
+
+def _format_date(alert_date):
+    try:
+        return alert_date.strftime("%Y-%m-%d %H:%M")
+    except AttributeError:
+        return str(alert_date or "")
+
+
+class SmtpSink(socketserver.ThreadingTCPServer):
+    """
+    Servidor SMTP mínimo que aceita e guarda todos os emails, sem os enviar.
+    Para testar as notificações localmente (ex: --sink 1025).
+    """
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, host='127.0.0.1', port=1025, on_message=None):
+        self.messages = []
+        self.on_message = on_message
+        self._lock = threading.Lock()
+        super().__init__((host, port), _SmtpSinkHandler)
+
+    def received(self, envelope_to, data):
+        message = message_from_bytes(data, policy=policy.default)
+        with self._lock:
+            self.messages.append((envelope_to, message))
+        if self.on_message:
+            self.on_message(envelope_to, message)
+
+
+class _SmtpSinkHandler(socketserver.StreamRequestHandler):
+
+    def reply(self, text):
+        self.wfile.write(text.encode('ascii') + b"\r\n")
+
+    def handle(self):
+        self.reply("220 localhost SMTP sink")
+        recipients = []
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode('utf-8', 'replace').strip()
+            verb = command[:4].upper()
+
+            if verb in ('HELO', 'EHLO'):
+                self.reply("250 localhost")
+            elif verb == 'MAIL':
+                recipients = []
+                self.reply("250 OK")
+            elif verb == 'RCPT':
+                recipients.append(command.partition(':')[2].strip().strip('<>'))
+                self.reply("250 OK")
+            elif verb == 'DATA':
+                self.reply("354 Fim com <CRLF>.<CRLF>")
+                data = []
+                while True:
+                    line = self.rfile.readline()
+                    if not line or line in (b".\r\n", b".\n"):
+                        break
+                    data.append(line[1:] if line.startswith(b"..") else line)
+                self.server.received(recipients, b"".join(data))
+                self.reply("250 OK")
+            elif verb == 'RSET':
+                recipients = []
+                self.reply("250 OK")
+            elif verb == 'NOOP':
+                self.reply("250 OK")
+            elif verb == 'QUIT':
+                self.reply("221 Adeus")
+                return
+            else:
+                self.reply("502 Comando nao suportado")
+
+
+def _print_message(envelope_to, message):
+    print(f"--- Para: {', '.join(envelope_to)} | {message['Subject']}")
+    print(message.get_content())
+
+
+if __name__ == '__main__':
+    from alert_feed import AlertFeed
+    from database import connect_to_db, connect_to_sqlite
+
+    parser = argparse.ArgumentParser(description="Envia por email os alertas novos aos subscritores")
+    parser.add_argument('--sqlite', help="Base de dados SQLite local")
+    parser.add_argument('--servidor', help="Servidor SQL Server")
+    parser.add_argument('--database', help="Base de dados SQL Server")
+    parser.add_argument('--utilizador')
+    parser.add_argument('--password')
+    parser.add_argument('--smtp', default='localhost', help="Servidor SMTP")
+    parser.add_argument('--smtp-porta', type=int, default=25)
+    parser.add_argument('--smtp-utilizador')
+    parser.add_argument('--smtp-password')
+    parser.add_argument('--remetente', help="Endereço do remetente")
+    parser.add_argument('--starttls', action='store_true')
+    parser.add_argument('--ssl', action='store_true')
+    parser.add_argument('--resumo', type=int, default=DIGEST_WINDOW,
+                        help="Segundos a juntar alertas no mesmo email")
+    parser.add_argument('--por-minuto', type=int, default=MAX_EMAILS_PER_MINUTE,
+                        help="Máximo de emails por minuto")
+    parser.add_argument('--sink', type=int, metavar='PORTA',
+                        help="Apenas inicia um servidor SMTP local que mostra os emails recebidos")
+    args = parser.parse_args()
+
+    if args.sink:
+        sink = SmtpSink(port=args.sink, on_message=_print_message)
+        print(f"Servidor SMTP de teste em 127.0.0.1:{args.sink}")
+        try:
+            sink.serve_forever()
+        except KeyboardInterrupt:
+            sink.server_close()
+        raise SystemExit(0)
+
+    if args.sqlite:
+        success, message, info = connect_to_sqlite(args.sqlite)
+    else:
+        success, message, info = connect_to_db(args.servidor, args.database,
+                                               args.utilizador, args.password)
+    if not success:
+        raise SystemExit(message)
+
+    sender = SmtpSender(args.smtp, args.smtp_porta, args.smtp_utilizador, args.smtp_password,
+                        sender=args.remetente, starttls=args.starttls, use_ssl=args.ssl)
+    dispatcher = NotificationDispatcher(sender, digest_window=args.resumo,
+                                        per_minute=args.por_minuto)
+    feed = AlertFeed()
+    feed.subscribe(dispatcher.on_alerts, name="email")
+
+    feed.start()
+    dispatcher.start()
+    print("A enviar notificações (Ctrl+C para terminar)")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        feed.stop()
+        dispatcher.stop()
+        print(f"{dispatcher.sent} emails enviados, {dispatcher.failed} falhas")
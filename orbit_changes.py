@@ -0,0 +1,154 @@
+import threading
+from datetime import datetime
+
+import numpy as np
+
+# Trigger cujas regras são reproduzidas aqui (triggers.txt / sqlite_triggers.txt)
+CHANGE_TRIGGER = 'trg_VerificarMudancaOrbital'
+
+# Limiares e prioridade (Média) de trg_VerificarMudancaOrbital
+ECCENTRICITY_CHANGE = 0.05
+INCLINATION_CHANGE = 2
+CHANGE_PRIORITY = 2
+
+# Órbitas lidas por consulta ao carregar o estado
+CHANGES_READ_CHUNK = 50000
+
+ORBITS_SQL = """
+    SELECT orbit_param_id, asteroid_id, e, i
+    FROM Orbital_Parameters
+    WHERE orbit_param_id > ?
+    ORDER BY orbit_param_id
+"""
+
+CHANGE_ALERT_COLUMNS = ['asteroid_id', 'alert_date', 'priority_level', 'description', 'is_active']
+
+
+def change_description(eccentricity_changed, inclination_changed):
+    """Descrição do alerta, igual à do trigger"""
+    return ('Mudança Orbital: '
+            + ('Excentricidade variou > 0.05. ' if eccentricity_changed else '')
+            + ('Inclinação variou > 2 graus.' if inclination_changed else ''))
+
+
+def _floats(values):
+    return np.array([np.nan if value is None else value for value in values], dtype=np.float64)
+
+
+class OrbitChangeDetector:
+    """
+    Última excentricidade e inclinação de cada asteroide, em dois arrays
+    indexados por asteroid_id (NaN = sem órbita ou valor NULL), para gerar os
+    alertas de trg_VerificarMudancaOrbital em lote, sem procurar a órbita
+    anterior de cada linha inserida.
+
+    refresh() lê só as órbitas com orbit_param_id acima do último visto (na
+    primeira vez, a tabela inteira). process() compara um lote de órbitas
+    novas, pela ordem de inserção, com a anterior do mesmo asteroide (que pode
+    estar no próprio lote) e guarda-as como as últimas. Órbitas editadas ou
+    eliminadas só são consideradas depois de reset().
+    """
+
+    def __init__(self, initial_size=1024):
+        self.initial_size = initial_size
+        self._lock = threading.Lock()
+        self._clear()
+
+    def reset(self):
+        """Esquece o estado; a próxima atualização relê a tabela"""
+        with self._lock:
+            self._clear()
+
+    def _clear(self):
+        self.last_id = 0
+        self._e = np.full(self.initial_size, np.nan)
+        self._i = np.full(self.initial_size, np.nan)
+
+    def _ensure(self, max_id):
+        if max_id < len(self._e):
+            return
+        size = max(2 * len(self._e), max_id + 1)
+        for name in ('_e', '_i'):
+            grown = np.full(size, np.nan)
+            grown[:len(getattr(self, name))] = getattr(self, name)
+            setattr(self, name, grown)
+
+    def refresh(self, pool, backend, chunk_size=CHANGES_READ_CHUNK):
+        """Lê as órbitas novas desde a última atualização; retorna quantas"""
+        count = 0
+        with self._lock:
+            with pool.connection() as connection:
+                cursor = connection.cursor()
+                try:
+                    while True:
+                        cursor.execute(backend.limit(ORBITS_SQL, chunk_size), [self.last_id])
+                        records = cursor.fetchall()
+                        if records:
+                            orbit_ids, asteroid_ids, e, i = zip(*records)
+                            self._store(np.array(asteroid_ids, dtype=np.int64), _floats(e), _floats(i))
+                            self.last_id = max(self.last_id, max(orbit_ids))
+                            count += len(records)
+                        if len(records) < chunk_size:
+                            break
+                finally:
+                    cursor.close()
+        return count
+
+    def _store(self, asteroid_ids, e, i):
+        # Fica a última órbita de cada asteroide
+        unique_ids, last = np.unique(asteroid_ids[::-1], return_index=True)
+        rows = len(asteroid_ids) - 1 - last
+        self._ensure(int(unique_ids[-1]))
+        self._e[unique_ids] = e[rows]
+        self._i[unique_ids] = i[rows]
+
+    def process(self, asteroid_ids, e, i):
+        """
+        Compara órbitas novas (pela ordem de inserção) com a anterior de cada
+        asteroide e regista-as. Retorna (excentricidade variou, inclinação
+        variou), arrays booleanos pela ordem recebida.
+        """
+        asteroid_ids = np.asarray(asteroid_ids, dtype=np.int64)
+        e, i = _floats(e), _floats(i)
+        if not len(asteroid_ids):
+            return np.zeros(0, dtype=bool), np.zeros(0, dtype=bool)
+
+        order = np.argsort(asteroid_ids, kind='stable')
+        ids, e_sorted, i_sorted = asteroid_ids[order], e[order], i[order]
+        first = np.r_[True, ids[1:] != ids[:-1]]
+        last = np.r_[ids[1:] != ids[:-1], True]
+
+        with self._lock:
+            self._ensure(int(ids[-1]))
+            # A anterior é a guardada (primeira do asteroide no lote) ou a linha antes
+            previous_e = np.r_[np.nan, e_sorted[:-1]]
+            previous_i = np.r_[np.nan, i_sorted[:-1]]
+            previous_e[first] = self._e[ids[first]]
+            previous_i[first] = self._i[ids[first]]
+
+            self._e[ids[last]] = e_sorted[last]
+            self._i[ids[last]] = i_sorted[last]
+
+        # Comparações com NaN dão False, como com NULL no trigger
+        with np.errstate(invalid='ignore'):
+            eccentricity = np.abs(e_sorted - previous_e) > ECCENTRICITY_CHANGE
+            inclination = np.abs(i_sorted - previous_i) > INCLINATION_CHANGE
+
+        eccentricity_changed = np.empty_like(eccentricity)
+        inclination_changed = np.empty_like(inclination)
+        eccentricity_changed[order] = eccentricity
+        inclination_changed[order] = inclination
+        return eccentricity_changed, inclination_changed
+
+    def alerts(self, asteroid_ids, e, i, alert_date=None):
+        """
+        process() e os alertas resultantes, prontos para bulk_insert em Alert
+        com CHANGE_ALERT_COLUMNS
+        """
+        eccentricity, inclination = self.process(asteroid_ids, e, i)
+        alert_date = alert_date or datetime.now().replace(microsecond=0)
+        return [
+            (int(asteroid_ids[n]), alert_date, CHANGE_PRIORITY,
+             change_description(eccentricity[n], inclination[n]), 1)
+            for n in np.flatnonzero(eccentricity | inclination)
+        ]
@@ -0,0 +1,355 @@
+import heapq
+import threading
+
+import numpy as np
+
+# Pontos por folha da árvore (avaliados de uma vez com numpy)
+KD_LEAF_SIZE = 128
+
+# Órbitas novas ficam numa lista à parte (pesquisada por força bruta) até
+# serem mais do que esta fração da árvore, ou do que o mínimo; aí a árvore é
+# reconstruída com elas
+REBUILD_FRACTION = 0.05
+REBUILD_MIN = 20000
+
+# Órbitas lidas por consulta ao atualizar o índice
+INDEX_READ_CHUNK = 50000
+
+ORBITS_SQL = """
+    SELECT orbit_param_id, asteroid_id, a, e, q, i, om, w
+    FROM Orbital_Parameters
+    WHERE orbit_param_id > ?
+    ORDER BY orbit_param_id
+"""
+
+
+def orbit_vectors(a, e, q, i, om, w):
+    """
+    Coordenadas de cada órbita (a em UA, ângulos em graus) num espaço onde a
+    distância euclidiana acompanha o critério D de Southworth-Hawkins:
+    q, a normal ao plano da órbita (unitária) e o vetor excentricidade (e na
+    direção do periélio). Entre duas órbitas, D² = Δq² + (2 sen(I/2))² + Δe²
+    + e1·e2·(2 sen(θ/2))², com I o ângulo entre os planos e θ o ângulo entre
+    os periélios. Retorna (vetores (n, 7), máscara das órbitas completas).
+    """
+    a, e, q, i, om, w = (np.asarray(values, dtype=np.float64) for values in (a, e, q, i, om, w))
+    q = np.where(np.isnan(q), a * (1 - e), q)
+
+    i, om, w = np.radians(i), np.radians(om), np.radians(w)
+    sin_i, cos_i = np.sin(i), np.cos(i)
+    sin_om, cos_om = np.sin(om), np.cos(om)
+    sin_w, cos_w = np.sin(w), np.cos(w)
+
+    vectors = np.stack([
+        q,
+        sin_i * sin_om,
+        -sin_i * cos_om,
+        cos_i,
+        e * (cos_w * cos_om - sin_w * sin_om * cos_i),
+        e * (cos_w * sin_om + sin_w * cos_om * cos_i),
+        e * sin_w * sin_i,
+    ], axis=-1)
+    return vectors, ~np.isnan(vectors).any(axis=1)
+
+
+class KDTree:
+    """
+    Árvore k-d estática sobre `points` (n, d), com caixas envolventes por nó.
+    Os pontos são guardados pela ordem das folhas: `index` dá a posição
+    original de cada um e `slot` o inverso. hide() esconde pontos sem
+    reconstruir a árvore.
+    """
+
+    def __init__(self, points, leaf_size=KD_LEAF_SIZE):
+        points = np.asarray(points, dtype=np.float64)
+        order = np.arange(len(points))
+        nodes = []  # (início, fim, filho esquerdo, filho direito)
+        lower, upper = [], []
+
+        stack = [(0, len(points), None, 0)]
+        while stack:
+            start, end, parent, side = stack.pop()
+            number = len(nodes)
+            nodes.append([start, end, -1, -1])
+            if parent is not None:
+                nodes[parent][2 + side] = number
+
+            block = points[order[start:end]]
+            low, high = (block.min(axis=0), block.max(axis=0)) if len(block) else \
+                (np.zeros(points.shape[1]), np.zeros(points.shape[1]))
+            lower.append(low)
+            upper.append(high)
+
+            if end - start > leaf_size:
+                dimension = int(np.argmax(high - low))
+                middle = (start + end) // 2
+                part = np.argpartition(block[:, dimension], middle - start)
+                order[start:end] = order[start:end][part]
+                stack.append((middle, end, number, 1))
+                stack.append((start, middle, number, 0))
+
+        self.points = points[order]
+        self.index = order
+        self.slot = np.empty_like(order)
+        self.slot[order] = np.arange(len(order))
+        self.nodes = np.array(nodes, dtype=np.int64).reshape(-1, 4)
+        self.lower = np.array(lower).reshape(len(nodes), points.shape[1])
+        self.upper = np.array(upper).reshape(len(nodes), points.shape[1])
+        # Pela ordem das folhas
+        self.alive = np.ones(len(points), dtype=bool)
+
+    def __len__(self):
+        return len(self.points)
+
+    def hide(self, positions):
+        """Esconde os pontos nas posições originais `positions`"""
+        self.alive[self.slot[positions]] = False
+
+    def _box_distance(self, nodes, point):
+        gap = np.maximum(np.maximum(self.lower[nodes] - point, point - self.upper[nodes]), 0)
+        return np.einsum('nd,nd->n', gap, gap)
+
+    def _leaf(self, node, point):
+        start, end = self.nodes[node, :2]
+        delta = self.points[start:end] - point
+        distance = np.einsum('nd,nd->n', delta, delta)
+        distance[~self.alive[start:end]] = np.inf
+        return np.arange(start, end), distance
+
+    def query(self, point, k):
+        """Os `k` pontos mais próximos: (distâncias, posições originais), por distância"""
+        point = np.asarray(point, dtype=np.float64)
+        best_positions = np.empty(0, dtype=np.int64)
+        best_distances = np.empty(0)
+        bound = np.inf
+
+        heap = [(0.0, 0)]
+        while heap:
+            distance, node = heapq.heappop(heap)
+            if distance > bound:
+                break
+
+            left, right = self.nodes[node, 2:]
+            if left < 0:
+                positions, distances = self._leaf(node, point)
+                best_positions = np.concatenate([best_positions, positions])
+                best_distances = np.concatenate([best_distances, distances])
+                if len(best_distances) > k:
+                    keep = np.argpartition(best_distances, k - 1)[:k]
+                    best_positions, best_distances = best_positions[keep], best_distances[keep]
+                if len(best_distances) == k:
+                    bound = best_distances.max()
+                continue
+
+            children = np.array([left, right])
+            for child, child_distance in zip(children, self._box_distance(children, point)):
+                if child_distance <= bound:
+                    heapq.heappush(heap, (float(child_distance), int(child)))
+
+        found = np.isfinite(best_distances)
+        best_positions, best_distances = best_positions[found], best_distances[found]
+        order = np.argsort(best_distances)
+        return np.sqrt(best_distances[order]), self.index[best_positions[order]]
+
+    def query_radius(self, point, radius):
+        """Pontos a menos de `radius`: (distâncias, posições originais), por distância"""
+        point = np.asarray(point, dtype=np.float64)
+        limit = radius * radius
+        found_positions, found_distances = [], []
+
+        stack = [0]
+        while stack:
+            node = stack.pop()
+            left, right = self.nodes[node, 2:]
+            if left < 0:
+                positions, distances = self._leaf(node, point)
+                inside = distances <= limit
+                found_positions.append(positions[inside])
+                found_distances.append(distances[inside])
+                continue
+
+            children = np.array([left, right])
+            stack.extend(int(child) for child, child_distance
+                         in zip(children, self._box_distance(children, point))
+                         if child_distance <= limit)
+
+        if not found_positions:
+            return np.empty(0), np.empty(0, dtype=np.int64)
+        positions = np.concatenate(found_positions)
+        distances = np.concatenate(found_distances)
+        order = np.argsort(distances)
+        return np.sqrt(distances[order]), self.index[positions[order]]
+
+
+class OrbitIndex:
+    """
+    Índice de semelhança orbital: a última órbita de cada asteroide, pelas
+    coordenadas de orbit_vectors, numa KDTree.
+
+    A primeira atualização lê Orbital_Parameters inteira; as seguintes só as
+    órbitas com orbit_param_id acima do último visto. As novas ficam numa
+    lista pesquisada por força bruta (a órbita anterior do mesmo asteroide é
+    escondida na árvore) até a lista ficar grande, e então a árvore é
+    reconstruída. Órbitas eliminadas ou editadas só saem numa releitura
+    completa (reset).
+    """
+
+    def __init__(self, leaf_size=KD_LEAF_SIZE, rebuild_fraction=REBUILD_FRACTION,
+                 rebuild_min=REBUILD_MIN):
+        self.leaf_size = leaf_size
+        self.rebuild_fraction = rebuild_fraction
+        self.rebuild_min = rebuild_min
+        self._lock = threading.Lock()
+        self._clear()
+
+    def reset(self):
+        """Esquece o índice; a próxima atualização relê a tabela"""
+        with self._lock:
+            self._clear()
+
+    def _clear(self):
+        self.last_id = 0
+        self._tree = None
+        self._tree_ids = np.empty(0, dtype=np.int64)
+        self._sorted_ids = np.empty(0, dtype=np.int64)
+        self._sorted_positions = np.empty(0, dtype=np.int64)
+        # Órbitas que ainda não estão na árvore (linhas a NaN: órbitas incompletas)
+        self._pending_ids = np.empty(0, dtype=np.int64)
+        self._pending_vectors = np.empty((0, 7))
+        self._pending_rows = {}
+
+    def __len__(self):
+        with self._lock:
+            tree = int(self._tree.alive.sum()) if self._tree is not None else 0
+            return tree + int((~np.isnan(self._pending_vectors[:, 0])).sum())
+
+    def refresh(self, pool, backend, chunk_size=INDEX_READ_CHUNK):
+        """Lê as órbitas novas desde a última atualização; retorna quantas"""
+        count = 0
+        with self._lock:
+            with pool.connection() as connection:
+                cursor = connection.cursor()
+                try:
+                    while True:
+                        cursor.execute(backend.limit(ORBITS_SQL, chunk_size), [self.last_id])
+                        records = cursor.fetchall()
+                        if records:
+                            self._add(records)
+                            count += len(records)
+                        if len(records) < chunk_size:
+                            break
+                finally:
+                    cursor.close()
+            self._rebuild_if_needed()
+        return count
+
+    def add(self, records):
+        """Junta órbitas (orbit_param_id, asteroid_id, a, e, q, i, om, w) ao índice"""
+        with self._lock:
+            self._add(records)
+            self._rebuild_if_needed()
+
+    def _add(self, records):
+        columns = list(zip(*records))
+        self.last_id = max(self.last_id, max(columns[0]))
+
+        ids = np.array(columns[1], dtype=np.int64)
+        values = [np.array([np.nan if value is None else value for value in column], dtype=np.float64)
+                  for column in columns[2:]]
+        vectors, complete = orbit_vectors(*values)
+        vectors[~complete] = np.nan
+
+        # Só a última órbita de cada asteroide no lote
+        reverse_ids, last = np.unique(ids[::-1], return_index=True)
+        rows = len(ids) - 1 - last
+        ids, vectors = reverse_ids, vectors[rows]
+
+        positions = self._tree_positions(ids)
+        if self._tree is not None:
+            self._tree.hide(positions[positions >= 0])
+
+        new = []
+        for number, asteroid_id in enumerate(ids.tolist()):
+            row = self._pending_rows.get(asteroid_id)
+            if row is None:
+                new.append(number)
+            else:
+                self._pending_vectors[row] = vectors[number]
+
+        if new:
+            start = len(self._pending_ids)
+            self._pending_rows.update(zip(ids[new].tolist(), range(start, start + len(new))))
+            self._pending_ids = np.concatenate([self._pending_ids, ids[new]])
+            self._pending_vectors = np.concatenate([self._pending_vectors, vectors[new]])
+
+    def _tree_positions(self, asteroid_ids):
+        """Posição na árvore de cada asteroid_id (-1 se não estiver)"""
+        asteroid_ids = np.asarray(asteroid_ids, dtype=np.int64)
+        if not len(self._sorted_ids):
+            return np.full(len(asteroid_ids), -1, dtype=np.int64)
+        slots = np.minimum(np.searchsorted(self._sorted_ids, asteroid_ids), len(self._sorted_ids) - 1)
+        return np.where(self._sorted_ids[slots] == asteroid_ids, self._sorted_positions[slots], -1)
+
+    def _rebuild_if_needed(self):
+        limit = max(self.rebuild_min, self.rebuild_fraction * len(self._tree_ids))
+        if len(self._pending_ids) > limit:
+            self._rebuild()
+
+    def _rebuild(self):
+        complete = ~np.isnan(self._pending_vectors[:, 0])
+        ids = [self._pending_ids[complete]]
+        points = [self._pending_vectors[complete]]
+        if self._tree is not None:
+            ids.append(self._tree_ids[self._tree.index[self._tree.alive]])
+            points.append(self._tree.points[self._tree.alive])
+
+        self._tree_ids = np.concatenate(ids)
+        points = np.concatenate(points)
+        self._tree = KDTree(points, self.leaf_size) if len(points) else None
+        self._sorted_positions = np.argsort(self._tree_ids)
+        self._sorted_ids = self._tree_ids[self._sorted_positions]
+
+        self._pending_ids = np.empty(0, dtype=np.int64)
+        self._pending_vectors = np.empty((0, 7))
+        self._pending_rows = {}
+
+    def vector(self, asteroid_id):
+        """Coordenadas da órbita atual de um asteroide, ou None"""
+        with self._lock:
+            row = self._pending_rows.get(asteroid_id)
+            if row is not None:
+                vector = self._pending_vectors[row]
+                return None if np.isnan(vector[0]) else vector.copy()
+
+            position = int(self._tree_positions([asteroid_id])[0])
+            if position < 0 or not self._tree.alive[self._tree.slot[position]]:
+                return None
+            return self._tree.points[self._tree.slot[position]].copy()
+
+    def nearest(self, vector, k=10):
+        """Os `k` asteroides de órbita mais próxima: [(asteroid_id, D)]"""
+        with self._lock:
+            distances, ids = self._pending_distances(vector)
+            if self._tree is not None:
+                tree_distances, positions = self._tree.query(vector, k)
+                distances = np.concatenate([distances, tree_distances])
+                ids = np.concatenate([ids, self._tree_ids[positions]])
+        order = np.argsort(distances, kind='stable')[:k]
+        return [(int(ids[n]), float(distances[n])) for n in order if np.isfinite(distances[n])]
+
+    def within(self, vector, radius):
+        """Asteroides com D até `radius`, por distância: [(asteroid_id, D)]"""
+        with self._lock:
+            distances, ids = self._pending_distances(vector)
+            inside = distances <= radius
+            distances, ids = distances[inside], ids[inside]
+            if self._tree is not None:
+                tree_distances, positions = self._tree.query_radius(vector, radius)
+                distances = np.concatenate([distances, tree_distances])
+                ids = np.concatenate([ids, self._tree_ids[positions]])
+        order = np.argsort(distances, kind='stable')
+        return [(int(ids[n]), float(distances[n])) for n in order]
+
+    def _pending_distances(self, vector):
+        delta = self._pending_vectors - vector
+        return np.sqrt(np.einsum('nd,nd->n', delta, delta)), self._pending_ids
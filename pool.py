@@ -0,0 +1,231 @@
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+
+class ConnectionPool:
+    """
+    Pool limitado de conexões à base de dados.
+
+    As conexões são criadas pela função `factory` à medida que são precisas,
+    até `max_size`. Conexões paradas há mais de `max_idle` segundos são
+    fechadas, conexões mais antigas que `max_lifetime` segundos são
+    substituídas, e uma conexão parada há mais de `ping_after` segundos é
+    testada com `health_query` antes de ser entregue.
+    """
+
+    def __init__(self, factory, max_size=5, min_size=1, max_idle=300,
+                 max_lifetime=1800, checkout_timeout=30, ping_after=30,
+                 health_query="SELECT 1"):
+        self.factory = factory
+        self.max_size = max_size
+        self.min_size = min_size
+        self.max_idle = max_idle
+        self.max_lifetime = max_lifetime
+        self.checkout_timeout = checkout_timeout
+        self.ping_after = ping_after
+        self.health_query = health_query
+
+        self._lock = threading.Condition()
+        # Conexões livres: (conexão, instante de criação, instante da última utilização)
+        self._idle = deque()
+        # Instante de criação das conexões emprestadas, por id da conexão
+        self._in_use = {}
+        self._closed = False
+        self._last_eviction = time.monotonic()
+
+    def add(self, conn):
+        """Adiciona ao pool uma conexão já aberta (ex: a conexão de teste inicial)"""
+        with self._lock:
+            now = time.monotonic()
+            self._idle.append((conn, now, now))
+            self._lock.notify()
+
+    def acquire(self, timeout=None):
+        """
+        Empresta uma conexão do pool.
+        Espera até `timeout` segundos se o pool estiver esgotado (TimeoutError).
+        """
+        if timeout is None:
+            timeout = self.checkout_timeout
+        deadline = time.monotonic() + timeout
+
+        while True:
+            expired = []
+            try:
+                conn, last_used = self._checkout(deadline, timeout, expired)
+            finally:
+                # Fechar também é uma ida ao servidor: sempre fora do lock
+                self._close_all(expired)
+
+            if last_used is None:
+                # Lugar reservado (conn é a reserva): abrir uma conexão nova
+                reserva = conn
+                break
+
+            # O teste é uma ida ao servidor: sem o lock, não atrasa os outros pedidos
+            if time.monotonic() - last_used <= self.ping_after or self.is_healthy(conn):
+                return conn
+
+            with self._lock:
+                del self._in_use[id(conn)]
+                self._lock.notify()
+            self._close_quietly(conn)
+
+        try:
+            conn = self.factory()
+        except Exception:
+            with self._lock:
+                del self._in_use[id(reserva)]
+                self._lock.notify()
+            raise
+
+        with self._lock:
+            del self._in_use[id(reserva)]
+            self._in_use[id(conn)] = time.monotonic()
+        return conn
+
+    def _checkout(self, deadline, timeout, expired):
+        """
+        Com o lock: empresta uma conexão livre, retornando (conexão, instante
+        da última utilização), ou reserva um lugar para uma nova, retornando
+        (reserva, None). As livres que excederam `max_lifetime` vão para
+        `expired`, para serem fechadas sem o lock.
+        """
+        with self._lock:
+            while True:
+                if self._closed:
+                    raise RuntimeError("Pool de conexões fechado")
+
+                while self._idle:
+                    conn, created, last_used = self._idle.pop()
+                    if time.monotonic() - created > self.max_lifetime:
+                        expired.append(conn)
+                        continue
+                    # Já conta como emprestada enquanto é testada fora do lock
+                    self._in_use[id(conn)] = created
+                    return conn, last_used
+
+                if len(self._in_use) < self.max_size:
+                    # Reservar o lugar antes de abrir a conexão fora do lock
+                    reserva = object()
+                    self._in_use[id(reserva)] = None
+                    return reserva, None
+
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise TimeoutError(
+                        f"Nenhuma conexão disponível após {timeout} segundos "
+                        f"({self.max_size} em uso)"
+                    )
+                self._lock.wait(remaining)
+
+    def release(self, conn, discard=False):
+        """Devolve uma conexão ao pool (ou fecha-a, se `discard`)"""
+        to_close = []
+        with self._lock:
+            created = self._in_use.pop(id(conn), None)
+            now = time.monotonic()
+            if (discard or self._closed or created is None
+                    or now - created > self.max_lifetime):
+                to_close.append(conn)
+            else:
+                self._idle.append((conn, created, now))
+            self._lock.notify()
+
+            # Limpeza oportunista das conexões paradas
+            if now - self._last_eviction > self.max_idle / 2:
+                self._last_eviction = now
+                to_close += self._take_evictable(now)
+
+        self._close_all(to_close)
+
+    @contextmanager
+    def connection(self, timeout=None):
+        """
+        Empresta uma conexão durante um bloco `with`.
+        Se o bloco falhar, faz rollback; se nem isso funcionar, a conexão é descartada.
+        """
+        conn = self.acquire(timeout)
+        discard = False
+        try:
+            yield conn
+        except Exception:
+            try:
+                conn.rollback()
+            except Exception:
+                discard = True
+            raise
+        finally:
+            # Também corre quando um gerador que usa a conexão é fechado a meio
+            self.release(conn, discard=discard)
+
+    def is_healthy(self, conn):
+        """Testa uma conexão com uma query trivial"""
+        try:
+            cursor = conn.cursor()
+            cursor.execute(self.health_query)
+            result = cursor.fetchone()
+            cursor.close()
+            return bool(result) and result[0] == 1
+        except Exception:
+            return False
+
+    def evict_idle(self):
+        """
+        Fecha as conexões livres paradas há mais de `max_idle` segundos
+        (mantendo pelo menos `min_size`) ou que excederam `max_lifetime`.
+        Retorna o número de conexões fechadas.
+        """
+        with self._lock:
+            to_close = self._take_evictable(time.monotonic())
+        self._close_all(to_close)
+        return len(to_close)
+
+    def _take_evictable(self, now):
+        """Retira das livres (com o lock) as conexões a fechar por evict_idle"""
+        to_close = []
+        kept = deque()
+        # As mais antigas estão no início da fila
+        while self._idle:
+            conn, created, last_used = self._idle.popleft()
+            total = len(kept) + len(self._idle) + len(self._in_use)
+            expired = now - created > self.max_lifetime
+            stale = now - last_used > self.max_idle and total >= self.min_size
+            if expired or stale:
+                to_close.append(conn)
+            else:
+                kept.append((conn, created, last_used))
+        self._idle = kept
+        return to_close
+
+    def stats(self):
+        """Retorna o número de conexões livres, em uso e o máximo"""
+        with self._lock:
+            return {
+                'idle': len(self._idle),
+                'in_use': len(self._in_use),
+                'max_size': self.max_size
+            }
+
+    def close(self):
+        """Fecha todas as conexões livres; as emprestadas são fechadas ao serem devolvidas"""
+        with self._lock:
+            self._closed = True
+            to_close = [conn for conn, _, _ in self._idle]
+            self._idle.clear()
+            self._lock.notify_all()
+        self._close_all(to_close)
+
+    @classmethod
+    def _close_all(cls, connections):
+        for conn in connections:
+            cls._close_quietly(conn)
+
+    @staticmethod
+    def _close_quietly(conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
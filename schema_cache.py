@@ -0,0 +1,169 @@
+import threading
+import time
+
+# Todos os metadados num único lote, lido com cursor.nextset()
+CATALOG_BATCH = """
+    SET NOCOUNT ON;
+
+    SELECT TABLE_NAME
+    FROM INFORMATION_SCHEMA.TABLES
+    WHERE TABLE_TYPE = 'BASE TABLE'
+    ORDER BY TABLE_NAME;
+
+    SELECT
+        TABLE_NAME,
+        COLUMN_NAME,
+        DATA_TYPE,
+        CHARACTER_MAXIMUM_LENGTH,
+        IS_NULLABLE,
+        COLUMNPROPERTY(object_id(TABLE_SCHEMA + '.' + TABLE_NAME), COLUMN_NAME, 'IsIdentity') as IS_IDENTITY,
+        NUMERIC_PRECISION,
+        NUMERIC_SCALE
+    FROM INFORMATION_SCHEMA.COLUMNS
+    ORDER BY TABLE_NAME, ORDINAL_POSITION;
+
+    SELECT kcu.TABLE_NAME, kcu.COLUMN_NAME
+    FROM INFORMATION_SCHEMA.KEY_COLUMN_USAGE kcu
+    INNER JOIN INFORMATION_SCHEMA.TABLE_CONSTRAINTS tc
+        ON kcu.CONSTRAINT_NAME = tc.CONSTRAINT_NAME
+        AND kcu.TABLE_NAME = tc.TABLE_NAME
+    WHERE tc.CONSTRAINT_TYPE = 'PRIMARY KEY'
+    ORDER BY kcu.TABLE_NAME, kcu.ORDINAL_POSITION;
+
+    SELECT
+        fk.name,
+        OBJECT_NAME(fkc.parent_object_id),
+        COL_NAME(fkc.parent_object_id, fkc.parent_column_id),
+        OBJECT_NAME(fkc.referenced_object_id),
+        COL_NAME(fkc.referenced_object_id, fkc.referenced_column_id)
+    FROM sys.foreign_keys fk
+    INNER JOIN sys.foreign_key_columns fkc ON fk.object_id = fkc.constraint_object_id
+    ORDER BY fk.name;
+
+    SELECT
+        t.name,
+        OBJECT_NAME(t.parent_id),
+        t.is_disabled,
+        t.create_date
+    FROM sys.triggers t
+    WHERE t.is_ms_shipped = 0
+    ORDER BY t.name;
+
+    SELECT TABLE_NAME
+    FROM INFORMATION_SCHEMA.VIEWS
+    ORDER BY TABLE_NAME;
+"""
+
+
+def load_catalog(connection):
+    """Lê o catálogo do SQL Server num único lote (ver CATALOG_BATCH)"""
+    cursor = connection.cursor()
+    cursor.execute(CATALOG_BATCH)
+
+    tables = [row[0] for row in cursor.fetchall()]
+
+    cursor.nextset()
+    columns = {}
+    for row in cursor.fetchall():
+        table_name, col_name, data_type, max_length, is_nullable, is_identity, precision, scale = row
+
+        # Formatar tipo de dados
+        if max_length and data_type in ['varchar', 'char', 'nvarchar', 'nchar']:
+            data_type = f"{data_type}({max_length})"
+        elif precision is not None and data_type in ['decimal', 'numeric']:
+            data_type = f"{data_type}({precision},{scale or 0})"
+
+        columns.setdefault(table_name, []).append({
+            'name': col_name,
+            'type': data_type,
+            'nullable': is_nullable == 'YES',
+            'identity': is_identity == 1
+        })
+
+    cursor.nextset()
+    primary_keys = {}
+    for table_name, col_name in cursor.fetchall():
+        # Em chaves compostas fica a primeira coluna
+        primary_keys.setdefault(table_name, col_name)
+
+    cursor.nextset()
+    foreign_keys = {}
+    for row in cursor.fetchall():
+        foreign_keys.setdefault(row[1], []).append({
+            'name': row[0],
+            'column': row[2],
+            'referenced_table': row[3],
+            'referenced_column': row[4]
+        })
+
+    cursor.nextset()
+    triggers = [{
+        'name': row[0],
+        'table': row[1],
+        'disabled': row[2],
+        'created': row[3]
+    } for row in cursor.fetchall()]
+
+    cursor.nextset()
+    views = [row[0] for row in cursor.fetchall()]
+
+    cursor.close()
+
+    return {
+        'tables': tables,
+        'columns': columns,
+        'primary_keys': primary_keys,
+        'foreign_keys': foreign_keys,
+        'triggers': triggers,
+        'views': views
+    }
+
+
+class SchemaCache:
+    """
+    Cache dos metadados da base de dados: tabelas, colunas (com identidade),
+    chaves primárias e estrangeiras, triggers e views.
+
+    É carregada numa única ida ao servidor na primeira utilização e mantida
+    até ser invalidada (após alterações de esquema) ou, se `ttl` for
+    indicado, até ter mais de `ttl` segundos. A leitura do servidor é feita
+    fora do lock: quem encontra a cache válida não espera por ela.
+    """
+
+    def __init__(self, ttl=None, loader=None):
+        self.ttl = ttl
+        # loader(connection) -> catálogo; depende do motor (ver backends.py)
+        self.loader = loader or load_catalog
+        self._lock = threading.Lock()
+        self._catalog = None
+        self._loaded_at = None
+        # Muda a cada invalidação: uma leitura que a atravesse não é guardada
+        self._generation = 0
+
+    def invalidate(self):
+        """Descarta os metadados; a próxima leitura recarrega-os"""
+        with self._lock:
+            self._catalog = None
+            self._loaded_at = None
+            self._generation += 1
+
+    def get(self, pool):
+        """Retorna o catálogo, carregando-o do servidor se necessário"""
+        with self._lock:
+            expired = (
+                self.ttl is not None and self._loaded_at is not None
+                and time.monotonic() - self._loaded_at > self.ttl
+            )
+            if self._catalog is not None and not expired:
+                return self._catalog
+            generation = self._generation
+            loader = self.loader
+
+        with pool.connection() as connection:
+            catalog = loader(connection)
+
+        with self._lock:
+            if self._generation == generation:
+                self._catalog = catalog
+                self._loaded_at = time.monotonic()
+        return catalog
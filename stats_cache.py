@@ -0,0 +1,77 @@
+import threading
+import time
+
+
+class StatisticsCache:
+    """
+    Cache partilhada do resultado de `loader()` (ex: as estatísticas do dashboard).
+
+    - Até `ttl` segundos o valor guardado é devolvido sem ir à base de dados.
+    - Entre `ttl` e `stale_ttl` o valor antigo é devolvido de imediato e é
+      lançada uma atualização em fundo (stale-while-revalidate).
+    - Depois disso, ou após `invalidate()`, o próximo pedido espera pelo valor novo.
+
+    Pedidos simultâneos partilham a mesma leitura. `loader` deve retornar
+    (success, value); falhas não ficam em cache.
+    """
+
+    def __init__(self, loader, ttl=60, stale_ttl=600):
+        self.loader = loader
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+
+        self._lock = threading.Condition()
+        self._value = None
+        self._loaded_at = None
+        self._loading = False
+        # Incrementado em cada invalidação, para ignorar leituras já desatualizadas
+        self._version = 0
+
+    def get(self, refresh=False):
+        """Retorna (success, value), usando a cache quando possível"""
+        with self._lock:
+            if not refresh and self._value is not None:
+                age = time.monotonic() - self._loaded_at
+                if age < self.ttl:
+                    return True, self._value
+                if age < self.stale_ttl:
+                    if not self._loading:
+                        self._loading = True
+                        threading.Thread(target=self._load, args=(self._version,), daemon=True).start()
+                    return True, self._value
+
+            if self._loading:
+                # Outra thread já está a ler: esperar pelo resultado dela
+                version = self._version
+                while self._loading and version == self._version:
+                    self._lock.wait()
+                if self._value is not None and version == self._version:
+                    return True, self._value
+
+            self._loading = True
+            version = self._version
+
+        return self._load(version)
+
+    def invalidate(self):
+        """Descarta o valor guardado (ex: após escritas na base de dados)"""
+        with self._lock:
+            self._value = None
+            self._loaded_at = None
+            self._version += 1
+            self._lock.notify_all()
+
+    def _load(self, version):
+        try:
+            success, value = self.loader()
+        except Exception as e:
+            success, value = False, str(e)
+
+        with self._lock:
+            self._loading = False
+            if success and version == self._version:
+                self._value = value
+                self._loaded_at = time.monotonic()
+            self._lock.notify_all()
+
+        return success, value
@@ -0,0 +1,101 @@
+import threading
+import time
+
+SETTINGS_SQL = """
+    SELECT user_email, high_priority_alerts, medium_priority_alerts, low_priority_alerts
+    FROM NotificationSettings
+"""
+
+# Muda com qualquer inserção, alteração (updated_date) ou eliminação
+VERSION_SQL = "SELECT COUNT(*), MAX(updated_date) FROM NotificationSettings"
+
+# Coluna de subscrição de cada priority_level (1 = Alta, 2 = Média, 3 = Baixa)
+PRIORITY_KEYS = {1: 'high_priority', 2: 'medium_priority', 3: 'low_priority'}
+
+
+class SubscriberIndex:
+    """
+    NotificationSettings em memória: configurações por email e emails
+    subscritos por priority_level, para encaminhar alertas sem consultas.
+
+    É carregado na primeira utilização e descartado por invalidate() (ver
+    update_notification_settings). Alterações feitas fora desta aplicação são
+    detetadas por updated_date: no máximo a cada `check_interval` segundos,
+    uma consulta à contagem e ao maior updated_date decide se é preciso reler.
+    """
+
+    def __init__(self, check_interval=30):
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._settings = None
+        self._by_priority = {}
+        self._version = None
+        self._checked_at = None
+
+    def invalidate(self):
+        """Descarta o índice; a próxima utilização relê a tabela"""
+        with self._lock:
+            self._settings = None
+            self._by_priority = {}
+            self._version = None
+            self._checked_at = None
+
+    def refresh(self, pool):
+        """Garante que o índice está carregado e atualizado; retorna o próprio índice"""
+        with self._lock:
+            now = time.monotonic()
+            if (self._settings is not None and self._checked_at is not None
+                    and now - self._checked_at < self.check_interval):
+                return self
+
+            with pool.connection() as connection:
+                cursor = connection.cursor()
+                try:
+                    cursor.execute(VERSION_SQL)
+                    version = tuple(cursor.fetchone())
+                    if self._settings is None or version != self._version:
+                        cursor.execute(SETTINGS_SQL)
+                        self._load(cursor.fetchall())
+                        self._version = version
+                finally:
+                    cursor.close()
+
+            self._checked_at = now
+            return self
+
+    def _load(self, rows):
+        settings = {}
+        by_priority = {priority_level: set() for priority_level in PRIORITY_KEYS}
+
+        for email, high, medium, low in rows:
+            settings[email] = {
+                'email': email,
+                'high_priority': bool(high),
+                'medium_priority': bool(medium),
+                'low_priority': bool(low)
+            }
+            for priority_level, key in PRIORITY_KEYS.items():
+                if settings[email][key]:
+                    by_priority[priority_level].add(email)
+
+        self._settings = settings
+        self._by_priority = {level: tuple(sorted(emails)) for level, emails in by_priority.items()}
+
+    def settings(self, email):
+        """Configurações de um email (como load_notification_settings_for_email), ou None"""
+        return self._settings.get(email) if self._settings else None
+
+    def subscribers(self, priority_level):
+        """Emails subscritos a um priority_level (por ordem alfabética)"""
+        return self._by_priority.get(priority_level, ())
+
+    def route(self, alerts):
+        """
+        Destinatários de cada alerta: [(email, *alerta)] para alertas
+        (alert_id, asteroid_name, alert_date, priority_level, description)
+        """
+        return [
+            (email,) + tuple(alert)
+            for alert in alerts
+            for email in self.subscribers(alert[3])
+        ]
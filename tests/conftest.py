@@ -0,0 +1,18 @@
+import os
+import sys
+
+import pytest
+
+# Os módulos do projeto estão na raiz do repositório
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def sqlite_db(tmp_path):
+    """Base de dados SQLite nova (esquema, views e triggers), ligada em database"""
+    import database
+
+    success, message, _ = database.connect_to_sqlite(str(tmp_path / 'asteroides.db'))
+    assert success, message
+    yield database
+    database.close_connection()
@@ -0,0 +1,72 @@
+import alert_backfill
+
+
+def _insert_orbits(sqlite_db, orbits):
+    """Asteroide de 1 km (MONITORIZAÇÃO) com uma órbita por valor de moid_ld"""
+    with sqlite_db.get_pool().connection() as connection:
+        cursor = connection.cursor()
+        cursor.execute("INSERT INTO Asteroid (full_name, diameter, pha) VALUES ('Grande', 1.0, 'N')")
+        asteroid_id = cursor.lastrowid
+        cursor.executemany(
+            "INSERT INTO Orbital_Parameters (asteroid_id, moid, moid_ld, rms) VALUES (?, ?, ?, 0.5)",
+            [(asteroid_id, moid_ld * 0.00257, moid_ld) for moid_ld in orbits]
+        )
+        connection.commit()
+    return asteroid_id
+
+
+def _alerts(sqlite_db, asteroid_id):
+    with sqlite_db.get_pool().connection() as connection:
+        return connection.execute(
+            "SELECT priority_level, description FROM Alert WHERE asteroid_id = ?", [asteroid_id]
+        ).fetchall()
+
+
+def _clear_alerts(sqlite_db):
+    with sqlite_db.get_pool().connection() as connection:
+        connection.execute("DELETE FROM Alert")
+        connection.commit()
+
+
+def test_one_alert_per_qualifying_orbit_like_the_trigger(sqlite_db, tmp_path):
+    # Três órbitas a < 50 LD e uma fora do limiar
+    asteroid_id = _insert_orbits(sqlite_db, [10, 20, 30, 80])
+    from_trigger = sorted(_alerts(sqlite_db, asteroid_id))
+    assert len(from_trigger) == 3
+
+    _clear_alerts(sqlite_db)
+    success, summary = alert_backfill.backfill_alerts(str(tmp_path / 'cp.json'), chunk_size=2)
+
+    assert success, summary
+    assert summary['alertas_inseridos'] == 3
+    assert sorted(_alerts(sqlite_db, asteroid_id)) == from_trigger
+
+
+def test_repeating_the_backfill_does_not_duplicate(sqlite_db, tmp_path):
+    asteroid_id = _insert_orbits(sqlite_db, [10, 20])
+    _clear_alerts(sqlite_db)
+    checkpoint = str(tmp_path / 'cp.json')
+
+    alert_backfill.backfill_alerts(checkpoint, chunk_size=1)
+    success, summary = alert_backfill.backfill_alerts(checkpoint, chunk_size=1, restart=True)
+
+    assert success, summary
+    assert summary['alertas_inseridos'] == 0
+    assert summary['alertas_existentes'] == 2
+    assert len(_alerts(sqlite_db, asteroid_id)) == 2
+
+
+def test_fills_only_the_missing_orbits(sqlite_db, tmp_path):
+    asteroid_id = _insert_orbits(sqlite_db, [10, 20, 30])
+    with sqlite_db.get_pool().connection() as connection:
+        connection.execute(
+            "DELETE FROM Alert WHERE alert_id = (SELECT MIN(alert_id) FROM Alert WHERE asteroid_id = ?)",
+            [asteroid_id]
+        )
+        connection.commit()
+
+    success, summary = alert_backfill.backfill_alerts(str(tmp_path / 'cp.json'))
+
+    assert success, summary
+    assert summary['alertas_inseridos'] == 1
+    assert len(_alerts(sqlite_db, asteroid_id)) == 3
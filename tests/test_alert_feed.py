@@ -0,0 +1,172 @@
+import time
+
+from alert_feed import AlertFeed
+
+COLUMNS = ['alert_id', 'asteroid_name', 'alert_date', 'priority_level', 'description']
+
+
+class FakeAlerts:
+    """Tabela de alertas em memória com a interface de fetch_alerts_after"""
+
+    def __init__(self):
+        self.rows = {}
+        self.calls = 0
+
+    def add(self, *alert_ids, priority=3):
+        for alert_id in alert_ids:
+            self.rows[alert_id] = (alert_id, f'ast-{alert_id}', None, priority, 'teste')
+
+    def fetch(self, last_id, limit, alert_ids=None):
+        self.calls += 1
+        records = [self.rows[key] for key in sorted(self.rows) if key > last_id][:limit]
+        filled = [self.rows[key] for key in (alert_ids or []) if key in self.rows]
+        return True, (COLUMNS, filled + records)
+
+    def latest(self):
+        return True, max(self.rows, default=0)
+
+
+def make_feed(alerts, **kwargs):
+    feed = AlertFeed(fetch=alerts.fetch, latest=alerts.latest, **kwargs)
+    feed.reset(0)
+    return feed
+
+
+class Recorder:
+    def __init__(self, fail=False):
+        self.ids = []
+        self.fail = fail
+
+    def __call__(self, columns, records):
+        if self.fail:
+            raise RuntimeError("falha simulada")
+        self.ids.extend(record[0] for record in records)
+
+
+def test_delivers_new_alerts_in_order():
+    alerts = FakeAlerts()
+    feed = make_feed(alerts)
+    received = Recorder()
+    feed.subscribe(received)
+
+    alerts.add(3, 1, 2)
+    assert feed.poll() == (True, 3)
+    assert received.ids == [1, 2, 3]
+    assert feed.poll() == (True, 0)
+    assert received.ids == [1, 2, 3]
+
+
+def test_priority_filter():
+    alerts = FakeAlerts()
+    feed = make_feed(alerts)
+    high = Recorder()
+    feed.subscribe(high, priorities=[4])
+
+    alerts.add(1, priority=3)
+    alerts.add(2, priority=4)
+    feed.poll()
+    assert high.ids == [2]
+
+
+def test_late_alert_in_gap_is_delivered():
+    alerts = FakeAlerts()
+    feed = make_feed(alerts)
+    received = Recorder()
+    feed.subscribe(received)
+
+    alerts.add(1, 3)
+    feed.poll()
+    alerts.add(2)
+    feed.poll()
+    assert received.ids == [1, 3, 2]
+
+
+def test_late_alert_reaches_subscriber_that_failed():
+    alerts = FakeAlerts()
+    feed = make_feed(alerts, min_interval=0)
+    failing = Recorder(fail=True)
+    healthy = Recorder()
+    feed.subscribe(failing)
+    feed.subscribe(healthy)
+
+    alerts.add(1, 3)
+    feed.poll()
+    alerts.add(2, 4)
+    feed.poll()
+    failing.fail = False
+    feed.poll()
+
+    assert healthy.ids == [1, 3, 2, 4]
+    assert failing.ids == [1, 2, 3, 4]
+
+
+def test_failing_subscriber_does_not_stall_the_others():
+    alerts = FakeAlerts()
+    feed = make_feed(alerts, batch_size=50)
+    failing = Recorder(fail=True)
+    healthy = Recorder()
+    feed.subscribe(failing, name='falha')
+    feed.subscribe(healthy, name='ok')
+
+    alerts.add(*range(1, 201))
+    # 4 lotes cheios e uma consulta que confirma que não há mais
+    for _ in range(5):
+        assert feed.poll()[0]
+    assert healthy.ids == list(range(1, 201))
+    assert not feed.backlog
+
+    alerts.add(*range(201, 221))
+    feed.poll()
+    assert healthy.ids[-1] == 220
+    assert not feed.backlog
+    # Os alertas do subscritor com falhas continuam à espera
+    assert sorted(feed._subscriptions[0].pending) == list(range(1, 221))
+
+
+def test_pending_alerts_are_capped():
+    alerts = FakeAlerts()
+    feed = make_feed(alerts, min_interval=0, max_pending=30)
+    failing = Recorder(fail=True)
+    subscription = feed.subscribe(failing)
+
+    alerts.add(*range(1, 101))
+    feed.poll()
+    assert sorted(subscription.pending) == list(range(71, 101))
+
+
+def test_failing_subscriber_backs_off():
+    alerts = FakeAlerts()
+    feed = make_feed(alerts, min_interval=10, max_interval=60)
+    calls = []
+
+    def failing(columns, records):
+        calls.append(len(records))
+        raise RuntimeError("falha simulada")
+
+    subscription = feed.subscribe(failing)
+    alerts.add(1)
+    feed.poll()
+    feed.poll()
+    assert calls == [1]
+    assert subscription.retry_at > time.monotonic()
+
+
+def test_background_loop_does_not_spin_with_failing_subscriber():
+    alerts = FakeAlerts()
+    feed = AlertFeed(fetch=alerts.fetch, latest=alerts.latest, batch_size=50,
+                     min_interval=0.05, max_interval=0.2)
+    feed.subscribe(Recorder(fail=True))
+    healthy = Recorder()
+    feed.subscribe(healthy)
+
+    feed.start(last_id=0)
+    try:
+        alerts.add(*range(1, 501))
+        time.sleep(0.6)
+    finally:
+        feed.stop()
+
+    assert healthy.ids == list(range(1, 501))
+    assert feed.interval > 0
+    # 10 lotes para apanhar os 500 alertas e depois consultas espaçadas
+    assert alerts.calls < 40
@@ -0,0 +1,65 @@
+import itertools
+
+import numpy as np
+
+from alert_rules import ALERT_QUERY, DESCRIPTIONS, evaluate, generate_alerts, to_arrays
+
+# Valores dos dois lados de cada limiar do trigger, com NULL
+DIAMETERS = (None, 0.02, 0.04, 0.07, 0.15, 0.3, 0.8)
+PHAS = (None, 'N', 'Y')
+ALBEDOS = (None, 0.1, 0.5)
+ORBITS = [
+    # moid, moid_ld, rms, e, i
+    (0.001, 0.4, 0.1, 0.1, 5),
+    (0.01, 3.9, 0.2, 0.2, 10),
+    (0.01, 3.9, 0.9, 0.2, 10),
+    (0.03, 12, 1.2, 0.5, 20),
+    (0.1, 40, 0.5, 0.9, 80),
+    (0.5, 200, None, 0.95, 85),
+    (None, None, None, None, None),
+]
+
+
+def test_matches_the_sqlite_trigger(sqlite_db):
+    with sqlite_db.get_pool().connection() as connection:
+        cursor = connection.cursor()
+        for diameter, pha, albedo in itertools.product(DIAMETERS, PHAS, ALBEDOS):
+            cursor.execute("INSERT INTO Asteroid (full_name, diameter, pha, albedo) VALUES (?, ?, ?, ?)",
+                           [f"{diameter}-{pha}-{albedo}", diameter, pha, albedo])
+            asteroid_id = cursor.lastrowid
+            cursor.executemany(
+                "INSERT INTO Orbital_Parameters (asteroid_id, moid, moid_ld, rms, e, i) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                [(asteroid_id, *orbit) for orbit in ORBITS]
+            )
+        connection.commit()
+
+        # Só os alertas de trg_GerarAlertas_Orbita (o das mudanças orbitais também escreve em Alert)
+        from_trigger = cursor.execute(
+            f"SELECT asteroid_id, priority_level, description FROM Alert "
+            f"WHERE description IN ({', '.join('?' for _ in DESCRIPTIONS)})",
+            DESCRIPTIONS
+        ).fetchall()
+        records = cursor.execute(ALERT_QUERY + " ORDER BY op.orbit_param_id").fetchall()
+
+    expected = sorted(tuple(row) for row in from_trigger)
+    assert len(expected) > 50
+    assert {row[2] for row in expected} == set(DESCRIPTIONS)
+    assert sorted(generate_alerts(to_arrays(records))) == expected
+
+
+def test_thresholds_can_be_changed():
+    arrays = to_arrays([(1, 7, 0.6, 'N', None, 0.2, 60, 0.5, 0.1, 5)])
+
+    assert generate_alerts(arrays) == []
+    assert generate_alerts(arrays, {'moid_ld_monitorizacao': 100}) == [
+        (7, 2, 'MONITORIZAÇÃO: Novo objeto de grande porte')
+    ]
+
+
+def test_nulls_never_fire():
+    arrays = to_arrays([(1, 1, None, None, None, None, None, None, None, None)])
+    fires, _, _ = evaluate(arrays)
+
+    assert not fires.any()
+    assert arrays['diameter'].dtype == np.float64 and np.isnan(arrays['diameter'][0])
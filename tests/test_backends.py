@@ -0,0 +1,29 @@
+import types
+
+import pytest
+
+import backends
+
+
+@pytest.fixture
+def fake_pyodbc(monkeypatch):
+    """Constantes ODBC sem precisar do pyodbc instalado"""
+    names = ('SQL_VARCHAR', 'SQL_WVARCHAR', 'SQL_DECIMAL', 'SQL_NUMERIC', 'SQL_INTEGER',
+             'SQL_BIGINT', 'SQL_SMALLINT', 'SQL_TINYINT', 'SQL_BIT', 'SQL_DOUBLE', 'SQL_REAL',
+             'SQL_TYPE_DATE', 'SQL_TYPE_TIMESTAMP')
+    fake = types.SimpleNamespace(**{name: name for name in names})
+    monkeypatch.setattr(backends, 'pyodbc', fake)
+    return fake
+
+
+def test_input_size_for_decimal_columns(fake_pyodbc):
+    assert backends._input_size('decimal(10,2)') == ('SQL_DECIMAL', 10, 2)
+    assert backends._input_size('numeric(38,0)') == ('SQL_NUMERIC', 38, 0)
+    # Precisão por omissão do SQL Server
+    assert backends._input_size('decimal') == ('SQL_DECIMAL', 18, 0)
+
+
+def test_input_size_for_text_and_integer_columns(fake_pyodbc):
+    assert backends._input_size('nvarchar(40)') == ('SQL_WVARCHAR', 40, 0)
+    assert backends._input_size('varchar(max)') is None
+    assert backends._input_size('int') == ('SQL_INTEGER', 0, 0)
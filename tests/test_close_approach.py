@@ -0,0 +1,121 @@
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+import close_approach as ca
+from moid import EARTH_ELEMENTS
+
+EARTH_OM, EARTH_W = EARTH_ELEMENTS[3], EARTH_ELEMENTS[4]
+
+# Órbitas próximas da Terra em J2000 (a, e, i, om, w, ma) e uma longe
+ORBITS = [
+    (1.02, 0.05, 1, EARTH_OM, EARTH_W, ca.EARTH_MEAN_ANOMALY + 0.5),
+    (1.3, 0.3, 5, 30, 40, 10),
+    (2.7, 0.08, 10, 80, 73, 20),
+]
+
+
+def _elements(orbits=ORBITS, epoch=ca.J2000_JD):
+    a, e, i, om, w, ma = zip(*orbits)
+    return ca.prepare_elements(a, e, i, om, w, ma, [epoch] * len(orbits))
+
+
+def _dense_minima(elements, start_jd, end_jd, max_distance, step=0.001):
+    """Mínimos locais da distância por amostragem densa: [(órbita, jd, distância)]"""
+    times = np.arange(start_jd, end_jd, step)
+    earth = ca.heliocentric_positions(ca.earth_elements(), times)[0]
+    minima = []
+    for orbit in range(len(elements['a'])):
+        position = ca.heliocentric_positions(ca.subset(elements, [orbit]), times)[0]
+        distance = np.linalg.norm(position - earth, axis=1)
+        middle = distance[1:-1]
+        for k in np.flatnonzero((middle < distance[:-2]) & (middle < distance[2:]) & (middle <= max_distance)):
+            minima.append((orbit, times[k + 1], middle[k]))
+    return minima
+
+
+def test_solve_kepler():
+    M = np.linspace(-7, 7, 200)
+    e = np.linspace(0, 0.99, 200)
+    E = ca.solve_kepler(M, e)
+
+    assert np.allclose(E - e * np.sin(E), np.remainder(M, 2 * np.pi), atol=1e-10)
+
+
+def test_earth_position_at_j2000():
+    position = ca.heliocentric_positions(ca.earth_elements(), [ca.J2000_JD])[0, 0]
+
+    # Posição da Terra em 2000-01-01 12:00 (efeméride: -0.177, 0.967, 0 UA)
+    assert position == pytest.approx([-0.177, 0.967, 0], abs=0.002)
+
+
+def test_matches_dense_sampling():
+    elements, valid = _elements()
+    start_jd, end_jd = ca.J2000_JD - 200, ca.J2000_JD + 200
+
+    index, jd, distance = ca.find_close_approaches(elements, start_jd, end_jd)
+    expected = _dense_minima(elements, start_jd, end_jd, ca.APPROACH_MAX_DISTANCE)
+
+    assert valid.all()
+    assert len(expected) == 3
+    assert sorted(zip(index.tolist(), jd, distance)) == [
+        (orbit, pytest.approx(date, abs=0.01), pytest.approx(au, abs=1e-6))
+        for orbit, date, au in sorted(expected)
+    ]
+
+
+def test_invalid_orbits_never_approach():
+    elements, valid = _elements([(1.02, 1.5, 1, 0, 0, 0), (np.nan, 0.1, 1, 0, 0, 0)])
+
+    assert not valid.any()
+    assert len(ca.find_close_approaches(elements, ca.J2000_JD, ca.J2000_JD + 100)[0]) == 0
+
+
+def test_parallel_gives_the_same_approaches():
+    elements, _ = _elements(ORBITS * 4)
+    start_jd, end_jd = ca.J2000_JD - 200, ca.J2000_JD + 200
+
+    serial = ca.find_close_approaches(elements, start_jd, end_jd)
+    parallel = ca.find_close_approaches_parallel(elements, start_jd, end_jd, workers=2, batch_size=3)
+
+    order_serial = np.lexsort((serial[1], serial[0]))
+    order_parallel = np.lexsort((parallel[1], parallel[0]))
+    for part in range(3):
+        assert np.allclose(serial[part][order_serial], parallel[part][order_parallel])
+
+
+def test_pack_and_unpack_round_trip():
+    elements, _ = _elements()
+    unpacked = ca.unpack_elements(ca.pack_elements(elements))
+
+    for key, values in elements.items():
+        assert np.array_equal(unpacked[key], values)
+
+
+def test_update_close_approaches_replaces_the_window(sqlite_db):
+    with sqlite_db.get_pool().connection() as connection:
+        for asteroid_id, (a, e, i, om, w, ma) in enumerate(ORBITS, start=1):
+            connection.execute("INSERT INTO Asteroid (asteroid_id, full_name) VALUES (?, ?)",
+                               [asteroid_id, f"A{asteroid_id}"])
+            connection.execute(
+                "INSERT INTO Orbital_Parameters (asteroid_id, a, e, i, om, w, ma, epoch, moid) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, NULL)",
+                [asteroid_id, a, e, i, om, w, ma, ca.J2000_JD]
+            )
+        connection.commit()
+
+    start = datetime(1999, 6, 15)
+    for _ in range(2):
+        success, summary = ca.update_close_approaches(start=start, days=400, workers=1)
+        assert success, summary
+
+    with sqlite_db.get_pool().connection() as connection:
+        rows = connection.execute(
+            "SELECT asteroid_id, distance_au, distance_ld FROM Close_Approach ORDER BY approach_date"
+        ).fetchall()
+
+    assert summary['orbitas'] == 3
+    assert len(rows) == summary['aproximacoes'] == 3
+    assert {row[0] for row in rows} == {1}
+    assert all(row[2] == pytest.approx(row[1] * ca.LD_PER_AU) for row in rows)
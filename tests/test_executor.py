@@ -0,0 +1,55 @@
+from executor import BackgroundExecutor
+
+
+class FakeWidget:
+    """Substitui o Tk: after() só guarda o callback, chamado pelo teste"""
+
+    def __init__(self):
+        self.callbacks = []
+
+    def after(self, delay, callback):
+        self.callbacks.append(callback)
+
+
+def run_all(executor, futures):
+    for future in futures:
+        future.result(timeout=5)
+    executor._poll()
+
+
+def test_results_delivered_and_keys_forgotten():
+    executor = BackgroundExecutor(FakeWidget())
+    results = {}
+    futures = [
+        executor.submit(f"pagina-1-{page}", lambda page=page: page * 10,
+                        on_success=lambda value, page=page: results.__setitem__(page, value))
+        for page in range(50)
+    ]
+    run_all(executor, futures)
+
+    assert results == {page: page * 10 for page in range(50)}
+    assert executor._pending == {}
+    assert executor._generations == {}
+    assert not executor.is_busy()
+    executor.shutdown(wait=True)
+
+
+def test_only_latest_result_per_key():
+    executor = BackgroundExecutor(FakeWidget())
+    received = []
+    futures = [executor.submit("consulta", lambda value=value: value, on_success=received.append)
+               for value in range(3)]
+    run_all(executor, futures)
+
+    assert received == [2]
+    executor.shutdown(wait=True)
+
+
+def test_busy_changes_reported_once_per_key():
+    changes = []
+    executor = BackgroundExecutor(FakeWidget(), on_busy_change=lambda key, busy: changes.append((key, busy)))
+    futures = [executor.submit("consulta", lambda: None) for _ in range(2)]
+    run_all(executor, futures)
+
+    assert changes == [("consulta", True), ("consulta", False)]
+    executor.shutdown(wait=True)
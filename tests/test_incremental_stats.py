@@ -0,0 +1,173 @@
+from contextlib import contextmanager
+
+import numpy as np
+
+import incremental_stats
+from incremental_stats import IncrementalStatistics, size_category, size_codes
+
+
+class FakeDatabase:
+    """
+    Asteroid, Alert e Orbital_Parameters em memória, com um change tracking
+    mínimo: cada alteração fica registada com a versão em que foi feita.
+    """
+
+    def __init__(self):
+        self.version = 1
+        self.min_valid = 0
+        self.classes = {1: 'Apollo', 2: 'Aten'}
+        self.tables = {'asteroid': {}, 'alert': {}, 'orbit': {}}
+        self.changes = {'asteroid': {}, 'alert': {}, 'orbit': {}}
+
+    def set(self, table, key, values):
+        """values None apaga a linha"""
+        self.version += 1
+        if values is None:
+            self.tables[table].pop(key, None)
+        else:
+            self.tables[table][key] = values
+        self.changes[table][key] = self.version
+
+    @contextmanager
+    def connection(self):
+        yield FakeConnection(self)
+
+
+class FakeConnection:
+    def __init__(self, db):
+        self.db = db
+
+    def cursor(self):
+        return FakeCursor(self.db)
+
+
+class FakeCursor:
+    def __init__(self, db):
+        self.db = db
+        self.sets = []
+
+    def execute(self, sql, *params):
+        db = self.db
+        if sql == incremental_stats.VERSIONS_SQL:
+            self.sets = [[(db.version, db.min_valid, db.min_valid, db.min_valid)]]
+        elif sql == incremental_stats.CLASSES_SQL:
+            self.sets = [list(db.classes.items())]
+        elif 'CHANGETABLE' in sql:
+            since = params[0]
+            self.sets = [
+                [(key, key if key in db.tables[table] else None,
+                  *(db.tables[table].get(key) or (None,) * width))
+                 for key, version in db.changes[table].items() if version > since]
+                for table, width in (('asteroid', 4), ('alert', 2), ('orbit', 1))
+            ]
+        else:
+            self.sets = [
+                [(key, *values) for key, values in db.tables['asteroid'].items()],
+                [(key, level) for key, (level, active) in db.tables['alert'].items() if active],
+                [(key, *values) for key, values in db.tables['orbit'].items()],
+            ]
+
+    def fetchone(self):
+        return self.sets[0][0]
+
+    def fetchall(self):
+        rows, self.sets[0] = self.sets[0], []
+        return rows
+
+    def fetchmany(self, size):
+        rows, self.sets[0] = self.sets[0][:size], self.sets[0][size:]
+        return rows
+
+    def nextset(self):
+        self.sets.pop(0)
+        return bool(self.sets)
+
+    def close(self):
+        pass
+
+
+def _populate(db):
+    db.set('asteroid', 1, (1, 0.2, 'Y', 'Y'))
+    db.set('asteroid', 2, (2, None, 'N', 'N'))
+    db.set('asteroid', 5, (None, 0.005, 'Y', 'N'))
+    db.set('alert', 1, (4, 1))
+    db.set('alert', 2, (3, 0))
+    db.set('alert', 3, (3, 1))
+    db.set('orbit', 1, (0.5,))
+    db.set('orbit', 2, (None,))
+
+
+def test_size_codes_match_the_sql_case():
+    diameters = [np.nan, 0.001, 0.01, 0.05, 0.1, 0.3, 0.5, 0.8, 1, 7]
+    expected = ['Desconhecido', 'Muito Pequeno (<10m)', 'Muito Pequeno (<10m)',
+                'Pequeno (10-100m)', 'Pequeno (10-100m)', 'Médio (100-500m)',
+                'Médio (100-500m)', 'Grande (500m-1km)', 'Grande (500m-1km)',
+                'Muito Grande (>1km)']
+
+    assert [incremental_stats.SIZE_CATEGORIES[code] for code in size_codes(diameters)] == expected
+    assert size_category(None) == 'Desconhecido'
+
+
+def test_full_load():
+    db = FakeDatabase()
+    _populate(db)
+
+    stats = IncrementalStatistics().refresh(db)
+
+    assert stats['total_asteroides'] == 3
+    assert stats['total_phas_100m'] == 1
+    assert stats['total_neos'] == 1
+    assert stats['classificacoes'] == {'Apollo': 1, 'Aten': 1}
+    assert stats['alertas_ativos'] == 2
+    assert stats['alertas_vermelhos'] == 1
+    assert stats['alertas_laranja'] == 1
+    assert stats['total_orbitas'] == 2
+    assert stats['evolucao_precisao'][0]['rms_medio'] == 0.5
+    assert stats['evolucao_precisao'][0]['qtd_calculos'] == 1
+
+
+def test_changes_give_the_same_result_as_a_full_load():
+    db = FakeDatabase()
+    _populate(db)
+    tracker = IncrementalStatistics()
+    tracker.refresh(db)
+
+    db.set('asteroid', 1, None)
+    db.set('asteroid', 2, (1, 2.0, 'Y', 'Y'))
+    # Chaves acima do tamanho inicial dos arrays
+    db.set('asteroid', 3000, (2, 0.05, 'N', 'Y'))
+    db.set('alert', 1, None)
+    db.set('alert', 2, (3, 1))
+    db.set('alert', 3, (3, 0))
+    db.set('alert', 4000, (4, 1))
+    db.set('orbit', 1, None)
+    db.set('orbit', 2, (0.7,))
+    db.set('orbit', 5000, (0.1,))
+
+    incremental = tracker.refresh(db)
+    full = IncrementalStatistics().refresh(db)
+
+    assert incremental == full
+    assert incremental['total_asteroides'] == 3
+    assert incremental['alertas_ativos'] == 2
+
+
+def test_expired_watermark_reloads_everything():
+    db = FakeDatabase()
+    _populate(db)
+    tracker = IncrementalStatistics()
+    tracker.refresh(db)
+
+    # Alterações que já não estão no change tracking
+    db.tables['asteroid'].pop(5)
+    db.min_valid = db.version + 1
+    db.version += 1
+
+    assert tracker.refresh(db)['total_asteroides'] == 2
+
+
+def test_without_change_tracking_returns_none():
+    db = FakeDatabase()
+    db.version = None
+
+    assert IncrementalStatistics().refresh(db) is None
@@ -0,0 +1,95 @@
+import pytest
+
+import ingest
+
+CATALOG = """full_name,spkid,e,a,q,i,om,w,ma
+1 Ceres,2000001,0.0785,2.766,2.549,10.59,80.25,73.30,291.4
+433 Eros,2000433,0.2229,1.458,1.133,10.83,304.3,178.9,310.5
+1 Ceres,2000001,0.2000,2.766,2.549,10.59,80.25,73.30,291.4
+"""
+
+
+@pytest.fixture
+def catalog(tmp_path):
+    path = tmp_path / 'catalogo.csv'
+    path.write_text(CATALOG, encoding='utf-8')
+    return str(path)
+
+
+def test_loads_asteroids_and_orbits(sqlite_db, catalog):
+    success, summary = ingest.ingest_catalog(catalog, workers=2)
+
+    assert success, summary
+    assert summary['asteroides_inseridos'] == 2
+    assert summary['orbitas_inseridas'] == 3
+    with sqlite_db.get_pool().connection() as connection:
+        spkids = sorted(row[0] for row in connection.execute("SELECT spkid FROM Asteroid"))
+    assert spkids == [2000001, 2000433]
+
+
+def test_trigger_reenabled_when_load_fails(sqlite_db, catalog, monkeypatch):
+    calls = []
+    monkeypatch.setattr(ingest, '_start_change_detection', lambda: True)
+    monkeypatch.setattr(ingest, 'enable_disable_trigger',
+                        lambda name, enable=True: calls.append((name, enable)) or (True, ''))
+
+    def broken(full_name, workers):
+        raise RuntimeError("falha simulada")
+
+    monkeypatch.setattr(ingest, 'partition_of', broken)
+    success, message = ingest.ingest_catalog(catalog)
+
+    assert not success
+    assert calls == [(ingest.CHANGE_TRIGGER, True)]
+
+
+def test_trigger_reenabled_when_workers_cannot_start(sqlite_db, catalog, monkeypatch):
+    calls = []
+    monkeypatch.setattr(ingest, '_start_change_detection', lambda: True)
+    monkeypatch.setattr(ingest, 'enable_disable_trigger',
+                        lambda name, enable=True: calls.append((name, enable)) or (True, ''))
+
+    def broken(*args, **kwargs):
+        raise RuntimeError("falha simulada")
+
+    monkeypatch.setattr(ingest, '_Worker', broken)
+    success, message = ingest.ingest_catalog(catalog)
+
+    assert not success
+    assert calls == [(ingest.CHANGE_TRIGGER, True)]
+
+
+def test_connect_warns_about_disabled_change_trigger(sqlite_db, monkeypatch):
+    monkeypatch.setattr(sqlite_db, 'get_all_triggers', lambda: [
+        {'name': ingest.CHANGE_TRIGGER, 'table': 'Orbital_Parameters', 'disabled': True, 'created': None},
+        {'name': 'outro', 'table': 'Alert', 'disabled': True, 'created': None},
+    ])
+    warnings = sqlite_db._trigger_warnings()
+
+    assert len(warnings) == 1
+    assert ingest.CHANGE_TRIGGER in warnings[0]
+
+
+def test_integer_columns_stay_integers():
+    big = '9007199254740993'  # 2**53 + 1: perde-se num float
+
+    assert ingest._value_kind('bigint') == 'int'
+    assert ingest._convert(big, 'spkid', 'int') == int(big)
+    assert isinstance(ingest._convert('2000001.0', 'spkid', 'int'), int)
+    with pytest.raises(ValueError):
+        ingest._convert('1.5', 'spkid', 'int')
+
+
+def test_decimal_and_float_columns():
+    from decimal import Decimal
+
+    assert ingest._value_kind('decimal(10,2)') == 'decimal'
+    assert ingest._value_kind('float') == 'float'
+    assert ingest._value_kind('varchar(50)') == 'text'
+    assert ingest._convert('1.10', 'preco', 'decimal') == Decimal('1.10')
+    assert ingest._convert('0.5', 'e', 'float') == 0.5
+    assert ingest._convert(' ', 'e', 'float') is None
+    with pytest.raises(ValueError):
+        ingest._convert('nan', 'preco', 'decimal')
+    with pytest.raises(ValueError):
+        ingest._convert('-0.1', 'e', 'float')  # fora do intervalo válido
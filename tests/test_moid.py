@@ -0,0 +1,75 @@
+import numpy as np
+import pytest
+
+import moid
+from moid import EARTH_ELEMENTS, earth_moid, orbit_frame, orbit_positions
+
+# Elementos (a, e, i, om, w) e MOID com a Terra publicados no JPL SBDB (UA)
+KNOWN = {
+    '433 Eros': ((1.4579, 0.22283, 10.828, 304.28, 178.93), 0.1488),
+    '1566 Icarus': ((1.0780, 0.8270, 22.80, 87.95, 31.43), 0.0345),
+    '1 Ceres': ((2.7672, 0.07855, 10.587, 80.25, 73.30), 1.585),
+}
+
+
+def _brute_force(a, e, i, om, w, steps=1500):
+    """MOID por grelha densa nas duas órbitas (limite superior do valor exato)"""
+    grid = np.linspace(0, 2 * np.pi, steps, endpoint=False)[None, :]
+
+    def points(a, e, i, om, w):
+        P, Q = orbit_frame(np.array([i]), np.array([om]), np.array([w]))
+        return orbit_positions(np.array([a * (1 - e * e)]), np.array([e]), P, Q, grid)[0]
+
+    earth_a, earth_e, earth_i, earth_om, earth_w = EARTH_ELEMENTS
+    delta = points(a, e, i, om, w)[:, None, :] - points(earth_a, earth_e, earth_i, earth_om, earth_w)[None, :, :]
+    return np.sqrt(np.einsum('nmk,nmk->nm', delta, delta).min())
+
+
+def test_known_moids():
+    elements, expected = zip(*KNOWN.values())
+    result = earth_moid(*np.array(elements).T)
+
+    assert result == pytest.approx(expected, abs=0.002)
+
+
+def test_matches_brute_force():
+    rng = np.random.default_rng(7)
+    a = rng.uniform(0.7, 3, 6)
+    e = rng.uniform(0, 0.9, 6)
+    i = rng.uniform(0, 40, 6)
+    om = rng.uniform(0, 360, 6)
+    w = rng.uniform(0, 360, 6)
+
+    result = earth_moid(a, e, i, om, w, chunk=4)
+    expected = [_brute_force(*elements) for elements in zip(a, e, i, om, w)]
+
+    # A grelha densa só pode ficar acima, e por pouco
+    assert np.all(result <= np.array(expected) + 1e-9)
+    assert result == pytest.approx(expected, abs=2e-3)
+
+
+def test_invalid_orbits_give_nan():
+    result = earth_moid([1.5, 1.5, np.nan], [1.2, 0.1, 0.1], [5, np.nan, 5], [0, 0, 0], [0, 0, 0])
+    assert np.isnan(result).all()
+
+
+def test_update_catalog_moid_writes_moid_and_ld(sqlite_db):
+    (a, e, i, om, w), expected = KNOWN['433 Eros']
+    with sqlite_db.get_pool().connection() as connection:
+        connection.execute("INSERT INTO Asteroid (asteroid_id, full_name) VALUES (1, '433 Eros')")
+        connection.executemany(
+            "INSERT INTO Orbital_Parameters (asteroid_id, a, e, q, i, om, w, moid) VALUES (1, ?, ?, ?, ?, ?, ?, ?)",
+            [(a, e, a * (1 - e), i, om, w, 0.5), (None, None, None, None, None, None, 0.7)]
+        )
+        connection.commit()
+
+    success, summary = moid.update_catalog_moid(chunk_size=1)
+
+    assert success, summary
+    assert summary['orbitas_lidas'] == 2 and summary['orbitas_atualizadas'] == 1
+    with sqlite_db.get_pool().connection() as connection:
+        rows = connection.execute("SELECT moid, moid_ld FROM Orbital_Parameters ORDER BY orbit_param_id").fetchall()
+    assert rows[0][0] == pytest.approx(expected, abs=0.002)
+    assert rows[0][1] == pytest.approx(rows[0][0] * moid.LD_PER_AU)
+    # Sem elementos mantém o valor
+    assert rows[1] == (0.7, None)
@@ -0,0 +1,141 @@
+import threading
+
+import pytest
+
+import notifications
+from notifications import NotificationDispatcher, RateLimiter, SmtpSender, SmtpSink
+
+ALERTS = [
+    (1, 'Eros', None, 1, 'CRÍTICO'),
+    (2, 'Ceres', None, 2, 'MONITORIZAÇÃO'),
+    (3, 'Icarus', None, 1, 'PERIGO'),
+]
+
+
+class CountingSink(SmtpSink):
+    """SmtpSink que conta as conexões recebidas"""
+
+    def __init__(self):
+        self.connections = 0
+        super().__init__(port=0)
+
+    def finish_request(self, request, client_address):
+        self.connections += 1
+        super().finish_request(request, client_address)
+
+
+@pytest.fixture
+def sink():
+    server = CountingSink()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def _sender(sink, **kwargs):
+    return SmtpSender('127.0.0.1', sink.server_address[1], sender='alertas@teste.pt', **kwargs)
+
+
+def _route(matches):
+    """route_alerts fixo: [(email, alert_id)] -> [(email, *alerta)]"""
+    alerts = {alert[0]: alert for alert in ALERTS}
+    return lambda alerts_in: (True, [(email,) + alerts[alert_id] for email, alert_id in matches
+                                     if alerts[alert_id] in alerts_in])
+
+
+def test_one_digest_per_recipient_through_the_sink(sink):
+    dispatcher = NotificationDispatcher(
+        _sender(sink), route=_route([('a@x.pt', 1), ('a@x.pt', 3), ('b@x.pt', 2)]),
+        per_minute=6000
+    )
+    assert dispatcher.enqueue(ALERTS) == 3
+    # Alertas repetidos (ex: o feed volta a entregar) não duplicam
+    dispatcher.enqueue(ALERTS)
+
+    assert dispatcher.flush() == 2
+    dispatcher.stop(flush=False)
+
+    messages = {tuple(to): message for to, message in sink.messages}
+    assert set(messages) == {('a@x.pt',), ('b@x.pt',)}
+    digest = messages[('a@x.pt',)]
+    assert digest['Subject'] == "[Asteroid] 2 novos alertas (2 de prioridade Alta)"
+    assert digest['From'] == 'alertas@teste.pt'
+    assert "alerta #1" in digest.get_content() and "alerta #3" in digest.get_content()
+    assert messages[('b@x.pt',)]['Subject'] == "[Asteroid] Alerta de prioridade Média: MONITORIZAÇÃO"
+    assert dispatcher.pending_count() == 0
+
+
+def test_connection_reused_between_emails(sink):
+    sender = _sender(sink, max_per_connection=2)
+    dispatcher = NotificationDispatcher(sender, route=_route([]), per_minute=6000)
+    for n in range(5):
+        sender.send(dispatcher.build_message(f'{n}@x.pt', ALERTS[:1]))
+    sender.close()
+
+    assert len(sink.messages) == 5
+    assert sink.connections == 3
+
+
+def test_digest_waits_for_window_or_max_alerts(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr('notifications.time.monotonic', lambda: now[0])
+    sent = []
+    sender = type('Sender', (), {'send': lambda self, message: sent.append(message),
+                                 'close': lambda self: None})()
+    dispatcher = NotificationDispatcher(
+        sender, route=_route([('a@x.pt', 1), ('a@x.pt', 2), ('b@x.pt', 1)]),
+        digest_window=60, max_alerts=2, per_minute=6000
+    )
+
+    dispatcher.enqueue(ALERTS[:1])
+    assert dispatcher.dispatch() == 0
+    # a@x.pt chega a max_alerts e segue logo; b@x.pt espera pela janela
+    dispatcher.enqueue(ALERTS[1:2])
+    assert dispatcher.dispatch() == 1
+    now[0] += 60
+    assert dispatcher.dispatch() == 1
+    assert [message['To'] for message in sent] == ['a@x.pt', 'b@x.pt']
+
+
+def test_failed_send_is_retried_after_delay(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr('notifications.time.monotonic', lambda: now[0])
+    attempts = []
+
+    class FlakySender:
+        def send(self, message):
+            attempts.append(message['To'])
+            if len(attempts) == 1:
+                raise ConnectionError("sem rede")
+
+        def close(self):
+            pass
+
+    dispatcher = NotificationDispatcher(FlakySender(), route=_route([('a@x.pt', 1)]),
+                                        digest_window=0, per_minute=6000)
+    dispatcher.enqueue(ALERTS[:1])
+
+    assert dispatcher.dispatch() == 0
+    assert dispatcher.failed == 1 and dispatcher.pending_count() == 1
+    assert dispatcher.dispatch() == 0
+    now[0] += notifications.RETRY_MIN_DELAY
+    assert dispatcher.dispatch() == 1
+    assert attempts == ['a@x.pt', 'a@x.pt']
+
+
+def test_routing_failure_raises_for_the_feed():
+    dispatcher = NotificationDispatcher(None, route=lambda alerts: (False, "Não conectado à BD"))
+
+    with pytest.raises(RuntimeError):
+        dispatcher.enqueue(ALERTS)
+
+
+def test_rate_limiter_stops_when_asked():
+    limiter = RateLimiter(60, burst=2)
+    stop = threading.Event()
+    stop.set()
+
+    assert limiter.acquire(stop) and limiter.acquire(stop)
+    assert not limiter.acquire(stop)
@@ -0,0 +1,77 @@
+from orbit_changes import CHANGE_PRIORITY, OrbitChangeDetector, change_description
+
+
+def _insert(cursor, orbits):
+    cursor.executemany("INSERT INTO Orbital_Parameters (asteroid_id, e, i) VALUES (?, ?, ?)", orbits)
+
+
+def _change_alerts(cursor):
+    return sorted(cursor.execute(
+        "SELECT asteroid_id, priority_level, description FROM Alert "
+        "WHERE description LIKE 'Mudança Orbital:%'"
+    ).fetchall())
+
+
+def test_matches_the_sqlite_trigger(sqlite_db):
+    history = [(1, 0.10, 5.0), (2, 0.30, 20.0), (3, None, 10.0)]
+    # Várias órbitas do mesmo asteroide no lote, NULLs e um asteroide sem histórico
+    batch = [(1, 0.20, 5.5), (2, 0.31, 23.0), (1, 0.21, 9.0), (3, 0.5, 10.5),
+             (4, 0.7, 1.0), (4, 0.9, 1.0), (2, None, 30.0), (1, 0.3, None)]
+
+    with sqlite_db.get_pool().connection() as connection:
+        cursor = connection.cursor()
+        for asteroid_id in range(1, 5):
+            cursor.execute("INSERT INTO Asteroid (asteroid_id, full_name) VALUES (?, ?)",
+                           [asteroid_id, f"A{asteroid_id}"])
+        _insert(cursor, history)
+        connection.commit()
+
+        detector = OrbitChangeDetector(initial_size=2)
+        assert detector.refresh(sqlite_db.get_pool(), sqlite_db.get_backend()) == 3
+
+        cursor.execute("DELETE FROM Alert")
+        _insert(cursor, batch)
+        connection.commit()
+        from_trigger = _change_alerts(cursor)
+
+    ids, e, i = zip(*batch)
+    alerts = detector.alerts(list(ids), list(e), list(i))
+
+    assert len(from_trigger) == 6
+    assert sorted((row[0], row[2], row[3]) for row in alerts) == [tuple(row) for row in from_trigger]
+    assert detector.last_id == 3
+
+
+def test_refresh_reads_only_new_orbits(sqlite_db):
+    with sqlite_db.get_pool().connection() as connection:
+        cursor = connection.cursor()
+        cursor.execute("INSERT INTO Asteroid (asteroid_id, full_name) VALUES (1, 'A1')")
+        _insert(cursor, [(1, 0.1, 5.0), (1, 0.2, 6.0)])
+        connection.commit()
+
+        detector = OrbitChangeDetector()
+        pool, backend = sqlite_db.get_pool(), sqlite_db.get_backend()
+        assert detector.refresh(pool, backend, chunk_size=1) == 2
+        _insert(cursor, [(1, 0.5, 6.0)])
+        connection.commit()
+        assert detector.refresh(pool, backend) == 1
+
+    # A última órbita guardada é a nova
+    eccentricity, inclination = detector.process([1], [0.52], [6.0])
+    assert not eccentricity[0] and not inclination[0]
+
+
+def test_process_keeps_input_order():
+    detector = OrbitChangeDetector()
+    eccentricity, inclination = detector.process([5, 2, 5, 2], [0.1, 0.1, 0.3, 0.1], [1, 1, 1, 9])
+
+    assert eccentricity.tolist() == [False, False, True, False]
+    assert inclination.tolist() == [False, False, False, True]
+    assert detector.process([], [], [])[0].shape == (0,)
+
+
+def test_description_matches_the_trigger_text():
+    assert change_description(True, True) == \
+        'Mudança Orbital: Excentricidade variou > 0.05. Inclinação variou > 2 graus.'
+    assert change_description(False, True) == 'Mudança Orbital: Inclinação variou > 2 graus.'
+    assert CHANGE_PRIORITY == 2
@@ -0,0 +1,126 @@
+import numpy as np
+import pytest
+
+from moid import orbit_frame
+from orbit_index import KDTree, OrbitIndex, orbit_vectors
+
+
+def _random_orbits(rng, count):
+    """Colunas (a, e, q, i, om, w) de órbitas aleatórias (q desconhecido)"""
+    a = rng.uniform(0.8, 3.5, count)
+    e = rng.uniform(0, 0.9, count)
+    return a, e, np.full(count, np.nan), rng.uniform(0, 40, count), \
+        rng.uniform(0, 360, count), rng.uniform(0, 360, count)
+
+
+def _brute_force(points, point):
+    distances = np.linalg.norm(points - point, axis=1)
+    return distances, np.argsort(distances, kind='stable')
+
+
+def test_vector_distance_is_the_d_criterion():
+    rng = np.random.default_rng(1)
+    a, e, q, i, om, w = _random_orbits(rng, 2)
+    vectors, complete = orbit_vectors(a, e, q, i, om, w)
+
+    P, Q = orbit_frame(i, om, w)
+    normals = np.cross(P, Q)
+    plane_angle = np.arccos(np.clip(normals[0] @ normals[1], -1, 1))
+    perihelion_angle = np.arccos(np.clip(P[0] @ P[1], -1, 1))
+    q = a * (1 - e)
+    expected = ((q[0] - q[1]) ** 2 + (2 * np.sin(plane_angle / 2)) ** 2 + (e[0] - e[1]) ** 2
+                + e[0] * e[1] * (2 * np.sin(perihelion_angle / 2)) ** 2)
+
+    assert complete.all()
+    assert np.sum((vectors[0] - vectors[1]) ** 2) == pytest.approx(expected)
+
+
+def test_kd_tree_matches_brute_force():
+    rng = np.random.default_rng(2)
+    points = rng.normal(size=(3000, 7))
+    tree = KDTree(points, leaf_size=16)
+    hidden = rng.choice(len(points), 300, replace=False)
+    tree.hide(hidden)
+    alive = np.setdiff1d(np.arange(len(points)), hidden)
+
+    for point in rng.normal(size=(20, 7)):
+        distances, order = _brute_force(points[alive], point)
+
+        tree_distances, positions = tree.query(point, 15)
+        assert np.allclose(tree_distances, distances[order[:15]])
+        assert set(positions.tolist()) == set(alive[order[:15]].tolist())
+
+        # Entre dois vizinhos, longe de empates por arredondamento
+        radius = (distances[order[40]] + distances[order[41]]) / 2
+        tree_distances, positions = tree.query_radius(point, radius)
+        assert set(positions.tolist()) == set(alive[distances <= radius].tolist())
+        assert np.all(np.diff(tree_distances) >= 0)
+
+
+def _records(rng, asteroid_ids, first_id):
+    a, e, q, i, om, w = _random_orbits(rng, len(asteroid_ids))
+    return [(first_id + n, int(asteroid_id), *values)
+            for n, (asteroid_id, *values) in enumerate(zip(asteroid_ids, a, e, q, i, om, w))]
+
+
+def _latest_vectors(records):
+    latest = {}
+    for record in records:
+        latest[record[1]] = record
+    ids = sorted(latest)
+    vectors, complete = orbit_vectors(*(np.array([np.nan if latest[k][c] is None else latest[k][c]
+                                                  for k in ids], dtype=np.float64)
+                                        for c in range(2, 8)))
+    return np.array(ids)[complete], vectors[complete]
+
+
+def test_orbit_index_matches_brute_force_across_rebuilds():
+    rng = np.random.default_rng(3)
+    index = OrbitIndex(leaf_size=8, rebuild_min=50, rebuild_fraction=0.1)
+    records = _records(rng, range(400), 1)
+    # Órbitas novas de asteroides já indexados (substituem a anterior), uma incompleta
+    records += _records(rng, rng.choice(400, 60, replace=False), 1000)
+    records.append((2000, 7, None, None, None, None, None, None))
+
+    for start in range(0, len(records), 70):
+        index.add(records[start:start + 70])
+
+    ids, vectors = _latest_vectors(records)
+    assert len(index) == len(ids) == 399
+    assert index.vector(7) is None
+
+    for target in rng.choice(len(ids), 10, replace=False):
+        distances, order = _brute_force(vectors, vectors[target])
+        nearest = index.nearest(vectors[target], k=12)
+        assert [found for found, _ in nearest][0] == ids[target]
+        assert [distance for _, distance in nearest] == pytest.approx(distances[order[:12]].tolist())
+
+        radius = (distances[order[25]] + distances[order[26]]) / 2
+        within = index.within(vectors[target], radius)
+        assert {found for found, _ in within} == set(ids[distances <= radius].tolist())
+
+
+def test_refresh_reads_new_orbits(sqlite_db):
+    with sqlite_db.get_pool().connection() as connection:
+        for asteroid_id in (1, 2):
+            connection.execute("INSERT INTO Asteroid (asteroid_id, full_name) VALUES (?, ?)",
+                               [asteroid_id, f"A{asteroid_id}"])
+        connection.executemany(
+            "INSERT INTO Orbital_Parameters (asteroid_id, a, e, i, om, w) VALUES (?, ?, ?, ?, ?, ?)",
+            [(1, 1.46, 0.22, 10.8, 304.3, 178.9), (2, 2.77, 0.08, 10.6, 80.3, 73.3)]
+        )
+        connection.commit()
+
+        index = OrbitIndex()
+        pool, backend = sqlite_db.get_pool(), sqlite_db.get_backend()
+        assert index.refresh(pool, backend, chunk_size=1) == 2
+
+        connection.execute("INSERT INTO Orbital_Parameters (asteroid_id, a, e, i, om, w) "
+                           "VALUES (2, 1.46, 0.22, 10.8, 304.3, 178.9)")
+        connection.commit()
+        assert index.refresh(pool, backend) == 1
+
+    assert len(index) == 2
+    nearest = index.nearest(index.vector(1), k=2)
+    assert {asteroid_id for asteroid_id, _ in nearest} == {1, 2}
+    assert nearest[1][1] == pytest.approx(0, abs=1e-12)
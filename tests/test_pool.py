@@ -0,0 +1,164 @@
+import threading
+import time
+
+import pytest
+
+from pool import ConnectionPool
+
+
+class FakeConnection:
+    def __init__(self, healthy=True, slow=0.0):
+        self.healthy = healthy
+        self.slow = slow
+        self.closed = False
+
+    def cursor(self):
+        time.sleep(self.slow)
+        if not self.healthy:
+            raise OSError("conexão perdida")
+        return FakeCursor()
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        time.sleep(self.slow)
+        self.closed = True
+
+
+class FakeCursor:
+    def execute(self, sql):
+        pass
+
+    def fetchone(self):
+        return (1,)
+
+    def close(self):
+        pass
+
+
+def responds_quickly(pool, seconds=0.2):
+    """stats() e acquire() de outra conexão sem esperar pelo lock"""
+    start = time.monotonic()
+    pool.stats()
+    conn = pool.acquire(timeout=1)
+    pool.release(conn)
+    return time.monotonic() - start < seconds
+
+
+def in_background(func):
+    thread = threading.Thread(target=func)
+    thread.start()
+    time.sleep(0.05)
+    return thread
+
+
+def test_reuses_released_connections():
+    created = []
+    pool = ConnectionPool(lambda: created.append(FakeConnection()) or created[-1], max_size=2)
+
+    with pool.connection() as first:
+        pass
+    with pool.connection() as second:
+        pass
+    assert first is second
+    assert len(created) == 1
+
+
+def test_exhausted_pool_times_out():
+    pool = ConnectionPool(FakeConnection, max_size=1)
+    pool.acquire()
+    with pytest.raises(TimeoutError):
+        pool.acquire(timeout=0.05)
+
+
+def test_waiting_acquire_gets_released_connection():
+    pool = ConnectionPool(FakeConnection, max_size=1)
+    conn = pool.acquire()
+    result = {}
+    thread = in_background(lambda: result.setdefault('conn', pool.acquire(timeout=2)))
+    pool.release(conn)
+    thread.join(2)
+    assert result['conn'] is conn
+
+
+def test_unhealthy_idle_connection_is_replaced():
+    pool = ConnectionPool(FakeConnection, max_size=2, ping_after=0)
+    dead = FakeConnection(healthy=False)
+    pool.add(dead)
+
+    conn = pool.acquire()
+    assert conn is not dead
+    assert dead.closed
+    assert pool.stats()['in_use'] == 1
+
+
+def test_failed_block_rolls_back_and_returns_connection():
+    pool = ConnectionPool(FakeConnection, max_size=1)
+    with pytest.raises(ValueError):
+        with pool.connection():
+            raise ValueError
+    assert pool.stats() == {'idle': 1, 'in_use': 0, 'max_size': 1}
+
+
+def test_ping_runs_outside_the_lock():
+    pool = ConnectionPool(FakeConnection, max_size=3, ping_after=0)
+    pool.add(FakeConnection(healthy=False, slow=0.5))
+
+    thread = in_background(pool.acquire)
+    assert responds_quickly(pool)
+    thread.join()
+
+
+def test_discard_closes_outside_the_lock():
+    pool = ConnectionPool(FakeConnection, max_size=3)
+    slow = FakeConnection(slow=0.5)
+    pool.add(slow)
+    conn = pool.acquire()
+    assert conn is slow
+
+    thread = in_background(lambda: pool.release(conn, discard=True))
+    assert responds_quickly(pool)
+    thread.join()
+    assert slow.closed
+
+
+def test_evict_idle_closes_outside_the_lock():
+    pool = ConnectionPool(FakeConnection, max_size=3, min_size=0, max_idle=0)
+    slow = FakeConnection(slow=0.5)
+    pool.add(slow)
+
+    result = {}
+    thread = in_background(lambda: result.setdefault('closed', pool.evict_idle()))
+    assert responds_quickly(pool)
+    thread.join()
+    assert result['closed'] == 1
+    assert slow.closed
+
+
+def test_close_closes_idle_and_rejects_new_requests():
+    pool = ConnectionPool(FakeConnection, max_size=2)
+    idle = FakeConnection()
+    pool.add(idle)
+    borrowed = pool.acquire()
+    assert borrowed is idle
+    pool.add(FakeConnection())
+
+    pool.close()
+    with pytest.raises(RuntimeError):
+        pool.acquire()
+    pool.release(borrowed)
+    assert borrowed.closed
+
+
+def test_expired_connection_closed_when_acquire_fails():
+    pool = ConnectionPool(FakeConnection, max_size=1, max_lifetime=0)
+    old = FakeConnection()
+    pool.add(old)
+    pool.acquire()
+    pool.add(FakeConnection())
+    time.sleep(0.01)
+
+    with pytest.raises(TimeoutError):
+        pool.acquire(timeout=0.05)
+    assert pool.stats()['idle'] == 0
@@ -0,0 +1,99 @@
+import threading
+from contextlib import contextmanager
+
+from schema_cache import SchemaCache
+
+
+class FakePool:
+    @contextmanager
+    def connection(self):
+        yield object()
+
+
+class CountingLoader:
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, connection):
+        self.calls += 1
+        return {'tables': [f'carga-{self.calls}']}
+
+
+def test_loads_once_until_invalidated():
+    loader = CountingLoader()
+    cache = SchemaCache(loader=loader)
+
+    assert cache.get(FakePool()) == {'tables': ['carga-1']}
+    assert cache.get(FakePool()) == {'tables': ['carga-1']}
+    cache.invalidate()
+    assert cache.get(FakePool()) == {'tables': ['carga-2']}
+    assert loader.calls == 2
+
+
+def test_ttl_expires(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr('schema_cache.time.monotonic', lambda: now[0])
+    loader = CountingLoader()
+    cache = SchemaCache(ttl=10, loader=loader)
+
+    cache.get(FakePool())
+    now[0] += 5
+    cache.get(FakePool())
+    now[0] += 6
+    cache.get(FakePool())
+    assert loader.calls == 2
+
+
+def test_load_does_not_block_other_readers():
+    started = threading.Event()
+    release = threading.Event()
+
+    def slow_loader(connection):
+        started.set()
+        release.wait(5)
+        return {'tables': ['lento']}
+
+    cache = SchemaCache(loader=lambda connection: {'tables': ['rapido']})
+    cache.get(FakePool())
+    cache.invalidate()
+    cache.loader = slow_loader
+
+    result = {}
+    reader = threading.Thread(target=lambda: result.setdefault('slow', cache.get(FakePool())))
+    reader.start()
+    assert started.wait(5)
+
+    # Com a leitura lenta em curso, o lock está livre
+    acquired = cache._lock.acquire(timeout=1)
+    assert acquired
+    cache._lock.release()
+    release.set()
+    reader.join(5)
+    assert result['slow'] == {'tables': ['lento']}
+
+
+def test_load_crossing_an_invalidation_is_not_kept():
+    cache = SchemaCache()
+
+    def loader(connection):
+        # Alteração de esquema durante a leitura
+        cache.invalidate()
+        return {'tables': ['antigo']}
+
+    cache.loader = loader
+    assert cache.get(FakePool()) == {'tables': ['antigo']}
+    cache.loader = lambda connection: {'tables': ['novo']}
+    assert cache.get(FakePool()) == {'tables': ['novo']}
+
+
+def test_database_reads_ttl_setting_on_connect(tmp_path, monkeypatch):
+    import database
+
+    monkeypatch.setattr(database, 'SCHEMA_CACHE_TTL', 42)
+    success, message, _ = database.connect_to_sqlite(str(tmp_path / 'ttl.db'))
+    assert success, message
+    try:
+        assert database.schema_cache.ttl == 42
+        assert 'Asteroid' in database.get_all_tables()
+    finally:
+        database.close_connection()
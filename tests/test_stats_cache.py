@@ -0,0 +1,99 @@
+import threading
+
+from stats_cache import StatisticsCache
+
+
+class CountingLoader:
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        return True, {'carga': self.calls}
+
+
+def test_fresh_value_is_reused_until_invalidated():
+    loader = CountingLoader()
+    cache = StatisticsCache(loader)
+
+    assert cache.get() == (True, {'carga': 1})
+    assert cache.get() == (True, {'carga': 1})
+    cache.invalidate()
+    assert cache.get() == (True, {'carga': 2})
+    assert cache.get(refresh=True) == (True, {'carga': 3})
+
+
+def test_stale_value_returned_while_refreshing(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr('stats_cache.time.monotonic', lambda: now[0])
+    refreshed = threading.Event()
+    loader = CountingLoader()
+
+    def tracked():
+        result = loader()
+        if loader.calls > 1:
+            refreshed.set()
+        return result
+
+    cache = StatisticsCache(tracked, ttl=10, stale_ttl=100)
+    cache.get()
+    now[0] += 50
+
+    # Valor antigo de imediato; a leitura nova corre em fundo
+    assert cache.get() == (True, {'carga': 1})
+    assert refreshed.wait(5)
+    with cache._lock:
+        cache._lock.wait_for(lambda: not cache._loading, timeout=5)
+    assert cache.get() == (True, {'carga': 2})
+
+
+def test_expired_value_waits_for_new_load(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr('stats_cache.time.monotonic', lambda: now[0])
+    loader = CountingLoader()
+    cache = StatisticsCache(loader, ttl=10, stale_ttl=100)
+
+    cache.get()
+    now[0] += 200
+    assert cache.get() == (True, {'carga': 2})
+
+
+def test_failures_are_not_cached():
+    results = [(False, "sem ligação"), (True, {'ok': 1})]
+    cache = StatisticsCache(lambda: results.pop(0))
+
+    assert cache.get() == (False, "sem ligação")
+    assert cache.get() == (True, {'ok': 1})
+
+
+def test_loader_exception_becomes_error():
+    def broken():
+        raise RuntimeError("falhou")
+
+    assert StatisticsCache(broken).get() == (False, "falhou")
+
+
+def test_concurrent_requests_share_one_load():
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def slow():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return True, {'lento': True}
+
+    cache = StatisticsCache(slow)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get())) for _ in range(4)]
+    threads[0].start()
+    assert started.wait(5)
+    for thread in threads[1:]:
+        thread.start()
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert len(calls) == 1
+    assert results == [(True, {'lento': True})] * 4
@@ -0,0 +1,59 @@
+from subscriber_index import SubscriberIndex
+
+
+def _add(sqlite_db, email, high, medium, low, updated='2026-01-01 10:00:00'):
+    with sqlite_db.get_pool().connection() as connection:
+        connection.execute(
+            "INSERT INTO NotificationSettings (user_email, high_priority_alerts, "
+            "medium_priority_alerts, low_priority_alerts, updated_date) VALUES (?, ?, ?, ?, ?)",
+            [email, high, medium, low, updated]
+        )
+        connection.commit()
+
+
+def test_routes_alerts_to_subscribers_by_priority(sqlite_db):
+    _add(sqlite_db, 'b@x.pt', 1, 1, 0)
+    _add(sqlite_db, 'a@x.pt', 1, 0, 1)
+    index = SubscriberIndex().refresh(sqlite_db.get_pool())
+
+    assert index.subscribers(1) == ('a@x.pt', 'b@x.pt')
+    assert index.subscribers(2) == ('b@x.pt',)
+    assert index.subscribers(4) == ()
+    assert index.settings('a@x.pt') == {'email': 'a@x.pt', 'high_priority': True,
+                                        'medium_priority': False, 'low_priority': True}
+    assert index.settings('c@x.pt') is None
+
+    alerts = [(10, 'Eros', '2026-01-01', 2, 'perigo'), (11, 'Ceres', '2026-01-01', 3, 'anomalia')]
+    assert index.route(alerts) == [
+        ('b@x.pt', 10, 'Eros', '2026-01-01', 2, 'perigo'),
+        ('a@x.pt', 11, 'Ceres', '2026-01-01', 3, 'anomalia'),
+    ]
+
+
+def test_external_changes_seen_after_check_interval(sqlite_db, monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr('subscriber_index.time.monotonic', lambda: now[0])
+    pool = sqlite_db.get_pool()
+    _add(sqlite_db, 'a@x.pt', 1, 0, 0)
+    index = SubscriberIndex(check_interval=30).refresh(pool)
+
+    # Alteração feita por outra aplicação
+    with pool.connection() as connection:
+        connection.execute("UPDATE NotificationSettings SET medium_priority_alerts = 1, "
+                           "updated_date = '2026-02-01 10:00:00'")
+        connection.commit()
+
+    now[0] += 10
+    assert index.refresh(pool).subscribers(2) == ()
+    now[0] += 30
+    assert index.refresh(pool).subscribers(2) == ('a@x.pt',)
+
+
+def test_invalidate_reloads_immediately(sqlite_db):
+    pool = sqlite_db.get_pool()
+    index = SubscriberIndex().refresh(pool)
+    assert index.subscribers(1) == ()
+
+    _add(sqlite_db, 'a@x.pt', 1, 0, 0)
+    index.invalidate()
+    assert index.refresh(pool).subscribers(1) == ('a@x.pt',)
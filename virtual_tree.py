@@ -0,0 +1,321 @@
+from collections import OrderedDict
+from tkinter import ttk
+
+
+class ListSource:
+    """Fonte de linhas já em memória (ex: resultados de uma view)"""
+
+    def __init__(self, records):
+        self.records = records
+
+    def __len__(self):
+        return len(self.records)
+
+    def get_rows(self, start, count):
+        return self.records[start:start + count]
+
+    def close(self):
+        pass
+
+
+class PagedSource:
+    """
+    Fonte de linhas lidas do servidor por páginas, apenas quando são precisas.
+
+    `fetch_page(page)` devolve a lista de registos de uma página. Com um
+    `executor` (BackgroundExecutor), as páginas em falta são pedidas em fundo
+    e `on_loaded()` é chamado quando chegam; até lá essas linhas são None.
+    Ficam em cache no máximo `max_pages` páginas (as menos usadas saem primeiro).
+    """
+
+    def __init__(self, fetch_page, total, page_size=500, max_pages=10,
+                 executor=None, on_loaded=None):
+        self.fetch_page = fetch_page
+        self.total = total
+        self.page_size = page_size
+        self.max_pages = max_pages
+        self.executor = executor
+        self.on_loaded = on_loaded
+
+        self._pages = OrderedDict()
+        self._loading = set()
+        self._closed = False
+
+    def __len__(self):
+        return self.total
+
+    def seed(self, page, records):
+        """Guarda uma página já obtida (ex: a primeira, pedida com a contagem)"""
+        self._store(page, records, notify=False)
+
+    def get_rows(self, start, count):
+        end = min(start + count, self.total)
+        if end <= start:
+            return []
+
+        rows = []
+        first_page = start // self.page_size
+        last_page = (end - 1) // self.page_size
+
+        for page in range(first_page, last_page + 1):
+            page_start = page * self.page_size
+            lo = max(start, page_start) - page_start
+            hi = min(end, page_start + self.page_size) - page_start
+
+            records = self._pages.get(page)
+            if records is None:
+                # Sem executor a página é lida já; com executor chega mais tarde
+                self._request(page)
+                records = self._pages.get(page)
+
+            if records is None:
+                rows.extend([None] * (hi - lo))
+            else:
+                self._pages.move_to_end(page)
+                chunk = records[lo:hi]
+                rows.extend(chunk)
+                rows.extend([None] * (hi - lo - len(chunk)))
+
+        # Antecipar a página seguinte
+        if (last_page + 1) * self.page_size < self.total:
+            self._request(last_page + 1)
+
+        return rows
+
+    def close(self):
+        """Descarta a cache; páginas que ainda cheguem são ignoradas"""
+        self._closed = True
+        self._pages.clear()
+
+    def _request(self, page):
+        if page in self._pages or page in self._loading:
+            return
+
+        self._loading.add(page)
+        if self.executor:
+            self.executor.submit(
+                f"pagina-{id(self)}-{page}", self.fetch_page, page,
+                on_success=lambda records: self._store(page, records),
+                on_error=lambda e: self._failed(page, e)
+            )
+        else:
+            try:
+                self._store(page, self.fetch_page(page), notify=False)
+            except Exception as e:
+                self._failed(page, e)
+
+    def _store(self, page, records, notify=True):
+        self._loading.discard(page)
+        if self._closed:
+            return
+
+        self._pages[page] = records
+        self._pages.move_to_end(page)
+        while len(self._pages) > self.max_pages:
+            self._pages.popitem(last=False)
+
+        if notify and self.on_loaded:
+            self.on_loaded()
+
+    def _failed(self, page, error):
+        self._loading.discard(page)
+        print(f"Erro ao carregar página {page}: {error}")
+
+
+class VirtualTreeview(ttk.Treeview):
+    """
+    Treeview que mostra resultados de qualquer tamanho mantendo apenas as
+    linhas visíveis como itens.
+
+    A barra de scroll vertical controla um deslocamento virtual sobre a fonte
+    de linhas (ListSource/PagedSource); ao fazer scroll, os itens existentes
+    são reaproveitados com os valores das novas linhas. Só as linhas visíveis
+    são convertidas para texto (por `format_row(linha)`, se indicado).
+
+    A seleção e o foco são guardados pela posição na fonte, não pelo item:
+    depois de um scroll passam para os itens que mostram as mesmas linhas.
+    """
+
+    def __init__(self, master=None, placeholder="...", format_row=None, **kwargs):
+        self._yscrollcommand = kwargs.pop('yscrollcommand', None)
+        super().__init__(master, **kwargs)
+
+        self.placeholder = placeholder
+        self.format_row = format_row
+        self.source = ListSource([])
+        self.offset = 0
+        self._visible = 1
+        self._row_height = None
+        self._header_height = None
+        # Posições na fonte das linhas selecionadas e da linha com foco
+        self._selected = set()
+        self._focus_index = None
+
+        self.bind("<Configure>", lambda event: self.refresh())
+        self.bind("<<TreeviewSelect>>", lambda event: self._sync_selection(), add="+")
+        self.bind("<MouseWheel>", self._on_mousewheel)
+        self.bind("<Button-4>", lambda event: self._scroll_by(-3))
+        self.bind("<Button-5>", lambda event: self._scroll_by(3))
+        self.bind("<Up>", self._on_arrow)
+        self.bind("<Down>", self._on_arrow)
+        self.bind("<Prior>", lambda event: self._scroll_by(-self._visible))
+        self.bind("<Next>", lambda event: self._scroll_by(self._visible))
+        self.bind("<Home>", lambda event: self._scroll_to(0))
+        self.bind("<End>", lambda event: self._scroll_to(len(self.source)))
+
+    def set_source(self, source):
+        """Substitui a fonte de linhas e volta ao início"""
+        if self.source is not source:
+            self.source.close()
+        self.source = source
+        self.offset = 0
+        self._selected = set()
+        self._focus_index = None
+        self.selection_remove(self.selection())
+        self.refresh()
+
+    def clear(self):
+        self.set_source(ListSource([]))
+
+    def row_values(self, item):
+        """Retorna os valores originais (não convertidos) da linha de um item"""
+        index = self.offset + self.index(item)
+        rows = self.source.get_rows(index, 1)
+        return rows[0] if rows else None
+
+    def refresh(self):
+        """Redesenha as linhas visíveis a partir da fonte"""
+        self._visible = self._visible_rows()
+        total = len(self.source)
+        self.offset = max(0, min(self.offset, total - self._visible))
+
+        rows = self.source.get_rows(self.offset, self._visible)
+        items = self.get_children()
+
+        # Ajustar o número de itens ao número de linhas a mostrar
+        if len(items) > len(rows):
+            self.delete(*items[len(rows):])
+            items = items[:len(rows)]
+        while len(items) < len(rows):
+            self.insert('', 'end')
+            items = self.get_children()
+
+        for item, row in zip(items, rows):
+            self.item(item, values=self._format_row(row))
+
+        self._restore_selection(items)
+        self._update_scrollbar(total)
+
+    def _restore_selection(self, items):
+        """Seleciona (e dá o foco a) os itens que agora mostram as linhas guardadas"""
+        selected = [items[index - self.offset] for index in self._selected
+                    if 0 <= index - self.offset < len(items)]
+        # Só quando muda, para não gerar <<TreeviewSelect>> a cada redesenho
+        if set(selected) != set(self.selection()):
+            self.selection_set(selected)
+
+        if self._focus_index is not None and 0 <= self._focus_index - self.offset < len(items):
+            self.focus(items[self._focus_index - self.offset])
+
+    def _sync_selection(self):
+        """Guarda a seleção e o foco do Treeview (itens visíveis) como posições na fonte"""
+        # Linhas fora do ecrã continuam selecionadas; as visíveis vêm do Treeview
+        items = self.get_children()
+        first, last = self.offset, self.offset + len(items)
+        self._selected = {index for index in self._selected if not first <= index < last}
+        self._selected.update(first + self.index(item) for item in self.selection())
+
+        # Com a linha do foco fora do ecrã, o item com foco já mostra outra
+        # linha: só conta quando está selecionado (clique ou setas)
+        focus = self.focus()
+        if focus and focus in self.selection():
+            self._focus_index = first + self.index(focus)
+
+    def yview(self, *args):
+        """Comando da barra de scroll: atua sobre o deslocamento virtual"""
+        if not args:
+            return self._fractions(len(self.source))
+
+        total = len(self.source)
+        if args[0] == 'moveto':
+            self._scroll_to(int(float(args[1]) * total))
+        elif args[0] == 'scroll':
+            amount = int(args[1])
+            if args[2] == 'pages':
+                amount *= self._visible
+            self._scroll_by(amount)
+        return None
+
+    def _format_row(self, row):
+        if row is None:
+            return [self.placeholder] * len(self["columns"])
+        if self.format_row:
+            return self.format_row(row)
+        return [str(val) if val is not None else "" for val in row]
+
+    def _visible_rows(self):
+        items = self.get_children()
+        if items and self._row_height is None:
+            bbox = self.bbox(items[0])
+            if bbox:
+                self._header_height = bbox[1]
+                self._row_height = bbox[3]
+
+        row_height = self._row_height or 20
+        header_height = self._header_height or 25
+        height = self.winfo_height()
+        if height <= 1:
+            return int(self.cget("height"))
+        return max(1, (height - header_height) // row_height)
+
+    def _fractions(self, total):
+        if total <= 0:
+            return 0.0, 1.0
+        first = self.offset / total
+        last = min(1.0, (self.offset + self._visible) / total)
+        return first, last
+
+    def _update_scrollbar(self, total):
+        if self._yscrollcommand:
+            first, last = self._fractions(total)
+            self._yscrollcommand(first, last)
+
+    def _scroll_to(self, offset):
+        total = len(self.source)
+        new_offset = max(0, min(offset, total - self._visible))
+        if new_offset != self.offset:
+            # <<TreeviewSelect>> chega por evento: guardar já a seleção atual,
+            # ainda com o deslocamento antigo
+            self._sync_selection()
+            self.offset = new_offset
+            self.refresh()
+        return "break"
+
+    def _scroll_by(self, amount):
+        return self._scroll_to(self.offset + amount)
+
+    def _on_mousewheel(self, event):
+        return self._scroll_by(-3 if event.delta > 0 else 3)
+
+    def _on_arrow(self, event):
+        items = self.get_children()
+        if not items or self._focus_index is None:
+            return None
+
+        # Na primeira/última linha visível, a seleção passa para a linha
+        # seguinte da fonte e o scroll traz essa linha para o ecrã
+        position = self._focus_index - self.offset
+        if event.keysym == "Down" and position == len(items) - 1:
+            step = 1
+        elif event.keysym == "Up" and position == 0:
+            step = -1
+        else:
+            return None
+
+        target = self._focus_index + step
+        if 0 <= target < len(self.source):
+            self._scroll_by(step)
+            self._focus_index = target
+            self._selected = {target}
+            self._restore_selection(self.get_children())
+        return "break"